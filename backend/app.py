@@ -3,16 +3,20 @@
 连接 Python Agent 并提供 REST API
 """
 
+import atexit
+import json
 import os
 import sys
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 # 添加父目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from soul_mate import SoulMateAgent
+from soul_mate import SoulMateAgent, ContentFetcher
+from soul_mate.agent_registry import AgentRegistry
+from soul_mate.llm_client import analysis_cache_stats, llm_call_stats, llm_coalescing_stats
 
 # 加载环境变量
 load_dotenv()
@@ -26,14 +30,17 @@ CORS(app, resources={
     }
 })
 
-# 存储用户 Agent 实例
-agents = {}
+# 存储用户 Agent 实例（LRU + 空闲淘汰，淘汰时写回画像）
+agents = AgentRegistry(
+    factory=lambda user_id: SoulMateAgent(user_id=user_id),
+    max_size=int(os.getenv("AGENT_REGISTRY_MAX_SIZE", "1000")),
+    idle_ttl=float(os.getenv("AGENT_IDLE_TTL", "1800")),
+)
+atexit.register(agents.clear)
 
 def get_agent(user_id: str) -> SoulMateAgent:
     """获取或创建用户的 Agent 实例"""
-    if user_id not in agents:
-        agents[user_id] = SoulMateAgent(user_id=user_id)
-    return agents[user_id]
+    return agents.get(user_id)
 
 
 @app.route("/health", methods=["GET"])
@@ -42,6 +49,22 @@ def health_check():
     return jsonify({"status": "healthy", "service": "soul-mate-agent"}), 200
 
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """运行指标端点"""
+    return jsonify({
+        "agents": agents.stats(),
+        "content_sources": ContentFetcher.source_stats(),
+        "content_cache": ContentFetcher.cache_stats(),
+        "analysis_cache": analysis_cache_stats(),
+        "llm_calls": llm_call_stats(),
+        "coalescing": {
+            "llm": llm_coalescing_stats(),
+            "fetch": ContentFetcher.coalescing_stats()
+        }
+    }), 200
+
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
     """
@@ -51,7 +74,8 @@ def chat():
     {
         "user_id": "alice",
         "message": "推荐一些关于机器学习的书籍",
-        "session_id": "session_123"
+        "session_id": "session_123",
+        "mode": "offline"  // 可选，不调用LLM，直接按本地打分与模板生成推荐
     }
     """
     try:
@@ -65,6 +89,7 @@ def chat():
         
         user_id = data.get("user_id", "default_user")
         message = data.get("message", "").strip()
+        offline = data.get("mode") == "offline"
         
         if not message:
             return jsonify({
@@ -76,7 +101,7 @@ def chat():
         agent = get_agent(user_id)
         
         # 调用 Agent 的推荐方法
-        result = agent.recommend(message, top_k=5)
+        result = agent.recommend(message, top_k=5, offline=offline)
         
         return jsonify(result), 200
         
@@ -88,6 +113,53 @@ def chat():
         }), 500
 
 
+def sse_event(event: str, data) -> str:
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    流式聊天端点（Server-Sent Events）
+    
+    请求体与 /api/chat 相同，依次返回事件:
+    start（分析结果）、recommendation（每条推荐一次）、done（完整结果，与 /api/chat 的响应相同）；
+    处理出错时返回 error 事件
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "success": False,
+            "message": "请求体不能为空"
+        }), 400
+    
+    user_id = data.get("user_id", "default_user")
+    message = data.get("message", "").strip()
+    offline = data.get("mode") == "offline"
+    
+    if not message:
+        return jsonify({
+            "success": False,
+            "message": "消息不能为空"
+        }), 400
+    
+    def generate():
+        try:
+            agent = get_agent(user_id)
+            for event in agent.recommend_stream(message, top_k=5, offline=offline):
+                yield sse_event(event.pop("event"), event)
+        except Exception as e:
+            print(f"错误: {str(e)}")
+            yield sse_event("error", {"success": False, "message": f"处理请求时出错: {str(e)}"})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/api/user/<user_id>", methods=["GET"])
 def get_user_profile(user_id: str):
     """
@@ -104,14 +176,15 @@ def get_user_profile(user_id: str):
     """
     try:
         agent = get_agent(user_id)
-        profile = agent.user_profile.profile
+        user_profile = agent.user_profile
+        profile = user_profile.profile
         
         return jsonify({
             "user_id": user_id,
-            "preferences": profile["preferences"],
+            "preferences": user_profile.get_preferences(),
             "interaction_count": profile["interaction_count"],
-            "liked_items": profile["feedback"]["liked"][-10:],  # 最近10个
-            "disliked_items": profile["feedback"]["disliked"][-10:],
+            "liked_items": user_profile.get_recent_feedback(liked=True, limit=10),  # 最近10个
+            "disliked_items": user_profile.get_recent_feedback(liked=False, limit=10),
             "created_at": profile["created_at"],
             "updated_at": profile["updated_at"]
         }), 200
@@ -200,17 +273,18 @@ def update_preferences(user_id: str):
         
         agent = get_agent(user_id)
         
-        # 更新偏好
-        if "genres" in data:
-            for genre in data["genres"]:
-                agent.user_profile.add_genre(genre)
-        
-        if "topics" in data:
-            for topic in data["topics"]:
-                agent.user_profile.add_topic(topic)
-        
-        if "reading_level" in data:
-            agent.user_profile.update_preferences(reading_level=data["reading_level"])
+        # 更新偏好（合并为一次写入）
+        with agent.user_profile.batch():
+            if "genres" in data:
+                for genre in data["genres"]:
+                    agent.user_profile.add_genre(genre)
+            
+            if "topics" in data:
+                for topic in data["topics"]:
+                    agent.user_profile.add_topic(topic)
+            
+            if "reading_level" in data:
+                agent.user_profile.update_preferences(reading_level=data["reading_level"])
         
         return jsonify({
             "success": True,
@@ -0,0 +1,297 @@
+"""
+灵魂伴侣 ASGI 后端服务器
+与 app.py 提供相同的 /api/* 接口，请求在事件循环中等待 LLM 与内容来源，
+单个工作进程即可同时承载大量进行中的对话
+
+启动:
+  uvicorn backend.asgi:app --host 0.0.0.0 --port 8010
+  python backend/asgi.py
+"""
+
+import atexit
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from soul_mate import AsyncSoulMateAgent, ContentFetcher
+from soul_mate.agent_registry import AgentRegistry
+from soul_mate.async_llm_client import (
+    async_analysis_cache_stats,
+    async_llm_call_stats,
+    async_llm_coalescing_stats,
+    close_shared_async_clients,
+)
+
+# 加载环境变量
+load_dotenv()
+
+# 存储用户 Agent 实例（LRU + 空闲淘汰，淘汰时写回画像）
+agents = AgentRegistry(
+    factory=lambda user_id: AsyncSoulMateAgent(user_id=user_id),
+    max_size=int(os.getenv("AGENT_REGISTRY_MAX_SIZE", "1000")),
+    idle_ttl=float(os.getenv("AGENT_IDLE_TTL", "1800")),
+)
+atexit.register(agents.clear)
+
+
+async def get_agent(user_id: str) -> AsyncSoulMateAgent:
+    """获取或创建用户的 Agent 实例（加载画像与淘汰写回在线程中执行）"""
+    return await run_in_threadpool(agents.get, user_id)
+
+
+async def read_json(request: Request):
+    """读取请求体 JSON，格式错误时返回 None"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"success": False, "message": message}, status_code=status_code)
+
+
+async def health_check(request: Request):
+    """健康检查端点"""
+    return JSONResponse({"status": "healthy", "service": "soul-mate-agent"})
+
+
+async def metrics(request: Request):
+    """运行指标端点"""
+    return JSONResponse({
+        "agents": agents.stats(),
+        "content_sources": ContentFetcher.source_stats(),
+        "content_cache": ContentFetcher.cache_stats(),
+        "analysis_cache": async_analysis_cache_stats(),
+        "llm_calls": async_llm_call_stats(),
+        "coalescing": {
+            "llm": async_llm_coalescing_stats(),
+            "fetch": ContentFetcher.coalescing_stats()
+        }
+    })
+
+
+async def chat(request: Request):
+    """聊天端点，请求体与 app.py 相同"""
+    try:
+        data = await read_json(request)
+        if not data:
+            return error("请求体不能为空", 400)
+
+        user_id = data.get("user_id", "default_user")
+        message = data.get("message", "").strip()
+        offline = data.get("mode") == "offline"
+        if not message:
+            return error("消息不能为空", 400)
+
+        agent = await get_agent(user_id)
+        result = await agent.recommend(message, top_k=5, offline=offline)
+        return JSONResponse(result)
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return error(f"处理请求时出错: {str(e)}", 500)
+
+
+def sse_event(event: str, data) -> str:
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def chat_stream(request: Request):
+    """流式聊天端点（Server-Sent Events），事件与 app.py 相同"""
+    data = await read_json(request)
+    if not data:
+        return error("请求体不能为空", 400)
+
+    user_id = data.get("user_id", "default_user")
+    message = data.get("message", "").strip()
+    offline = data.get("mode") == "offline"
+    if not message:
+        return error("消息不能为空", 400)
+
+    async def generate():
+        try:
+            agent = await get_agent(user_id)
+            async for event in agent.recommend_stream(message, top_k=5, offline=offline):
+                yield sse_event(event.pop("event"), event)
+        except Exception as e:
+            print(f"错误: {str(e)}")
+            yield sse_event("error", {"success": False, "message": f"处理请求时出错: {str(e)}"})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def get_user_profile(request: Request):
+    """获取用户画像端点"""
+    user_id = request.path_params["user_id"]
+    try:
+        agent = await get_agent(user_id)
+
+        def build():
+            user_profile = agent.user_profile
+            profile = user_profile.profile
+            return {
+                "user_id": user_id,
+                "preferences": user_profile.get_preferences(),
+                "interaction_count": profile["interaction_count"],
+                "liked_items": user_profile.get_recent_feedback(liked=True, limit=10),  # 最近10个
+                "disliked_items": user_profile.get_recent_feedback(liked=False, limit=10),
+                "created_at": profile["created_at"],
+                "updated_at": profile["updated_at"]
+            }
+
+        return JSONResponse(await run_in_threadpool(build))
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return error(f"获取用户画像失败: {str(e)}", 500)
+
+
+async def submit_feedback(request: Request):
+    """提交反馈端点"""
+    try:
+        data = await read_json(request)
+        if not data:
+            return error("请求体不能为空", 400)
+
+        user_id = data.get("user_id", "default_user")
+        item_id = data.get("item_id")
+        if not item_id:
+            return error("item_id 不能为空", 400)
+
+        agent = await get_agent(user_id)
+        await run_in_threadpool(agent.feedback, item_id, data.get("liked", False), data.get("item_info"))
+
+        return JSONResponse({
+            "success": True,
+            "message": "感谢你的反馈！这将帮助我为你提供更好的推荐。"
+        })
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return error(f"提交反馈失败: {str(e)}", 500)
+
+
+async def update_preferences(request: Request):
+    """更新用户偏好端点"""
+    user_id = request.path_params["user_id"]
+    try:
+        data = await read_json(request)
+        if not data:
+            return error("请求体不能为空", 400)
+
+        agent = await get_agent(user_id)
+
+        def update():
+            # 更新偏好（合并为一次写入）
+            with agent.user_profile.batch():
+                for genre in data.get("genres", []):
+                    agent.user_profile.add_genre(genre)
+                for topic in data.get("topics", []):
+                    agent.user_profile.add_topic(topic)
+                if "reading_level" in data:
+                    agent.user_profile.update_preferences(reading_level=data["reading_level"])
+            return agent.user_profile.get_preferences()
+
+        preferences = await run_in_threadpool(update)
+        return JSONResponse({
+            "success": True,
+            "message": "偏好已更新",
+            "preferences": preferences
+        })
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return error(f"更新偏好失败: {str(e)}", 500)
+
+
+async def get_profile_summary(request: Request):
+    """获取用户画像摘要"""
+    user_id = request.path_params["user_id"]
+    try:
+        agent = await get_agent(user_id)
+        summary = await run_in_threadpool(agent.user_profile.get_profile_summary)
+        return JSONResponse({"user_id": user_id, "summary": summary})
+
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return error(f"获取摘要失败: {str(e)}", 500)
+
+
+async def http_exception(request: Request, exc: HTTPException):
+    """404 等错误处理"""
+    if exc.status_code == 404:
+        return error("端点不存在", 404)
+    return error(exc.detail or "请求错误", exc.status_code)
+
+
+async def internal_error(request: Request, exc: Exception):
+    """500 错误处理"""
+    return error("服务器内部错误", 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """应用关闭时释放绑定在事件循环上的LLM客户端连接池"""
+    yield
+    await close_shared_async_clients()
+
+
+routes = [
+    Route("/health", health_check, methods=["GET"]),
+    Route("/api/metrics", metrics, methods=["GET"]),
+    Route("/api/chat", chat, methods=["POST"]),
+    Route("/api/chat/stream", chat_stream, methods=["POST"]),
+    Route("/api/user/{user_id}", get_user_profile, methods=["GET"]),
+    Route("/api/feedback", submit_feedback, methods=["POST"]),
+    Route("/api/users/{user_id}/preferences", update_preferences, methods=["PUT"]),
+    Route("/api/users/{user_id}/summary", get_profile_summary, methods=["GET"]),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=os.getenv(
+                "CORS_ORIGINS", "http://localhost:3008,http://localhost:3000,http://127.0.0.1:3008"
+            ).split(","),
+            allow_methods=["GET", "POST", "PUT", "OPTIONS"],
+            allow_headers=["Content-Type"],
+        )
+    ],
+    exception_handlers={HTTPException: http_exception, 500: internal_error},
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # 检查 OpenAI API Key
+    if not os.getenv("OPENAI_API_KEY"):
+        print("警告: 未设置 OPENAI_API_KEY 环境变量")
+        print("请设置: export OPENAI_API_KEY='your-api-key'")
+
+    port = int(os.getenv("FLASK_PORT", 8010))
+    print("启动灵魂伴侣 ASGI 服务器...")
+    print(f"地址: http://localhost:{port}")
+    uvicorn.run(app, host="0.0.0.0", port=port)
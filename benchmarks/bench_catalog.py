@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+本地书目检索基准测试
+生成指定规模的合成书目（中英文混合的标题、作者、简介与标签），构建倒排索引，
+测量构建耗时与 top-k 查询（不过滤 / 语言过滤 / 语言+类型过滤）的延迟分位数
+
+用法:
+  python benchmarks/bench_catalog.py
+  python benchmarks/bench_catalog.py --books 1000000 --queries 500 --top-k 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soul_mate.catalog import CatalogIndex, normalize_record
+
+ZH_WORDS = [
+    "机器学习", "深度学习", "心理学", "历史", "哲学", "经济学", "小说", "科幻", "推理", "诗歌",
+    "人工智能", "统计", "算法", "编程", "数据", "文明", "宇宙", "城市", "战争", "艺术",
+    "设计", "管理", "创业", "投资", "教育", "医学", "生物", "物理", "化学", "数学",
+]
+EN_WORDS = [
+    "learning", "deep", "history", "philosophy", "economics", "fiction", "mystery", "poetry",
+    "python", "statistics", "algorithms", "design", "science", "mind", "war", "city",
+]
+SURNAMES = ["王", "李", "张", "刘", "陈", "杨", "赵", "黄", "周", "吴"]
+GIVEN = ["伟", "芳", "娜", "敏", "静", "磊", "洋", "勇", "艳", "杰", "涛", "明"]
+TYPES = ["book", "book", "book", "ebook", "audiobook"]
+
+
+def synthetic_books(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        if rng.random() < 0.8:
+            title = "".join(rng.sample(ZH_WORDS, 2)) + rng.choice(["入门", "简史", "导论", "实践", "精要"])
+            author = rng.choice(SURNAMES) + "".join(rng.sample(GIVEN, 2))
+            description = "一本关于" + "、".join(rng.sample(ZH_WORDS, 4)) + f"的书，第{i}号。"
+            language = "zh"
+        else:
+            title = " ".join(rng.sample(EN_WORDS, 3)).title()
+            author = f"Author {i % 5000}"
+            description = "A book about " + ", ".join(rng.sample(EN_WORDS, 5)) + "."
+            language = "en"
+        yield normalize_record({
+            "title": title, "author": author, "description": description,
+            "url": f"https://example.com/books/{i}", "type": rng.choice(TYPES),
+            "language": language, "tags": rng.sample(ZH_WORDS, 2),
+        })
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地书目检索基准测试")
+    parser.add_argument("--books", type=int, default=200_000, help="书目条数")
+    parser.add_argument("--queries", type=int, default=300, help="每种过滤条件的查询次数")
+    parser.add_argument("--top-k", type=int, default=20, help="每次查询返回的条数")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = CatalogIndex.build(synthetic_books(args.books))
+    build = time.perf_counter() - start
+    size = sum(a.nbytes for a in (index.offsets, index.docs, index.impacts, index.idf, index.languages, index.types))
+    print(f"books={len(index)} terms={len(index.terms)} postings={len(index.docs)} "
+          f"build={build:.1f}s index_arrays={size / 1e6:.1f}MB")
+
+    rng = random.Random(1)
+    queries = [
+        " ".join(rng.sample(ZH_WORDS, rng.randint(1, 3))) if rng.random() < 0.8 else " ".join(rng.sample(EN_WORDS, 2))
+        for _ in range(args.queries)
+    ]
+    for label, filters in (
+        ("no filter", {}),
+        ("language=zh", {"language": "zh"}),
+        ("zh + book", {"language": "zh", "content_type": "book"}),
+    ):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.top_k, **filters)
+            latencies.append(time.perf_counter() - start)
+        print(f"{label:<12} p50={percentile(latencies, 0.5) * 1000:7.2f}ms "
+              f"p95={percentile(latencies, 0.95) * 1000:7.2f}ms p99={percentile(latencies, 0.99) * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+二进制书目基准测试
+把合成书目分别存为 JSONL（启动时在内存中构建索引）与 .smcat（mmap 打开），
+在独立的子进程中测量冷启动打开耗时、打开后与查询后的内存占用（RSS / PSS）和查询延迟。
+打开前用 posix_fadvise 把文件移出页缓存，模拟冷启动；--workers 大于 1 时同时启动多个
+进程打开同一个 .smcat，PSS 体现页缓存共享
+
+用法:
+  python benchmarks/bench_catalog_file.py
+  python benchmarks/bench_catalog_file.py --books 1000000 --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_mb():
+    """当前进程的 RSS 与 PSS（MB），没有 /proc 时 PSS 为 None"""
+    rss = pss = None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return rss, pss
+
+
+def evict(path):
+    """把文件移出页缓存（尽力而为）"""
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def child(mode, path, queries, top_k, cold):
+    """子进程：打开书目、执行查询，输出一行 JSON 结果"""
+    from soul_mate.catalog import BookCatalog
+    from soul_mate.catalog_file import open_catalog
+
+    if cold:
+        evict(path)
+    rss_before, _ = memory_mb()
+    start = time.perf_counter()
+    catalog = open_catalog(path) if mode == "smcat" else BookCatalog.from_file(path)
+    open_seconds = time.perf_counter() - start
+    rss_open, _ = memory_mb()
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        catalog.search(query, top_k, language="zh")
+        latencies.append(time.perf_counter() - start)
+    rss_query, pss_query = memory_mb()
+    first = latencies[0]
+    latencies.sort()
+    print(json.dumps({
+        "open_s": open_seconds,
+        "rss_base": rss_before,
+        "rss_open": rss_open,
+        "rss_query": rss_query,
+        "pss_query": pss_query,
+        "first_ms": first * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+    }))
+
+
+def spawn(mode, path, args, queries_path, workers):
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, path,
+               "--queries-file", queries_path, "--top-k", str(args.top_k)]
+    if not args.warm:
+        command.append("--cold")
+    processes = [subprocess.Popen(command, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"子进程失败（{mode}）")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def fmt(value, unit="MB"):
+    return "   n/a" if value is None else f"{value:7.1f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="二进制书目基准测试")
+    parser.add_argument("--books", type=int, default=300_000, help="书目条数")
+    parser.add_argument("--queries", type=int, default=200, help="每个进程的查询次数")
+    parser.add_argument("--top-k", type=int, default=20, help="每次查询返回的条数")
+    parser.add_argument("--workers", type=int, default=1, help="同时打开 .smcat 的进程数")
+    parser.add_argument("--warm", action="store_true", help="不清除页缓存")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", help=argparse.SUPPRESS)
+    parser.add_argument("--cold", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = json.load(f)
+        child(args.child[0], args.child[1], queries, args.top_k, args.cold)
+        return
+
+    from bench_catalog import EN_WORDS, ZH_WORDS, synthetic_books
+    from soul_mate.catalog_file import write_catalog
+
+    workdir = tempfile.mkdtemp(prefix="bench_catalog_file_")
+    jsonl_path = os.path.join(workdir, "books.jsonl")
+    smcat_path = os.path.join(workdir, "books.smcat")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for record in synthetic_books(args.books):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    start = time.perf_counter()
+    write_catalog(synthetic_books(args.books), smcat_path)
+    print(f"books={args.books} jsonl={os.path.getsize(jsonl_path) / 1e6:.1f}MB "
+          f"smcat={os.path.getsize(smcat_path) / 1e6:.1f}MB build={time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(1)
+    queries = [
+        " ".join(rng.sample(ZH_WORDS, rng.randint(1, 3))) if rng.random() < 0.8 else " ".join(rng.sample(EN_WORDS, 2))
+        for _ in range(args.queries)
+    ]
+    queries_path = os.path.join(workdir, "queries.json")
+    with open(queries_path, "w", encoding="utf-8") as f:
+        json.dump(queries, f, ensure_ascii=False)
+
+    # 内存为整个进程的 RSS / PSS：base 为导入模块后、打开书目前；PSS 按共享进程数分摊共享页
+    print(f"{'format':<8} {'open':>9} {'rss_base':>10} {'rss_open':>10} {'rss_query':>10} {'pss_query':>10} "
+          f"{'first':>9} {'p50':>9} {'p99':>9}")
+    for mode, path, workers in (("jsonl", jsonl_path, 1), ("smcat", smcat_path, args.workers)):
+        for result in spawn(mode, path, args, queries_path, workers):
+            print(f"{mode:<8} {result['open_s'] * 1000:8.1f}ms {fmt(result['rss_base'])} {fmt(result['rss_open'])} "
+                  f"{fmt(result['rss_query'])} "
+                  f"{fmt(result['pss_query'])} {result['first_ms']:7.2f}ms {result['p50_ms']:7.2f}ms "
+                  f"{result['p99_ms']:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+请求合并基准测试
+模拟热门话题：大量新用户（画像为空）同时发出相同的请求，对比关闭与开启请求合并时
+LLM调用次数（偏好提取、请求分析）、内容来源调用次数与端到端延迟。
+分别测试多线程（SoulMateAgent，对应 Flask 后端）与事件循环（AsyncSoulMateAgent，对应 ASGI 后端）。
+结果缓存全部关闭，只体现合并本身的效果
+
+用法:
+  python benchmarks/bench_coalescing.py
+  python benchmarks/bench_coalescing.py --users 100 --latency 0.2 --fetch-delay 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import MockOpenAIServer
+
+# 同一个热门请求的几种写法（大小写、空白与末尾标点不同），规范化后相同
+VARIANTS = ["推荐几本 ChatGPT 相关的书", "推荐几本  chatgpt 相关的书？", "推荐几本 ChatGPT 相关的书!"]
+
+
+class CountingSource:
+    """带延迟的内容来源，统计实际调用次数"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _record(self, query):
+        with self._lock:
+            self.calls += 1
+        return [{"title": f"{query} 第{i}本", "url": f"https://example.com/{i}", "type": "book"} for i in range(5)]
+
+    def search(self, query, content_type, language):
+        time.sleep(self.delay)
+        return self._record(query)
+
+    async def asearch(self, query, content_type, language):
+        await asyncio.sleep(self.delay)
+        return self._record(query)
+
+
+def prepare(agent, source, coalesce):
+    from soul_mate import FunctionSource
+
+    agent.llm_client.coalesce = coalesce
+    agent.content_fetcher.coalesce = coalesce
+    for name in [s.name for s in agent.content_fetcher.sources]:
+        agent.content_fetcher.unregister_source(name)
+    agent.content_fetcher.register_source(
+        FunctionSource("trending", source.search, timeout=source.delay + 5, asearch=source.asearch)
+    )
+
+
+def report(label, server, source, latencies, users):
+    print(
+        f"{label:<16} users={users:<4} llm_calls={server.total_calls():<4} "
+        f"(extract={server.calls['extract']}, analyze={server.calls['analyze']}, recommend={server.calls['recommend']}) "
+        f"source_calls={source.calls:<4} mean={statistics.mean(latencies) * 1000:7.1f}ms "
+        f"max={max(latencies) * 1000:7.1f}ms"
+    )
+
+
+def run_threads(label, server, users, fetch_delay, coalesce):
+    from soul_mate import SoulMateAgent
+
+    server.reset()
+    source = CountingSource(fetch_delay)
+    agents = []
+    for u in range(users):
+        agent = SoulMateAgent(user_id=f"{label.replace('/', '-')}-{u}")
+        prepare(agent, source, coalesce)
+        agents.append(agent)
+    barrier = threading.Barrier(users)
+
+    def one(u):
+        barrier.wait()
+        start = time.perf_counter()
+        result = agents[u].recommend(VARIANTS[u % len(VARIANTS)])
+        assert result["success"], result["message"]
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        latencies = list(pool.map(one, range(users)))
+    for agent in agents:
+        agent.close()
+    report(label, server, source, latencies, users)
+
+
+def run_async(label, server, users, fetch_delay, coalesce):
+    from soul_mate import AsyncSoulMateAgent
+
+    server.reset()
+    source = CountingSource(fetch_delay)
+
+    async def main():
+        agents = []
+        for u in range(users):
+            agent = AsyncSoulMateAgent(user_id=f"{label.replace('/', '-')}-{u}")
+            prepare(agent, source, coalesce)
+            agents.append(agent)
+
+        async def one(u):
+            start = time.perf_counter()
+            result = await agents[u].recommend(VARIANTS[u % len(VARIANTS)])
+            assert result["success"], result["message"]
+            return time.perf_counter() - start
+
+        latencies = await asyncio.gather(*(one(u) for u in range(users)))
+        for agent in agents:
+            agent.close()
+        return latencies
+
+    report(label, server, source, asyncio.run(main()), users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求合并基准测试")
+    parser.add_argument("--users", type=int, default=50, help="同时发出相同请求的新用户数")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次LLM调用的延迟（秒）")
+    parser.add_argument("--fetch-delay", type=float, default=0.2, help="内容来源的延迟（秒）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_coalescing_")
+    os.chdir(workdir)  # 用户画像写到临时目录
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ["ANALYSIS_CACHE_SIZE"] = "0"
+    os.environ["FETCH_CACHE"] = "0"
+    os.environ["AGENT_FUSED_ANALYSIS"] = "0"
+    os.environ["AGENT_SPECULATIVE_FETCH"] = "0"
+    os.environ.pop("HF_MCP_COMMAND", None)
+    os.environ["MCP_CLI"] = "false"
+
+    with MockOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_API_BASE"] = server.base_url
+        for coalesce in (False, True):
+            suffix = "coalesce" if coalesce else "baseline"
+            run_threads(f"threads/{suffix}", server, args.users, args.fetch_delay, coalesce)
+            run_async(f"async/{suffix}", server, args.users, args.fetch_delay, coalesce)
+
+
+if __name__ == "__main__":
+    main()
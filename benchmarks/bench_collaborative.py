@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+协同过滤基准测试
+在 SQLite 画像存储中生成合成用户（每个用户属于一个兴趣群体，主要喜欢群体内的热门物品），测量：
+  - 完整构建与增量更新（只有少量用户修改过反馈）的耗时
+  - similar_items / recommend_for_user 的查询延迟
+  - 留一法的 hit-rate@10：每个用户留出最后一次喜欢，看是否出现在推荐中（对比全局最热门物品）
+
+用法:
+  python benchmarks/bench_collaborative.py
+  python benchmarks/bench_collaborative.py --users 50000 --items 20000 --changed 0.01
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soul_mate.collaborative import _SCAN_MARGIN, ItemCooccurrenceModel
+from soul_mate.profile_events import default_profile
+from soul_mate.sqlite_store import SQLiteProfileStore
+
+
+def item_entry(item, timestamp):
+    return {"item_id": f"item-{item}", "timestamp": timestamp, "title": f"合成书目{item}", "author": f"作者{item % 997}",
+            "type": "book"}
+
+
+def make_profile(user_id, liked, disliked, updated_at):
+    profile = default_profile(user_id)
+    profile["updated_at"] = updated_at
+    profile["feedback"] = {
+        "liked": [item_entry(item, f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}") for i, item in enumerate(liked)],
+        "disliked": [item_entry(item, "2026-01-01T00:00:00") for item in disliked],
+    }
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="协同过滤基准测试")
+    parser.add_argument("--users", type=int, default=20000, help="用户数")
+    parser.add_argument("--items", type=int, default=10000, help="物品数")
+    parser.add_argument("--groups", type=int, default=50, help="兴趣群体数")
+    parser.add_argument("--likes", type=int, default=20, help="每个用户的喜欢数")
+    parser.add_argument("--changed", type=float, default=0.01, help="增量更新前修改反馈的用户比例")
+    parser.add_argument("--queries", type=int, default=500, help="查询次数")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pools = [rng.sample(range(args.items), args.items // args.groups * 2) for _ in range(args.groups)]
+    weights = [1.0 / (rank + 1) for rank in range(len(pools[0]))]  # 群体内按热度（Zipf）选择
+
+    def sample_likes(group, count):
+        liked = []
+        while len(liked) < count:
+            item = rng.choices(pools[group], weights)[0]
+            if item not in liked:
+                liked.append(item)
+        return liked
+
+    store = SQLiteProfileStore(os.path.join(tempfile.mkdtemp(prefix="bench_cf_"), "profiles.db"))
+    groups, held_out, profiles = {}, {}, []
+    for u in range(args.users):
+        user_id = f"user-{u}"
+        groups[user_id] = group = rng.randrange(args.groups)
+        liked = sample_likes(group, args.likes + 1)
+        held_out[user_id] = liked.pop()
+        disliked = rng.sample(pools[(group + 1) % args.groups], 2)
+        profiles.append(make_profile(user_id, liked, disliked, "2026-01-01T00:00:00"))
+    store.import_profiles(profiles)
+    # 增量扫描会回退 _SCAN_MARGIN 秒，等它过去，以免刚导入的用户在增量更新中被重新读取
+    time.sleep(_SCAN_MARGIN)
+
+    model = ItemCooccurrenceModel()
+    start = time.perf_counter()
+    model.fit(store)
+    print(f"fit: {time.perf_counter() - start:.2f}s users={args.users} items={len(model)} "
+          f"cooccurrence_nnz={model.cooccurrence.nnz} similarity_nnz={model.similarity.nnz}")
+
+    # 少量用户追加了喜欢：增量更新只读取这些用户
+    changed = []
+    now = datetime.now().isoformat()
+    for u in rng.sample(range(args.users), max(int(args.users * args.changed), 1)):
+        user_id = f"user-{u}"
+        liked = [int(entry["item_id"][5:]) for entry in store.load_collections(user_id)["feedback"]["liked"]]
+        liked += [item for item in sample_likes(groups[user_id], 3) if item not in liked]
+        changed.append(make_profile(user_id, liked, [], now))
+    store.import_profiles(changed)
+    start = time.perf_counter()
+    users = model.update(store)
+    print(f"incremental update: {time.perf_counter() - start:.2f}s ({users} users re-read)")
+
+    user_ids = rng.sample(sorted(groups), min(args.queries, args.users))
+    start = time.perf_counter()
+    for user_id in user_ids:
+        model.similar_items(f"item-{held_out[user_id]}", 10)
+    print(f"similar_items: {(time.perf_counter() - start) / len(user_ids) * 1000:.3f}ms per query")
+
+    start = time.perf_counter()
+    hits = 0
+    for user_id in user_ids:
+        recommended = model.recommend_for_user(user_id, 10)
+        hits += f"合成书目{held_out[user_id]}" in {item["title"] for item in recommended}
+    print(f"recommend_for_user: {(time.perf_counter() - start) / len(user_ids) * 1000:.3f}ms per query, "
+          f"hit-rate@10={hits / len(user_ids):.3f}")
+
+    popularity = Counter(item for profile in profiles for item in (
+        int(entry["item_id"][5:]) for entry in profile["feedback"]["liked"]
+    ))
+    top = {item for item, _ in popularity.most_common(10)}
+    print(f"popularity baseline hit-rate@10={sum(held_out[user_id] in top for user_id in user_ids) / len(user_ids):.3f}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
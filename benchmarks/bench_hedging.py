@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+LLM调用重试与对冲基准测试
+假 OpenAI 服务器让一部分调用进入长尾（额外等待）、一部分返回 503，
+对比不重试、只重试、重试+对冲、重试+对冲到更快的备用模型 四种策略的成功率与延迟分位数，
+并输出 LLMClient 的调用统计（尝试、重试、对冲、对冲获胜次数）
+
+用法:
+  python benchmarks/bench_hedging.py
+  python benchmarks/bench_hedging.py --requests 400 --tail-rate 0.05 --tail-latency 2 --error-rate 0.05
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import MockOpenAIServer
+
+HEDGE_MODEL = "mock-mini"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run(label, server, policy, requests, concurrency):
+    from soul_mate.llm_client import LLMClient, LLMError
+
+    server.reset()
+    client = LLMClient(model="mock", api_key="test", api_base=server.base_url)
+    client.policies["analyze"] = policy
+    messages = [{"role": "system", "content": "你是一个名为\"灵魂伴侣\"的阅读推荐Agent"},
+                {"role": "user", "content": "用户请求：推荐机器学习的书"}]
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            client.complete(messages, temperature=0.3, method="analyze")
+            ok = True
+        except LLMError:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+
+    latencies = [latency for ok, latency in results if ok]
+    success = len(latencies) / len(results)
+    stats = client.call_stats()["analyze"]
+    print(
+        f"{label:<14} success={success:6.1%} "
+        f"p50={percentile(latencies, 0.5) * 1000:7.1f}ms p95={percentile(latencies, 0.95) * 1000:7.1f}ms "
+        f"p99={percentile(latencies, 0.99) * 1000:7.1f}ms mean={statistics.mean(latencies) * 1000:7.1f}ms "
+        f"server_calls={sum(server.calls.values())} "
+        f"attempts={stats['attempts']} retries={stats['retries']} hedges={stats['hedges']} "
+        f"hedge_wins={stats['hedge_wins']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM调用重试与对冲基准测试")
+    parser.add_argument("--requests", type=int, default=300, help="每种策略的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--latency", type=float, default=0.1, help="正常调用的延迟（秒）")
+    parser.add_argument("--tail-latency", type=float, default=2.0, help="长尾调用额外的延迟（秒）")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="长尾调用的比例")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="返回 503 的比例")
+    parser.add_argument("--hedge-quantile", type=float, default=0.9,
+                        help="对冲延迟取近期耗时的分位数（长尾比例接近 1-分位数时对冲时机会落在长尾上）")
+    parser.add_argument("--timeout", type=float, default=5.0, help="每次调用的截止时间（秒）")
+    args = parser.parse_args()
+
+    from soul_mate.llm_policy import CallPolicy
+
+    policies = [
+        ("no-retry", CallPolicy(timeout=args.timeout, max_attempts=1)),
+        ("retry", CallPolicy(timeout=args.timeout, max_attempts=3, backoff_base=0.05)),
+        ("retry+hedge", CallPolicy(timeout=args.timeout, max_attempts=3, backoff_base=0.05,
+                                   hedge=True, hedge_quantile=args.hedge_quantile, hedge_delay=args.latency * 2)),
+        ("hedge->mini", CallPolicy(timeout=args.timeout, max_attempts=3, backoff_base=0.05,
+                                   hedge=True, hedge_quantile=args.hedge_quantile, hedge_delay=args.latency * 2,
+                                   hedge_model=HEDGE_MODEL)),
+    ]
+    with MockOpenAIServer(
+        latency=args.latency,
+        tail_latency=args.tail_latency,
+        tail_rate=args.tail_rate,
+        error_rate=args.error_rate,
+        model_latency={HEDGE_MODEL: args.latency / 2},
+        seed=0
+    ) as server:
+        for label, policy in policies:
+            run(label, server, policy, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
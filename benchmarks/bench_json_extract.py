@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+模型输出 JSON 提取的语料测试、模糊测试与基准测试
+
+1. 语料：benchmarks/json_corpus.jsonl 中每条畸形输出（代码块、前后说明文字、多余逗号、截断……）
+   分别整段输入和随机分块输入 JSONStream，结果必须与期望值一致；同时统计旧的
+   split("```json") + json.loads 写法能解析多少条
+2. 模糊测试：对合法的推荐数组与分析对象随机截断、加前后缀、随机分块，检查不变式：
+   只抛出 JSONExtractError、分块结果与整段结果相同、截断数组只保留原数组的前缀元素
+3. 基准：完整回复的单次提取耗时（与旧写法对比）
+
+用法:
+  python benchmarks/bench_json_extract.py
+  python benchmarks/bench_json_extract.py --fuzz 5000 --seed 1
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soul_mate.json_stream import JSONExtractError, JSONStream, extract_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "json_corpus.jsonl")
+
+SEED_ARRAY = [
+    {"index": i + 1, "title": f"候选{i + 1}", "reason": "适合入门，包含 [示例] 与 {代码}",
+     "highlights": "结构清晰", "scenario": "通勤时阅读", "score": 9 - i}
+    for i in range(5)
+]
+SEED_OBJECT = {
+    "is_related": True, "topics": ["机器学习", "深度学习"], "content_type": "both", "purpose": "learning",
+    "level": "beginner", "mood": "neutral", "language": "zh", "refusal_message": None,
+}
+PREFIXES = ["", "好的，结果如下：\n", "```json\n", "```\n", "根据[用户画像]分析：\n```json\n"]
+SUFFIXES = ["", "\n```", "\n```\n希望对你有帮助！", "\n\n以上仅供参考 [1]"]
+
+
+def legacy_extract(response: str):
+    """旧写法：按代码块标记切分后整段 json.loads"""
+    if "```json" in response:
+        response = response.split("```json")[1].split("```")[0].strip()
+    elif "```" in response:
+        response = response.split("```")[1].split("```")[0].strip()
+    return json.loads(response.strip())
+
+
+def feed_chunks(text: str, expect, rng: random.Random):
+    """随机分块输入，返回 (feed 产出的元素, 最终结果或异常)"""
+    stream = JSONStream(expect)
+    emitted = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        emitted.extend(stream.feed(text[i:i + size]))
+        i += size
+    try:
+        return emitted, stream.result()
+    except JSONExtractError as e:
+        return emitted, e
+
+
+def run_corpus(rng: random.Random) -> bool:
+    with open(CORPUS, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    ok = legacy_ok = 0
+    for case in cases:
+        try:
+            whole = extract_json(case["text"], case["expect"])
+        except JSONExtractError:
+            whole = None
+        passed = whole == case["value"]
+        for _ in range(20):
+            _, chunked = feed_chunks(case["text"], case["expect"], rng)
+            passed = passed and (None if isinstance(chunked, JSONExtractError) else chunked) == case["value"]
+        ok += passed
+        if not passed:
+            print(f"  FAIL {case['name']}: {whole!r}")
+
+        try:
+            legacy_ok += legacy_extract(case["text"]) == case["value"]
+        except Exception:
+            pass
+
+    print(f"corpus: {ok}/{len(cases)} passed (legacy split+json.loads: {legacy_ok}/{len(cases)})")
+    return ok == len(cases)
+
+
+def run_fuzz(iterations: int, rng: random.Random) -> bool:
+    failures = 0
+    for _ in range(iterations):
+        seed = rng.choice([SEED_ARRAY, SEED_OBJECT])
+        expect = "[" if isinstance(seed, list) else "{"
+        body = json.dumps(seed, ensure_ascii=False, indent=rng.choice([None, 2]))
+        cut = rng.randint(0, len(body)) if rng.random() < 0.6 else len(body)
+        text = rng.choice(PREFIXES) + body[:cut] + (rng.choice(SUFFIXES) if cut == len(body) else "")
+
+        try:
+            whole = extract_json(text, expect)
+        except JSONExtractError as e:
+            whole = e
+        except Exception as e:
+            failures += 1
+            print(f"  unexpected {type(e).__name__}: {e} for {text!r}")
+            continue
+
+        emitted, chunked = feed_chunks(text, expect, rng)
+        same = (type(whole) is type(chunked)) if isinstance(whole, Exception) else whole == chunked
+        if not same:
+            failures += 1
+            print(f"  chunked != whole for {text!r}")
+            continue
+
+        if expect == "[" and not isinstance(whole, Exception):
+            # 截断的数组只能保留原数组的前缀；feed 产出的元素就是最终结果
+            if whole != seed[:len(whole)] or emitted != whole:
+                failures += 1
+                print(f"  not a prefix: {whole!r}")
+        elif expect == "{" and isinstance(whole, dict):
+            # 修复后的对象只能包含原对象中取值完整的字段
+            if any(key not in seed or seed[key] != value and not isinstance(value, list)
+                   for key, value in whole.items()):
+                failures += 1
+                print(f"  bad repair: {whole!r}")
+
+    print(f"fuzz: {iterations - failures}/{iterations} passed")
+    return failures == 0
+
+
+def run_bench(rounds: int):
+    samples = [
+        ("array", "```json\n" + json.dumps(SEED_ARRAY, ensure_ascii=False, indent=2) + "\n```", "["),
+        ("object", "```json\n" + json.dumps(SEED_OBJECT, ensure_ascii=False, indent=2) + "\n```", "{"),
+    ]
+    for name, text, expect in samples:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            legacy_extract(text)
+        legacy = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            extract_json(text, expect)
+        stream = (time.perf_counter() - start) / rounds
+        print(
+            f"{name:<7} {len(text):5d} chars  legacy={legacy * 1e6:7.1f}us  "
+            f"JSONStream={stream * 1e6:7.1f}us"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型输出 JSON 提取的语料、模糊与基准测试")
+    parser.add_argument("--fuzz", type=int, default=2000, help="模糊测试次数")
+    parser.add_argument("--rounds", type=int, default=2000, help="基准测试每个样本的提取次数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ok = run_corpus(rng)
+    ok = run_fuzz(args.fuzz, rng) and ok
+    run_bench(args.rounds)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
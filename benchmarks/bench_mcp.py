@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Hugging Face MCP 调用方式基准测试
+对比每次启动子进程（manus-mcp-cli 方式）与持久化 MCP 会话的延迟，服务端使用本地假服务器
+
+用法:
+  python benchmarks/bench_mcp.py
+  python benchmarks/bench_mcp.py --calls 50 --concurrency 8 --delay 0.05
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soul_mate.content_fetcher import ContentFetcher
+from soul_mate.mcp_client import get_mcp_session
+
+FAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mcp_server.py")
+
+
+def run(label: str, fetcher: ContentFetcher, calls: int, concurrency: int):
+    def one(i):
+        start = time.perf_counter()
+        results = fetcher._call_huggingface(f"query {i}", "paper", timeout=30)
+        assert results, "空结果"
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, range(calls)))
+    wall = time.perf_counter() - start
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{label:<12} calls={calls:<4} wall={wall:7.3f}s "
+        f"p50={statistics.median(latencies) * 1000:7.1f}ms p95={p95 * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 调用方式基准测试")
+    parser.add_argument("--calls", type=int, default=30, help="调用次数")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发线程数")
+    parser.add_argument("--delay", type=float, default=0.02, help="服务器处理每次调用的延迟（秒）")
+    parser.add_argument("--startup-delay", type=float, default=0.1, help="服务器进程启动延迟（秒）")
+    args = parser.parse_args()
+
+    server = f"{sys.executable} {FAKE_SERVER} --delay {args.delay} --startup-delay {args.startup_delay}"
+    fetcher = ContentFetcher()
+
+    os.environ.pop("HF_MCP_COMMAND", None)
+    os.environ["MCP_CLI"] = server
+    run("subprocess", fetcher, args.calls, args.concurrency)
+
+    os.environ["HF_MCP_COMMAND"] = server
+    get_mcp_session(server).connect()  # 预热：启动与握手只发生一次
+    run("session", fetcher, args.calls, args.concurrency)
+    get_mcp_session(server).close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+推荐流水线基准测试
+对比逐步模式（偏好提取 → 请求分析 → 生成推荐）与融合模式（偏好提取与请求分析合并为一次调用，
+可选推测性抓取）的串行LLM调用次数与端到端延迟。LLM 使用本地假 OpenAI 服务器
+
+用法:
+  python benchmarks/bench_pipeline.py
+  python benchmarks/bench_pipeline.py --users 10 --requests 5 --latency 0.2 --fetch-delay 0.1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import MockOpenAIServer
+
+INPUTS = [
+    "推荐几本机器学习入门书",
+    "想看点轻松的小说",
+    "最近对心理学很感兴趣",
+    "有什么适合周末读的书",
+    "深度学习方面的经典著作",
+]
+
+MODES = [
+    ("sequential", dict(fused_analysis=False, speculative_fetch=False)),
+    ("fused", dict(fused_analysis=True, speculative_fetch=False)),
+    ("fused+spec", dict(fused_analysis=True, speculative_fetch=True)),
+]
+
+
+def run(label: str, options: dict, server: MockOpenAIServer, users: int, requests: int, fetch_delay: float):
+    from soul_mate import FunctionSource, SoulMateAgent
+
+    def slow_source(query, content_type, language):
+        time.sleep(fetch_delay)
+        return [{"title": f"{query} 延迟来源", "url": f"https://example.com/{query}", "type": "book"}]
+
+    server.reset()
+    latencies = []
+    for u in range(users):
+        agent = SoulMateAgent(user_id=f"{label}-{u}", **options)
+        if fetch_delay > 0:
+            agent.content_fetcher.register_source(FunctionSource("slow", slow_source, timeout=fetch_delay + 1))
+        for i in range(requests):
+            start = time.perf_counter()
+            result = agent.recommend(INPUTS[(u + i) % len(INPUTS)] + f" #{u}-{i}")
+            latencies.append(time.perf_counter() - start)
+            assert result["success"], result["message"]
+        agent.close()
+
+    total = users * requests
+    print(
+        f"{label:<11} requests={total:<4} llm_calls/req={server.total_calls() / total:5.2f} "
+        f"mean={statistics.mean(latencies) * 1000:7.1f}ms p50={statistics.median(latencies) * 1000:7.1f}ms "
+        f"calls={dict(server.calls)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推荐流水线基准测试")
+    parser.add_argument("--users", type=int, default=5, help="用户数（每个用户都从新用户开始）")
+    parser.add_argument("--requests", type=int, default=5, help="每个用户的请求数（前3次为新用户）")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次LLM调用的延迟（秒）")
+    parser.add_argument("--fetch-delay", type=float, default=0.1, help="附加的慢速内容来源延迟（秒），0 表示不添加")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)  # 用户画像写到临时目录
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ["ANALYSIS_CACHE_SIZE"] = "0"
+    os.environ["FETCH_CACHE"] = "0"
+    os.environ.pop("HF_MCP_COMMAND", None)
+    os.environ["MCP_CLI"] = "false"
+
+    with MockOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_API_BASE"] = server.base_url
+        for label, options in MODES:
+            run(label, options, server, args.users, args.requests, args.fetch_delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+候选项预排序基准测试
+对比不预排序（最多20个完整候选项进入推荐提示词）与本地预排序（前N个、描述截断）的
+推荐提示词长度、端到端延迟，以及最终推荐中相关候选项的比例。
+LLM 使用本地假 OpenAI 服务器，延迟随提示词长度增加（模拟预填充耗时）
+
+用法:
+  python benchmarks/bench_prerank.py
+  python benchmarks/bench_prerank.py --candidates 30 --top-n 10 --description-chars 160
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import MockOpenAIServer
+
+TOPICS = ["机器学习", "历史", "烹饪", "旅行", "经济学", "摄影", "园艺", "建筑"]
+FILLER = "本书内容丰富，案例翔实，适合不同阶段的读者阅读，作者用通俗的语言讲述了大量背景知识与实践经验。"
+
+
+def make_candidates(count: int, rng: random.Random):
+    """生成候选项：约四分之一与机器学习相关，其余为其他主题"""
+    items = []
+    for i in range(count):
+        topic = "机器学习" if i % 4 == 3 else rng.choice(TOPICS[1:])
+        items.append({
+            "title": f"{topic}实践第{i + 1}卷",
+            "author": "周志华" if i == 7 else f"作者{i}",
+            "description": f"一本关于{topic}的书。" + FILLER * 4,
+            "url": f"https://example.com/{i}",
+            "source": "本地书库",
+            "type": "book",
+            "relevant": topic == "机器学习",
+        })
+    return items
+
+
+def estimate_tokens(chars: int, text_sample: str) -> float:
+    """粗略估算 token 数：中文约每字一个 token，其余约每4个字符一个 token"""
+    cjk = len(re.findall(r"[\u4e00-\u9fff]", text_sample))
+    ratio = (cjk + (len(text_sample) - cjk) / 4) / max(len(text_sample), 1)
+    return chars * ratio
+
+
+def run(label, server, candidates, requests, top_n, description_chars):
+    from soul_mate import FunctionSource, SoulMateAgent
+
+    server.reset()
+    agent = SoulMateAgent(user_id=f"bench-{label}", prerank_top_n=top_n)
+    agent.llm_client.description_chars = description_chars
+    # 只使用合成的候选项，便于统计相关比例
+    for name in [source.name for source in agent.content_fetcher.sources]:
+        agent.content_fetcher.unregister_source(name)
+    agent.content_fetcher.register_source(FunctionSource("local", lambda q, c, l: [dict(x) for x in candidates]))
+    # 跳过新用户阶段，画像中加入偏好作者
+    with agent.user_profile.batch():
+        for _ in range(3):
+            agent.user_profile.increment_interaction()
+        agent.user_profile.add_author("周志华")
+
+    latencies, relevant = [], []
+    for i in range(requests):
+        start = time.perf_counter()
+        result = agent.recommend(f"推荐几本机器学习的书 #{i}")
+        latencies.append(time.perf_counter() - start)
+        assert result["success"], result["message"]
+        recs = result["recommendations"]
+        relevant.append(sum(1 for item in recs if item.get("relevant")) / max(len(recs), 1))
+    agent.close()
+
+    prompt_chars = server.prompt_chars["recommend"] / max(server.calls["recommend"], 1)
+    return prompt_chars, latencies, relevant
+
+
+def main():
+    parser = argparse.ArgumentParser(description="候选项预排序基准测试")
+    parser.add_argument("--candidates", type=int, default=30, help="内容来源返回的候选项数")
+    parser.add_argument("--requests", type=int, default=10, help="每种模式的请求数")
+    parser.add_argument("--top-n", type=int, default=10, help="预排序后保留的候选项数")
+    parser.add_argument("--description-chars", type=int, default=160, help="提示词中描述的最大字符数")
+    parser.add_argument("--latency", type=float, default=0.1, help="每次LLM调用的固定延迟（秒）")
+    parser.add_argument("--prompt-latency", type=float, default=0.05, help="每千个提示词字符的额外延迟（秒）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_prerank_")
+    os.chdir(workdir)  # 用户画像写到临时目录
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ["ANALYSIS_CACHE_SIZE"] = "0"
+    os.environ["FETCH_CACHE"] = "0"
+    os.environ["AGENT_FUSED_ANALYSIS"] = "1"
+    os.environ.pop("HF_MCP_COMMAND", None)
+    os.environ["MCP_CLI"] = "false"
+
+    candidates = make_candidates(args.candidates, random.Random(0))
+    sample = candidates[0]["description"]
+
+    # 预排序本身的耗时
+    from soul_mate.ranker import CandidateRanker
+    ranker = CandidateRanker()
+    start = time.perf_counter()
+    for _ in range(200):
+        ranker.rank(candidates, "机器学习", {"topics": ["人工智能"], "authors": ["周志华"]}, top_n=args.top_n)
+    print(f"ranker: {(time.perf_counter() - start) / 200 * 1000:.2f}ms per request ({args.candidates} candidates)")
+
+    with MockOpenAIServer(latency=args.latency, prompt_latency=args.prompt_latency) as server:
+        os.environ["OPENAI_API_BASE"] = server.base_url
+        modes = [
+            ("baseline", 0, 0),
+            ("prerank", args.top_n, args.description_chars),
+        ]
+        for label, top_n, description_chars in modes:
+            prompt_chars, latencies, relevant = run(
+                label, server, candidates, args.requests, top_n, description_chars
+            )
+            print(
+                f"{label:<9} recommend_prompt={prompt_chars:7.0f} chars (~{estimate_tokens(prompt_chars, sample):6.0f} tokens) "
+                f"e2e mean={statistics.mean(latencies) * 1000:7.1f}ms "
+                f"relevant_in_recs={statistics.mean(relevant):5.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
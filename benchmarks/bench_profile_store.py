@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+画像存储后端基准测试
+对比整文件JSON与追加写事件日志在用户历史增长时的单次修改耗时
+
+用法:
+  python benchmarks/bench_profile_store.py                 # 增长到 100k 条事件
+  python benchmarks/bench_profile_store.py --max-events 20000 --skip-json
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soul_mate.profile_store import EventLogProfileStore, JSONProfileStore
+from soul_mate.user_profile import UserProfile
+
+
+def measure(profile: UserProfile, samples: int) -> float:
+    """测量单次修改（含持久化）的平均耗时，单位毫秒"""
+    start = time.perf_counter()
+    for i in range(samples):
+        profile.add_reading_history({"title": f"probe-{i}", "type": "book"})
+    return (time.perf_counter() - start) / samples * 1000
+
+
+def run(name: str, store_factory, checkpoints, samples: int):
+    data_dir = tempfile.mkdtemp(prefix="bench_profile_")
+    try:
+        store = store_factory(data_dir)
+        profile = UserProfile("bench_user", data_dir, write_behind=False, store=store)
+        grown = 0
+        print(f"\n[{name}]")
+        print(f"{'history':>10} {'ms/mutation':>14}")
+        for target in checkpoints:
+            # 批量灌入历史，不计入测量
+            with profile.batch():
+                while grown < target:
+                    profile.add_reading_history({"title": f"book-{grown}", "type": "book"})
+                    grown += 1
+            if hasattr(store, "wait_for_compaction"):
+                store.wait_for_compaction()
+            print(f"{target:>10} {measure(profile, samples):>14.3f}")
+            grown += samples
+        store.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="画像存储后端基准测试")
+    parser.add_argument("--max-events", type=int, default=100_000, help="历史增长上限")
+    parser.add_argument("--samples", type=int, default=50, help="每个检查点测量的修改次数")
+    parser.add_argument("--skip-json", action="store_true", help="跳过整文件JSON后端")
+    parser.add_argument("--no-fsync", action="store_true", help="事件日志追加时不 fsync")
+    args = parser.parse_args()
+
+    checkpoints = [n for n in (1_000, 10_000, 50_000, 100_000) if n <= args.max_events]
+    if not checkpoints or checkpoints[-1] != args.max_events:
+        checkpoints.append(args.max_events)
+
+    run(
+        "eventlog",
+        lambda d: EventLogProfileStore(d, fsync=not args.no_fsync),
+        checkpoints,
+        args.samples,
+    )
+    if not args.skip_json:
+        run("json", JSONProfileStore, checkpoints, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+流式推荐基准测试
+对比 recommend（等待完整回复后一次返回）与 recommend_stream（每条推荐闭合后立即产出）的
+首条推荐时间与总耗时。LLM 使用本地假 OpenAI 服务器，回复按块生成、块之间等待 token_delay
+
+用法:
+  python benchmarks/bench_stream.py
+  python benchmarks/bench_stream.py --requests 10 --latency 0.2 --token-delay 0.02
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai_server import MockOpenAIServer
+
+
+def local_source(query, content_type, language):
+    return [
+        {"title": f"{query} 第{i + 1}本", "url": f"https://example.com/{i}", "type": "book"}
+        for i in range(10)
+    ]
+
+
+def make_agent(user_id: str):
+    from soul_mate import FunctionSource, SoulMateAgent
+
+    agent = SoulMateAgent(user_id=user_id, fused_analysis=True)
+    agent.content_fetcher.register_source(FunctionSource("local", local_source))
+    # 跳过新用户的偏好提取，只比较生成推荐这一步
+    with agent.user_profile.batch():
+        for _ in range(3):
+            agent.user_profile.increment_interaction()
+    return agent
+
+
+def report(label: str, first: list, total: list):
+    print(
+        f"{label:<10} first_rec p50={statistics.median(first) * 1000:7.1f}ms "
+        f"mean={statistics.mean(first) * 1000:7.1f}ms | "
+        f"total p50={statistics.median(total) * 1000:7.1f}ms mean={statistics.mean(total) * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式推荐基准测试")
+    parser.add_argument("--requests", type=int, default=10, help="每种模式的请求数")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次LLM调用的首字延迟（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="流式回复每块之间的间隔（秒）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_stream_")
+    os.chdir(workdir)  # 用户画像写到临时目录
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ["ANALYSIS_CACHE_SIZE"] = "0"
+    os.environ["FETCH_CACHE"] = "0"
+    os.environ.pop("HF_MCP_COMMAND", None)
+    os.environ["MCP_CLI"] = "false"
+
+    with MockOpenAIServer(latency=args.latency, token_delay=args.token_delay) as server:
+        os.environ["OPENAI_API_BASE"] = server.base_url
+
+        first, total = [], []
+        agent = make_agent("bench-blocking")
+        for i in range(args.requests):
+            start = time.perf_counter()
+            result = agent.recommend(f"推荐几本机器学习入门书 #{i}")
+            elapsed = time.perf_counter() - start
+            assert result["success"], result["message"]
+            first.append(elapsed)
+            total.append(elapsed)
+        agent.close()
+        report("blocking", first, total)
+
+        first, total = [], []
+        agent = make_agent("bench-stream")
+        for i in range(args.requests):
+            start = time.perf_counter()
+            first_at = None
+            for event in agent.recommend_stream(f"推荐几本机器学习入门书 #{i}"):
+                if event["event"] == "recommendation" and first_at is None:
+                    first_at = time.perf_counter() - start
+                if event["event"] == "done":
+                    assert event["result"]["success"], event["result"]["message"]
+            total.append(time.perf_counter() - start)
+            first.append(first_at)
+        agent.close()
+        report("stream", first, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+本地假 Hugging Face MCP 服务器（用于测试与基准测试）
+
+两种模式:
+  python benchmarks/fake_mcp_server.py                       # stdio JSON-RPC 长连接服务器
+  python benchmarks/fake_mcp_server.py tool call search_papers --server hugging-face --input '{"query": "AI"}'
+                                                             # 模拟 manus-mcp-cli 的一次性调用
+
+选项:
+  --delay SECONDS          每次工具调用的处理延迟
+  --startup-delay SECONDS  进程启动到可以服务的延迟（模拟二进制启动与握手开销）
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+
+TOOLS = ["search_papers", "search_models", "search_datasets"]
+
+
+def search(tool: str, arguments: dict):
+    """生成确定性的假搜索结果"""
+    query = arguments.get("query", "")
+    limit = int(arguments.get("limit", 10))
+    kind = tool.replace("search_", "").rstrip("s")
+    return [
+        {
+            "id": f"fake/{kind}-{i}",
+            "title": f"{query} {kind} #{i}",
+            "author": "fake-author",
+            "description": f"Fake {kind} about {query}",
+            "url": f"https://huggingface.co/fake/{kind}-{i}",
+        }
+        for i in range(1, limit + 1)
+    ]
+
+
+def run_cli(args):
+    """模拟 manus-mcp-cli tool call：启动、执行一次调用、输出 JSON 后退出"""
+    time.sleep(args.startup_delay)
+    if args.tool not in TOOLS:
+        print(f"unknown tool: {args.tool}", file=sys.stderr)
+        sys.exit(1)
+    time.sleep(args.delay)
+    print(json.dumps(search(args.tool, json.loads(args.input or "{}")), ensure_ascii=False))
+
+
+def run_server(args):
+    """stdio JSON-RPC 服务器，工具调用在独立线程中处理以模拟并发"""
+    time.sleep(args.startup_delay)
+    write_lock = threading.Lock()
+
+    def reply(message: dict):
+        with write_lock:
+            sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    def handle_call(request_id, params):
+        time.sleep(args.delay)
+        name = params.get("name")
+        if name not in TOOLS:
+            reply({"jsonrpc": "2.0", "id": request_id, "result": {
+                "content": [{"type": "text", "text": f"unknown tool: {name}"}],
+                "isError": True,
+            }})
+            return
+        items = search(name, params.get("arguments", {}))
+        reply({"jsonrpc": "2.0", "id": request_id, "result": {
+            "content": [{"type": "text", "text": json.dumps(items, ensure_ascii=False)}],
+            "isError": False,
+        }})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        message = json.loads(line)
+        method = message.get("method")
+        request_id = message.get("id")
+        if request_id is None:
+            continue  # 通知
+        if method == "initialize":
+            reply({"jsonrpc": "2.0", "id": request_id, "result": {
+                "protocolVersion": message["params"].get("protocolVersion"),
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "fake-hugging-face", "version": "0.1.0"},
+            }})
+        elif method == "tools/list":
+            reply({"jsonrpc": "2.0", "id": request_id, "result": {
+                "tools": [{"name": name, "inputSchema": {"type": "object"}} for name in TOOLS],
+            }})
+        elif method == "tools/call":
+            threading.Thread(
+                target=handle_call, args=(request_id, message.get("params", {})), daemon=True
+            ).start()
+        else:
+            reply({"jsonrpc": "2.0", "id": request_id, "error": {
+                "code": -32601, "message": f"method not found: {method}",
+            }})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地假 Hugging Face MCP 服务器")
+    parser.add_argument("--delay", type=float, default=0.0, help="每次工具调用的处理延迟（秒）")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="启动延迟（秒）")
+    sub = parser.add_subparsers(dest="mode")
+    tool = sub.add_parser("tool")
+    tool.add_argument("action", choices=["call"])
+    tool.add_argument("tool")
+    tool.add_argument("--server", default="hugging-face")
+    tool.add_argument("--input", default="{}")
+    args = parser.parse_args()
+
+    if args.mode == "tool":
+        run_cli(args)
+    else:
+        run_server(args)
+
+
+if __name__ == "__main__":
+    main()
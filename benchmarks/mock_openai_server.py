@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+本地假 OpenAI 兼容服务器（用于基准测试）
+
+按系统提示词识别调用类型（请求分析 / 融合分析 / 偏好提取 / 生成推荐），返回确定性的 JSON 回复，
+并在每次调用前等待固定延迟，模拟一次网络往返与模型推理；
+请求 stream=True 时按 SSE 分块返回，每块之间等待 token_delay，模拟逐段生成；
+非流式请求等待同样的生成时间后一次返回；
+可以让一部分调用额外等待 tail_latency（模拟长尾），或以 error_rate 的概率返回 503
+
+用法:
+  python benchmarks/mock_openai_server.py --port 8765 --latency 0.2
+  # 然后设置 OPENAI_API_BASE=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test
+
+也可以在基准测试脚本中直接使用:
+  with MockOpenAIServer(latency=0.2) as server:
+      os.environ["OPENAI_API_BASE"] = server.base_url
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+KNOWN_TOPICS = ["机器学习", "深度学习", "小说", "心理", "历史", "科幻"]
+
+
+def _topics(text: str):
+    return [topic for topic in KNOWN_TOPICS if topic in text]
+
+
+def _candidate_count(text: str) -> int:
+    return len(re.findall(r"^\[\d+\] 标题", text, flags=re.M))
+
+
+def classify(messages) -> str:
+    """根据系统提示词判断调用类型"""
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    if "灵魂伴侣" in system and '"preferences"' in system:
+        return "fused"
+    if "灵魂伴侣" in system:
+        return "analyze"
+    if "分析对话历史" in system:
+        return "extract"
+    if "阅读推荐专家" in system:
+        return "recommend"
+    return "chat"
+
+
+def reply_for(kind: str, messages) -> str:
+    """生成对应调用类型的回复文本"""
+    user = messages[-1].get("content", "") if messages else ""
+    request = user.split("用户请求：")[-1]
+    if kind in ("analyze", "fused"):
+        analysis = {
+            "is_related": True,
+            "topics": _topics(request),
+            "content_type": "both",
+            "purpose": "learning",
+            "level": "beginner",
+            "mood": "neutral",
+            "language": "zh",
+            "refusal_message": None,
+        }
+        if kind == "fused":
+            analysis["preferences"] = {
+                "genres": [], "topics": _topics(request), "authors": [], "reading_level": "beginner"
+            }
+        return "```json\n" + json.dumps(analysis, ensure_ascii=False) + "\n```"
+    if kind == "extract":
+        return json.dumps({
+            "genres": [], "topics": _topics(user), "authors": [], "reading_level": "beginner"
+        }, ensure_ascii=False)
+    if kind == "recommend":
+        count = min(5, _candidate_count(user))
+        return json.dumps([
+            {"index": i + 1, "title": f"候选{i + 1}", "reason": "适合入门", "highlights": "结构清晰",
+             "scenario": "通勤时阅读", "score": 9 - i}
+            for i in range(count)
+        ], ensure_ascii=False)
+    return "你好"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 并发基准测试会同时建立大量连接
+
+    def handle_error(self, request, client_address):
+        # 客户端提前关闭流式响应属于正常情况
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class MockOpenAIServer:
+    """在后台线程运行的假 OpenAI 服务器，统计各类调用次数"""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        port: int = 0,
+        host: str = "127.0.0.1",
+        token_delay: float = 0.0,
+        chunk_size: int = 8,
+        prompt_latency: float = 0.0,
+        tail_latency: float = 0.0,
+        tail_rate: float = 0.0,
+        error_rate: float = 0.0,
+        model_latency: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.prompt_latency = prompt_latency  # 每千个提示词字符额外的延迟（秒），模拟预填充耗时
+        self.token_delay = token_delay  # 流式回复每块之间的间隔（秒）
+        self.chunk_size = chunk_size  # 流式回复每块的字符数
+        self.tail_latency = tail_latency  # 长尾调用额外的延迟（秒）
+        self.tail_rate = tail_rate  # 长尾调用的比例
+        self.error_rate = error_rate  # 返回 503 的比例
+        self.model_latency = model_latency or {}  # 按模型覆盖固定延迟（模拟更快的备用模型）
+        self._rng = random.Random(seed)
+        self.calls = Counter()
+        self.models = Counter()  # 各模型的调用次数
+        self.errors = 0
+        self.prompt_chars = Counter()  # 各类调用的提示词总字符数
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                messages = body.get("messages", [])
+                kind = classify(messages)
+                prompt_chars = sum(len(m.get("content") or "") for m in messages)
+                model = body.get("model", "mock")
+                with server._lock:
+                    server.calls[kind] += 1
+                    server.prompt_chars[kind] += prompt_chars
+                    server.models[model] += 1
+                    failed = server._rng.random() < server.error_rate
+                    tail = server._rng.random() < server.tail_rate
+                    if failed:
+                        server.errors += 1
+                if failed:
+                    self._error(503, "mock overloaded")
+                    return
+                latency = server.model_latency.get(model, server.latency)
+                time.sleep(
+                    latency + server.prompt_latency * prompt_chars / 1000 + (server.tail_latency if tail else 0.0)
+                )
+                content = reply_for(kind, messages)
+                if body.get("stream"):
+                    self._stream(body, content)
+                    return
+                # 非流式回复同样要等整段内容生成完
+                time.sleep(server.token_delay * max(0, server.chunk_count(content) - 1))
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status: int, message: str):
+                payload = json.dumps({"error": {"message": message, "type": "server_error"}}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, content: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                size = server.chunk_size
+                pieces = [content[i:i + size] for i in range(0, len(content), size)]
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(server.token_delay)
+                    self._write_chunk(self._sse(body, {"role": "assistant", "content": piece}, None))
+                self._write_chunk(self._sse(body, {}, "stop"))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _sse(self, body, delta, finish_reason) -> bytes:
+                data = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }, ensure_ascii=False)
+                return f"data: {data}\n\n".encode("utf-8")
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        self.httpd = _Server((host, port), Handler)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def chunk_count(self, content: str) -> int:
+        return -(-len(content) // self.chunk_size)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.prompt_chars.clear()
+            self.models.clear()
+            self.errors = 0
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地假 OpenAI 兼容服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="每次调用的延迟（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="流式回复每块之间的间隔（秒）")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(latency=args.latency, port=args.port, host=args.host, token_delay=args.token_delay)
+    print(f"mock OpenAI server: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+单用户并发压力测试
+多个线程同时对同一用户发起推荐（离线模式，不调用LLM）、提交反馈、添加偏好与阅读历史，
+另有几个用户并行运行，结束后检查不变量：
+  - 交互计数等于推荐次数
+  - 每条反馈、偏好与阅读历史都存在（没有丢失的修改）
+  - 对话历史按 user / assistant 交替（同一用户的推荐请求依次执行）
+  - 从存储重新加载的画像与内存中的一致
+依次测试 json / eventlog / sqlite 三种存储后端，任一检查失败时以非零状态退出
+
+用法:
+  python benchmarks/stress_user_profile.py
+  python benchmarks/stress_user_profile.py --threads 32 --ops 50 --users 4 --stores json,sqlite --write-behind
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+ITEMS = [
+    {"title": f"机器学习入门 第{i}卷", "author": "作者", "description": "一本关于机器学习的入门书。",
+     "url": f"https://example.com/{i}", "source": "stress", "type": "book"}
+    for i in range(8)
+]
+
+
+def hammer(agent, worker, ops, expected, expected_lock):
+    """一个线程的操作序列：推荐、反馈、偏好与阅读历史轮流进行"""
+    mine = {"recommends": 0, "liked": set(), "disliked": set(), "genres": set(), "history": set()}
+    for i in range(ops):
+        tag = f"w{worker}-{i}"
+        step = i % 4
+        if step == 0:
+            result = agent.recommend("推荐几本机器学习的书", offline=True)
+            assert result["success"], result["message"]
+            mine["recommends"] += 1
+        elif step == 1:
+            liked = i % 8 == 1
+            agent.feedback(tag, liked, {"title": tag})
+            mine["liked" if liked else "disliked"].add(tag)
+        elif step == 2:
+            agent.user_profile.add_genre(f"genre-{tag}")
+            mine["genres"].add(f"genre-{tag}")
+        else:
+            agent.user_profile.add_reading_history({"title": f"history-{tag}", "type": "book"})
+            mine["history"].add(f"history-{tag}")
+    with expected_lock:
+        expected["recommends"] += mine["recommends"]
+        for key in ("liked", "disliked", "genres", "history"):
+            expected[key] |= mine[key]
+
+
+def check(user_id, profile, expected, agent=None):
+    """返回不满足的不变量列表"""
+    errors = []
+    count = profile.profile["interaction_count"]
+    if count != expected["recommends"]:
+        errors.append(f"{user_id}: interaction_count={count}，应为 {expected['recommends']}")
+    liked = {item["item_id"] for item in profile.get_liked_items()}
+    disliked = {item["item_id"] for item in profile.get_disliked_items()}
+    if liked != expected["liked"]:
+        errors.append(f"{user_id}: 喜欢的反馈缺少 {len(expected['liked'] - liked)} 条，多出 {len(liked - expected['liked'])} 条")
+    if disliked != expected["disliked"]:
+        errors.append(f"{user_id}: 不喜欢的反馈缺少 {len(expected['disliked'] - disliked)} 条，多出 {len(disliked - expected['disliked'])} 条")
+    missing_genres = expected["genres"] - set(profile.get_preferences()["genres"])
+    if missing_genres:
+        errors.append(f"{user_id}: 丢失 {len(missing_genres)} 个偏好类型")
+    missing_history = expected["history"] - {item.get("title") for item in profile.get_reading_history()}
+    if missing_history:
+        errors.append(f"{user_id}: 丢失 {len(missing_history)} 条阅读历史")
+    if agent is not None:
+        roles = [message["role"] for message in agent.conversation_history]
+        if any(role != ("user" if i % 2 == 0 else "assistant") for i, role in enumerate(roles)):
+            errors.append(f"{user_id}: 对话历史没有按 user / assistant 交替")
+    return errors
+
+
+def run(kind, args):
+    from soul_mate import FunctionSource, SoulMateAgent
+    from soul_mate.profile_store import get_profile_store
+    from soul_mate.user_profile import UserProfile
+
+    os.environ["PROFILE_STORE"] = kind
+    os.environ["PROFILE_WRITE_BEHIND"] = "1" if args.write_behind else "0"
+    users = [f"stress-{kind}-{u}" for u in range(args.users)]
+    agents = {}
+    for user_id in users:
+        agent = SoulMateAgent(user_id=user_id)
+        for name in [s.name for s in agent.content_fetcher.sources]:
+            agent.content_fetcher.unregister_source(name)
+        agent.content_fetcher.register_source(FunctionSource("stress", lambda q, c, l: [dict(x) for x in ITEMS]))
+        agents[user_id] = agent
+
+    expected = {
+        user_id: {"recommends": 0, "liked": set(), "disliked": set(), "genres": set(), "history": set()}
+        for user_id in users
+    }
+    expected_lock = threading.Lock()
+    # 第一个用户被所有线程同时操作，其他用户各用少量线程并行运行
+    plan = [(users[0], w) for w in range(args.threads)]
+    plan += [(user_id, w) for user_id in users[1:] for w in range(max(args.threads // 8, 1))]
+    barrier = threading.Barrier(len(plan))
+    failures = []
+
+    def worker(user_id, w):
+        barrier.wait()
+        try:
+            hammer(agents[user_id], w, args.ops, expected[user_id], expected_lock)
+        except Exception as e:
+            failures.append(f"{user_id}/w{w}: {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=entry) for entry in plan]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    errors = list(failures)
+    for user_id in users:
+        agents[user_id].close()
+        errors += check(user_id, agents[user_id].user_profile, expected[user_id], agents[user_id])
+        # 从存储重新加载，检查落盘内容
+        errors += check(f"{user_id}(reload)", UserProfile(user_id, store=get_profile_store(kind)), expected[user_id])
+
+    ops = len(plan) * args.ops
+    status = "OK" if not errors else f"FAIL ({len(errors)})"
+    print(f"{kind:<9} threads={len(plan):<4} ops={ops:<6} elapsed={elapsed:6.2f}s ops/s={ops / elapsed:8.0f} {status}")
+    for error in errors:
+        print(f"  ❌ {error}")
+    return not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单用户并发压力测试")
+    parser.add_argument("--threads", type=int, default=16, help="同时操作第一个用户的线程数")
+    parser.add_argument("--ops", type=int, default=40, help="每个线程的操作数")
+    parser.add_argument("--users", type=int, default=3, help="用户数（第一个用户之外的用户作为并行负载）")
+    parser.add_argument("--stores", default="json,eventlog,sqlite", help="测试的存储后端，逗号分隔")
+    parser.add_argument("--write-behind", action="store_true", help="启用画像写回模式")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stress_profile_")
+    os.chdir(workdir)  # 用户画像写到临时目录
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ["FETCH_CACHE"] = "0"
+    os.environ.pop("HF_MCP_COMMAND", None)
+    os.environ["MCP_CLI"] = "false"
+
+    results = [run(kind.strip(), args) for kind in args.stores.split(",") if kind.strip()]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ export interface ChatRequest {
   user_id: string;
   message: string;
   session_id: string;
+  /** "offline" 时不调用LLM，按本地打分与模板生成推荐 */
+  mode?: "offline";
 }
 
 export interface Recommendation {
@@ -29,6 +31,17 @@ export interface ChatResponse {
   is_related: boolean;
   message: string;
   recommendations?: Recommendation[];
+  /** 推荐来源："llm" 或 "offline"（LLM不可用时的兜底） */
+  mode?: "llm" | "offline";
+}
+
+export interface StreamHandlers {
+  /** 请求分析完成，开始生成推荐 */
+  onStart?: (message: string) => void;
+  /** 每条推荐生成后立即回调 */
+  onRecommendation?: (item: Recommendation, index: number) => void;
+  /** 完整结果，与 sendMessage 的返回值相同 */
+  onDone?: (response: ChatResponse) => void;
 }
 
 export interface UserProfile {
@@ -88,6 +101,91 @@ export async function sendMessage(
   }
 }
 
+/**
+ * 流式发送聊天消息（Server-Sent Events）
+ * 每条推荐生成后立即通过 handlers 回调，返回完整结果
+ * 超时只限制等待首个事件的时间，开始接收后不再中断
+ */
+export async function streamMessage(
+  request: ChatRequest,
+  handlers: StreamHandlers = {}
+): Promise<ChatResponse> {
+  try {
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => controller.abort(), API_TIMEOUT);
+
+    const response = await fetch(`${API_BASE_URL}/api/chat/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify(request),
+      signal: controller.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      clearTimeout(timeoutId);
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let result: ChatResponse | null = null;
+
+    while (result === null) {
+      const { done, value } = await reader.read();
+      clearTimeout(timeoutId);
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // SSE 消息以空行分隔
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf("\n\n");
+
+        let event = "message";
+        let data = "";
+        for (const line of frame.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+
+        if (event === "start") {
+          handlers.onStart?.(payload.message);
+        } else if (event === "recommendation") {
+          handlers.onRecommendation?.(payload.item, payload.index);
+        } else if (event === "done") {
+          result = payload.result as ChatResponse;
+          handlers.onDone?.(result);
+          break;
+        } else if (event === "error") {
+          throw new Error(payload.message || "生成推荐失败");
+        }
+      }
+    }
+
+    reader.cancel().catch(() => {});
+    if (result === null) {
+      throw new Error("推荐流意外中断");
+    }
+    return result;
+  } catch (error) {
+    if (error instanceof Error) {
+      if (error.name === "AbortError") {
+        throw new Error("请求超时，请检查网络连接");
+      }
+      throw error;
+    }
+    throw new Error("发送消息失败");
+  }
+}
+
 /**
  * 获取用户画像
  */
@@ -6,7 +6,7 @@ import { toast } from "sonner";
 import ChatMessage from "@/components/ChatMessage";
 import RecommendationCard from "@/components/RecommendationCard";
 import UserProfileSidebar from "@/components/UserProfileSidebar";
-import { sendMessage, getUserProfile, submitFeedback } from "@/lib/api";
+import { streamMessage, getUserProfile, submitFeedback } from "@/lib/api";
 
 interface Message {
   id: string;
@@ -75,23 +75,47 @@ export default function Home() {
     setIsLoading(true);
 
     try {
-      // 调用后端API
-      const response = await sendMessage({
-        user_id: userProfile.name,
-        message: input,
-        session_id: Date.now().toString(),
-      });
+      // 调用后端流式API，推荐逐条显示
+      const assistantId = (Date.now() + 1).toString();
 
-      // 创建助手消息
+      const response = await streamMessage(
+        {
+          user_id: userProfile.name,
+          message: input,
+          session_id: Date.now().toString(),
+        },
+        {
+          onStart: (message) => {
+            setMessages((prev) => [
+              ...prev,
+              { id: assistantId, role: "assistant", content: message, recommendations: [] },
+            ]);
+            setIsLoading(false);
+          },
+          onRecommendation: (item) =>
+            setMessages((prev) =>
+              prev.map((m) =>
+                m.id === assistantId
+                  ? { ...m, recommendations: [...(m.recommendations || []), item] }
+                  : m
+              )
+            ),
+        }
+      );
+
+      // 用完整结果替换（拒绝回答或没有候选项时不会收到 start 事件）
       const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: assistantId,
         role: "assistant",
         content: response.message,
         isError: !response.is_related,
         recommendations: response.recommendations,
       };
-
-      setMessages((prev) => [...prev, assistantMessage]);
+      setMessages((prev) =>
+        prev.some((m) => m.id === assistantId)
+          ? prev.map((m) => (m.id === assistantId ? assistantMessage : m))
+          : [...prev, assistantMessage]
+      );
 
       // 更新用户画像
       try {
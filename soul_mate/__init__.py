@@ -3,9 +3,32 @@
 """
 
 from .agent import SoulMateAgent
+from .async_agent import AsyncSoulMateAgent
 from .user_profile import UserProfile
 from .llm_client import LLMClient
+from .async_llm_client import AsyncLLMClient
 from .content_fetcher import ContentFetcher
+from .content_sources import ContentSource, FunctionSource
+from .catalog import BookCatalog, CatalogSource
+from .vector_index import EmbeddingSource
+from .profile_store import ProfileStore, JSONProfileStore, EventLogProfileStore
+from .sqlite_store import SQLiteProfileStore
 
 __version__ = "1.0.0"
-__all__ = ["SoulMateAgent", "UserProfile", "LLMClient", "ContentFetcher"]
+__all__ = [
+    "SoulMateAgent",
+    "AsyncSoulMateAgent",
+    "UserProfile",
+    "LLMClient",
+    "AsyncLLMClient",
+    "ContentFetcher",
+    "ContentSource",
+    "FunctionSource",
+    "BookCatalog",
+    "CatalogSource",
+    "EmbeddingSource",
+    "ProfileStore",
+    "JSONProfileStore",
+    "EventLogProfileStore",
+    "SQLiteProfileStore",
+]
@@ -3,27 +3,164 @@
 整合所有模块，提供统一的交互接口
 """
 
-from typing import List, Dict, Optional
-from .user_profile import UserProfile
-from .llm_client import LLMClient
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
+from .cache import normalize_text
+from .user_profile import get_user_profile
+from .llm_client import LLMError, get_llm_client
+from .locks import KeyedLocks
 from .content_fetcher import ContentFetcher
+from .offline_recommender import OfflineRecommender, heuristic_analysis
+from .ranker import CandidateRanker
+
+
+# 推测性抓取使用独立的线程池：抓取本身还会向来源线程池提交任务，避免互相占满
+_speculative_executor: Optional[ThreadPoolExecutor] = None
+_speculative_lock = threading.Lock()
+
+
+def _get_speculative_executor() -> ThreadPoolExecutor:
+    global _speculative_executor
+    if _speculative_executor is None:
+        with _speculative_lock:
+            if _speculative_executor is None:
+                _speculative_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("AGENT_SPECULATIVE_WORKERS", "8")),
+                    thread_name_prefix="speculative-fetch"
+                )
+    return _speculative_executor
+
+
+# 同一用户的推荐请求串行执行（不同用户并行）：交互计数、对话历史与偏好提取按请求顺序进行。
+# 使用不可重入锁，流式推荐的生成器在其他线程中关闭时也能释放
+_request_locks = KeyedLocks(threading.Lock)
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+class _LatencyEstimate:
+    """
+    耗时的指数滑动平均（线程安全）
+    
+    估计值只在调用成功后更新，而它又决定是否调用：为避免估计值偏大后再也没有样本，
+    距离上次样本（或上次探测）超过 probe_interval 秒时放行一次调用，用新的样本校正估计值
+    """
+    
+    def __init__(self, alpha: float = 0.2, probe_interval: float = 30.0):
+        self.alpha = alpha
+        self.probe_interval = probe_interval
+        self.value: Optional[float] = None
+        self._checked: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float):
+        with self._lock:
+            self._checked = time.monotonic()
+            if self.value is None:
+                self.value = seconds
+            else:
+                self.value += self.alpha * (seconds - self.value)
+    
+    def probe(self) -> bool:
+        """距离上次样本或探测超过 probe_interval 秒时返回 True（每个间隔只放行一次，0 表示不探测）"""
+        if self.probe_interval <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is not None and now - self._checked < self.probe_interval:
+                return False
+            self._checked = now
+            return True
+
+
+# 生成推荐的LLM调用耗时，所有Agent共享；用于判断剩余时间预算是否足够调用LLM
+_generate_latency = _LatencyEstimate(probe_interval=float(os.getenv("AGENT_LATENCY_PROBE_INTERVAL", "30")))
+
+
+class _RequestContext:
+    """一次推荐请求在生成推荐之前得到的中间结果"""
+    
+    __slots__ = ("profile_summary", "request_analysis", "candidate_items", "query", "offline", "deadline")
+    
+    def __init__(self, offline: bool, deadline: Optional[float]):
+        self.profile_summary = ""
+        self.request_analysis: Dict = {}
+        self.candidate_items: List[Dict] = []
+        self.query = ""
+        self.offline = offline
+        self.deadline = deadline
+    
+    def remaining(self) -> Optional[float]:
+        """剩余的时间预算（秒），没有预算时为 None"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
 
 
 class SoulMateAgent:
     """灵魂伴侣推荐Agent"""
     
-    def __init__(self, user_id: str = "default_user", model: str = "gpt-4.1-mini"):
+    # 内存中保留的最近对话条数
+    MAX_CONVERSATION_HISTORY = 50
+    
+    # 预排序时参考的最近不喜欢项目数
+    PRERANK_DISLIKED_LIMIT = 20
+    
+    # 获取共享LLM客户端的函数（异步版本替换为 get_async_llm_client）
+    llm_client_factory = staticmethod(get_llm_client)
+    
+    def __init__(
+        self,
+        user_id: str = "default_user",
+        model: str = "gpt-4.1-mini",
+        fused_analysis: Optional[bool] = None,
+        speculative_fetch: Optional[bool] = None,
+        prerank_top_n: Optional[int] = None,
+        latency_budget: Optional[float] = None
+    ):
         """
         初始化Agent
         
         Args:
             user_id: 用户ID
             model: LLM模型名称
+            fused_analysis: 是否用一次LLM调用同时完成偏好提取与请求分析（默认从 AGENT_FUSED_ANALYSIS 读取）
+            speculative_fetch: 是否在分析进行时用原始输入推测性地抓取候选内容（默认从 AGENT_SPECULATIVE_FETCH 读取）
+            prerank_top_n: 本地预排序后交给LLM的候选项数（默认从 AGENT_PRERANK_TOP_N 读取，0 表示不预排序）
+            latency_budget: 每次推荐的时间预算（秒，默认从 AGENT_LATENCY_BUDGET 读取，0 表示不限制）；
+                剩余时间不足以调用LLM，或LLM超时、失败时改用离线推荐
         """
-        self.user_profile = UserProfile(user_id)
-        self.llm_client = LLMClient(model)
+        self.user_profile = get_user_profile(user_id)
+        self._request_lock = _request_locks.get(user_id)
+        self.llm_client = self.llm_client_factory(model)
         self.content_fetcher = ContentFetcher()
-        self.conversation_history = []
+        if os.getenv("COLLABORATIVE_MODEL_PATH"):
+            # 配置了协同过滤模型时加入按本用户反馈推荐的来源（SciPy 只在启用时导入）
+            from .collaborative import CollaborativeSource
+            self.content_fetcher.register_source(
+                CollaborativeSource(self.user_profile, top_k=int(os.getenv("COLLABORATIVE_TOP_K", "10")))
+            )
+        self.conversation_history = deque(maxlen=self.MAX_CONVERSATION_HISTORY)
+        self.fused_analysis = _env_flag("AGENT_FUSED_ANALYSIS") if fused_analysis is None else fused_analysis
+        self.speculative_fetch = _env_flag("AGENT_SPECULATIVE_FETCH") if speculative_fetch is None else speculative_fetch
+        if prerank_top_n is None:
+            prerank_top_n = int(os.getenv("AGENT_PRERANK_TOP_N", "10"))
+        self.prerank_top_n = prerank_top_n
+        self.ranker = CandidateRanker()
+        self.offline_recommender = OfflineRecommender(self.ranker)
+        if latency_budget is None:
+            latency_budget = float(os.getenv("AGENT_LATENCY_BUDGET", "0"))
+        self.latency_budget = latency_budget
+    
+    def close(self):
+        """释放Agent：把未落盘的画像修改写回存储"""
+        self.user_profile.flush()
     
     def welcome(self) -> str:
         """欢迎信息"""
@@ -47,17 +184,20 @@ class SoulMateAgent:
 
 请告诉我你想找什么样的书籍或文章，我会为你推荐最合适的内容！"""
     
-    def process_initial_preferences(self, user_input: str):
+    def process_initial_preferences(self, user_input: str, timeout: Optional[float] = None):
         """
         处理新用户的初始偏好设置
         
         Args:
             user_input: 用户输入的偏好信息
+            timeout: LLM调用超时时间（秒）
         """
         # 使用LLM提取偏好信息
-        preferences = self.llm_client.extract_preferences_from_conversation(user_input)
-        
-        # 更新用户画像
+        preferences = self.llm_client.extract_preferences_from_conversation(user_input, timeout=timeout)
+        self._apply_preferences(preferences)
+    
+    def _apply_preferences(self, preferences: Dict):
+        """把提取到的偏好写入用户画像"""
         if preferences.get("genres"):
             for genre in preferences["genres"]:
                 self.user_profile.add_genre(genre)
@@ -73,74 +213,239 @@ class SoulMateAgent:
         if preferences.get("reading_level"):
             self.user_profile.update_preferences(reading_level=preferences["reading_level"])
     
-    def recommend(self, user_input: str, top_k: int = 5) -> Dict:
+    def recommend(self, user_input: str, top_k: int = 5, offline: bool = False) -> Dict:
         """
         根据用户输入生成推荐
         
         Args:
             user_input: 用户输入
             top_k: 返回推荐数量
+            offline: 是否使用离线模式（不调用LLM，按本地打分与模板生成推荐）
             
         Returns:
-            推荐结果字典
+            推荐结果字典（mode 为 "llm" 或 "offline"）
         """
+        # 同一用户的请求依次执行；一次请求内的画像修改合并为最多一次写入
+        with self._request_lock, self.user_profile.batch():
+            return self._recommend(user_input, top_k, offline)
+    
+    def _recommend(self, user_input: str, top_k: int, offline: bool = False) -> Dict:
+        """recommend 的实现，调用方负责批量写入上下文"""
+        result, context = self._prepare(user_input, offline)
+        if result is not None:
+            return result
+        
+        if self._should_use_llm(context):
+            start = time.monotonic()
+            try:
+                # 使用LLM生成推荐
+                recommendations = self.llm_client.generate_recommendations(
+                    user_profile_summary=context.profile_summary,
+                    user_request_analysis=context.request_analysis,
+                    candidate_items=context.candidate_items,
+                    top_k=top_k,
+                    timeout=context.remaining()
+                )
+                _generate_latency.observe(time.monotonic() - start)
+                return self._success_result(recommendations, context.request_analysis)
+            except LLMError as e:
+                print(f"⚠️  生成推荐失败，改用离线推荐: {e}")
+        
+        return self._success_result(
+            self._offline_recommendations(context, top_k), context.request_analysis, mode="offline"
+        )
+    
+    def recommend_stream(self, user_input: str, top_k: int = 5, offline: bool = False) -> Iterator[Dict]:
+        """
+        流式生成推荐：每条推荐在模型输出中闭合后立即产出
+        
+        Args:
+            user_input: 用户输入
+            top_k: 返回推荐数量
+            offline: 是否使用离线模式
+            
+        Yields:
+            事件字典，按顺序为：
+            {"event": "start", "message": ..., "request_analysis": ...}
+            {"event": "recommendation", "index": 序号, "item": 推荐项}（每条推荐一次）
+            {"event": "done", "result": 与 recommend 相同的完整结果}
+            拒绝回答或没有候选项时只产出 done 事件
+        
+        生成器运行期间持有该用户的请求锁，同一用户的其他推荐请求等待它结束或被关闭
+        """
+        with self._request_lock, self.user_profile.batch():
+            result, context = self._prepare(user_input, offline)
+            if result is not None:
+                yield {"event": "done", "result": result}
+                return
+            
+            yield {"event": "start", "message": "正在为你挑选推荐...", "request_analysis": context.request_analysis}
+            recommendations = []
+            if self._should_use_llm(context):
+                start = time.monotonic()
+                try:
+                    # 超时作用于每次读取，已开始输出后不会因为总时间超出预算而中断
+                    for item in self.llm_client.stream_recommendations(
+                        user_profile_summary=context.profile_summary,
+                        user_request_analysis=context.request_analysis,
+                        candidate_items=context.candidate_items,
+                        top_k=top_k,
+                        timeout=context.remaining()
+                    ):
+                        yield {"event": "recommendation", "index": len(recommendations), "item": item}
+                        recommendations.append(item)
+                    _generate_latency.observe(time.monotonic() - start)
+                except LLMError as e:
+                    print(f"⚠️  生成推荐失败，改用离线推荐: {e}")
+            
+            mode = "llm"
+            if not recommendations:
+                mode = "offline"
+                for item in self._offline_recommendations(context, top_k):
+                    yield {"event": "recommendation", "index": len(recommendations), "item": item}
+                    recommendations.append(item)
+            
+            yield {"event": "done", "result": self._success_result(recommendations, context.request_analysis, mode)}
+    
+    def _new_context(self, offline: bool) -> _RequestContext:
+        deadline = time.monotonic() + self.latency_budget if self.latency_budget > 0 else None
+        return _RequestContext(offline, deadline)
+    
+    def _prepare(self, user_input: str, offline: bool = False) -> Tuple[Optional[Dict], Optional[_RequestContext]]:
+        """
+        生成推荐之前的步骤：记录交互、分析请求、获取候选内容
+        
+        离线模式下不调用LLM：请求分析使用缓存的结果或关键词判断
+        
+        Returns:
+            (提前结束时的结果, None) 或 (None, 请求上下文)
+        """
+        context = self._new_context(offline)
+        
         # 增加交互计数
         self.user_profile.increment_interaction()
         
         # 记录对话历史
         self.conversation_history.append({"role": "user", "content": user_input})
         
-        # 如果是新用户的前几次交互，尝试提取偏好信息
-        if self.user_profile.is_new_user():
-            self.process_initial_preferences(user_input)
-        
-        # 获取用户画像摘要
-        profile_summary = self.user_profile.get_profile_summary()
+        # 推测性抓取：不等分析结果，先用原始输入开始获取候选内容
+        speculative = self._start_speculative_fetch(user_input) if self.speculative_fetch and not offline else None
         
-        # 分析用户请求
-        request_analysis = self.llm_client.analyze_user_request(user_input, profile_summary)
+        if offline:
+            profile_summary = self.user_profile.get_profile_summary()
+            request_analysis = self._offline_analysis(user_input, profile_summary)
+        elif self.fused_analysis:
+            request_analysis, profile_summary = self._analyze_fused(user_input, context.remaining())
+        else:
+            # 如果是新用户的前几次交互，尝试提取偏好信息
+            if self.user_profile.is_new_user():
+                self.process_initial_preferences(user_input, timeout=context.remaining())
+            
+            # 获取用户画像摘要
+            profile_summary = self.user_profile.get_profile_summary()
+            
+            # 分析用户请求
+            request_analysis = self.llm_client.analyze_user_request(
+                user_input, profile_summary, timeout=context.remaining()
+            )
         
         # 检查是否相关
         if not request_analysis.get("is_related", True):
-            return {
-                "success": False,
-                "is_related": False,
-                "message": request_analysis.get("refusal_message", "抱歉，我只能回答与阅读和书籍相关的问题。"),
-                "recommendations": []
-            }
-        
-        # 构建搜索查询
-        search_query = " ".join(request_analysis.get("topics", []))
-        if not search_query:
-            search_query = user_input
+            if speculative is not None:
+                speculative.cancel()
+            return self._refusal_result(request_analysis), None
         
         # 获取候选内容
-        content_type = request_analysis.get("content_type", "both")
-        language = request_analysis.get("language", "zh")
-        
-        candidate_items = self.content_fetcher.fetch_content(
-            query=search_query,
-            content_type=content_type,
-            language=language
-        )
+        search_query, content_type, language = self._search_params(request_analysis, user_input)
+        candidate_items = self._fetch_candidates(search_query, content_type, language, user_input, speculative)
         
         # 如果没有候选项，返回空结果
         if not candidate_items:
-            return {
-                "success": False,
-                "is_related": True,
-                "message": "抱歉，没有找到相关的内容。请尝试换一个关键词或描述。",
-                "recommendations": []
-            }
-        
-        # 使用LLM生成推荐
-        recommendations = self.llm_client.generate_recommendations(
-            user_profile_summary=profile_summary,
-            user_request_analysis=request_analysis,
-            candidate_items=candidate_items,
-            top_k=top_k
-        )
+            return self._empty_result(), None
         
+        # 本地预排序，只把最相关的候选项交给LLM
+        context.profile_summary = profile_summary
+        context.request_analysis = request_analysis
+        context.query = search_query if search_query == user_input else f"{search_query} {user_input}"
+        context.candidate_items = self._prerank(candidate_items, context.query)
+        return None, context
+    
+    def _offline_analysis(self, user_input: str, profile_summary: str) -> Dict:
+        """离线模式的请求分析：优先使用缓存的LLM分析结果"""
+        cache = self.llm_client.analysis_cache
+        cached = cache.get(user_input, profile_summary) if cache is not None else None
+        return cached if cached is not None else heuristic_analysis(user_input)
+    
+    @staticmethod
+    def _should_use_llm(context: _RequestContext) -> bool:
+        """
+        非离线模式下，剩余预算不少于近期生成推荐的平均耗时才调用LLM；
+        预算不足时每隔一段时间仍调用一次，使平均耗时能随LLM变快而更新
+        """
+        if context.offline:
+            return False
+        remaining = context.remaining()
+        if remaining is None:
+            return True
+        if remaining <= 0:
+            return False
+        expected = _generate_latency.value
+        return expected is None or remaining >= expected or _generate_latency.probe()
+    
+    def _offline_recommendations(self, context: _RequestContext, top_k: int) -> List[Dict]:
+        return self.offline_recommender.recommend(
+            context.candidate_items,
+            context.request_analysis,
+            query=context.query,
+            preferences=self.user_profile.get_preferences(),
+            disliked=self.user_profile.get_recent_feedback(liked=False, limit=self.PRERANK_DISLIKED_LIMIT),
+            top_k=top_k,
+            taste=self.user_profile.get_taste_vector()
+        )
+    
+    @staticmethod
+    def _refusal_result(request_analysis: Dict) -> Dict:
+        return {
+            "success": False,
+            "is_related": False,
+            "message": request_analysis.get("refusal_message", "抱歉，我只能回答与阅读和书籍相关的问题。"),
+            "recommendations": []
+        }
+    
+    @staticmethod
+    def _empty_result() -> Dict:
+        return {
+            "success": False,
+            "is_related": True,
+            "message": "抱歉，没有找到相关的内容。请尝试换一个关键词或描述。",
+            "recommendations": []
+        }
+    
+    @staticmethod
+    def _search_params(request_analysis: Dict, user_input: str):
+        """根据分析结果构建搜索查询，返回 (查询, 内容类型, 语言)"""
+        search_query = " ".join(request_analysis.get("topics", []))
+        if not search_query:
+            search_query = user_input
+        return (
+            search_query,
+            request_analysis.get("content_type", "both"),
+            request_analysis.get("language", "zh")
+        )
+    
+    @staticmethod
+    def _use_speculative(search_query: str, content_type: str, language: str, user_input: str) -> bool:
+        """分析得到的查询是否与推测性抓取（原始输入、不限类型、中文）一致"""
+        return language == "zh" and content_type == "both" \
+            and normalize_text(search_query) == normalize_text(user_input)
+    
+    @staticmethod
+    def _filter_speculative(items: List[Dict], content_type: str) -> List[Dict]:
+        """推测结果不区分内容类型，兜底使用时去掉不符合类型的条目"""
+        excluded_type = {"book": "article", "article": "book"}.get(content_type)
+        return [item for item in items if not excluded_type or item.get("type") != excluded_type]
+    
+    def _success_result(self, recommendations: List[Dict], request_analysis: Dict, mode: str = "llm") -> Dict:
         # 记录对话历史
         self.conversation_history.append({
             "role": "assistant",
@@ -151,9 +456,89 @@ class SoulMateAgent:
             "success": True,
             "message": f"根据你的需求，我为你精心挑选了{len(recommendations)}个推荐：",
             "recommendations": recommendations,
-            "request_analysis": request_analysis
+            "request_analysis": request_analysis,
+            "mode": mode
         }
     
+    def _analyze_fused(self, user_input: str, timeout: Optional[float] = None):
+        """
+        融合模式的请求分析：新用户的偏好提取与请求分析合并为一次LLM调用
+        
+        Returns:
+            (分析结果, 写入偏好后的画像摘要)
+        """
+        profile_summary = self.user_profile.get_profile_summary()
+        if not self.user_profile.is_new_user():
+            return self.llm_client.analyze_user_request(user_input, profile_summary, timeout=timeout), profile_summary
+        
+        request_analysis, preferences = self.llm_client.analyze_request_with_preferences(
+            user_input, profile_summary, timeout=timeout
+        )
+        self._apply_preferences(preferences)
+        # 生成推荐时使用包含新偏好的摘要
+        return request_analysis, self.user_profile.get_profile_summary()
+    
+    def _prerank(self, candidate_items: List[Dict], query: str) -> List[Dict]:
+        """
+        按请求、画像偏好、不喜欢的项目与口味向量为候选项打分，保留前 prerank_top_n 个
+        
+        Returns:
+            排序后的候选项（未开启预排序时原样返回）
+        """
+        if self.prerank_top_n <= 0:
+            return candidate_items
+        return self.ranker.rank(
+            candidate_items,
+            query=query,
+            preferences=self.user_profile.get_preferences(),
+            disliked=self.user_profile.get_recent_feedback(liked=False, limit=self.PRERANK_DISLIKED_LIMIT),
+            top_n=self.prerank_top_n,
+            taste=self.user_profile.get_taste_vector()
+        )
+    
+    def _start_speculative_fetch(self, user_input: str) -> Optional[Future]:
+        """在后台用原始输入抓取候选内容（不区分内容类型）"""
+        try:
+            return _get_speculative_executor().submit(
+                self.content_fetcher.fetch_content, query=user_input, content_type="both", language="zh"
+            )
+        except RuntimeError:
+            return None
+    
+    def _fetch_candidates(
+        self,
+        search_query: str,
+        content_type: str,
+        language: str,
+        user_input: str,
+        speculative: Optional[Future]
+    ) -> List[Dict]:
+        """
+        获取候选内容
+        
+        分析得到的查询与推测性抓取一致时直接使用推测结果；否则按分析结果抓取，
+        结果为空时再用推测结果中符合内容类型的条目兜底
+        """
+        if speculative is not None and self._use_speculative(search_query, content_type, language, user_input):
+            try:
+                return speculative.result()
+            except Exception as e:
+                print(f"推测性抓取失败: {str(e)}")
+        
+        candidate_items = self.content_fetcher.fetch_content(
+            query=search_query,
+            content_type=content_type,
+            language=language
+        )
+        if candidate_items or speculative is None:
+            return candidate_items
+        
+        try:
+            fallback = speculative.result(timeout=self.content_fetcher.deadline)
+        except Exception:
+            return candidate_items
+        return self._filter_speculative(fallback, content_type)
+    
     def feedback(self, item_id: str, liked: bool, item_info: Optional[Dict] = None):
         """
         接收用户反馈
@@ -0,0 +1,174 @@
+"""
+Agent 注册表模块
+按用户缓存 SoulMateAgent 实例，容量受限（LRU）并淘汰长时间空闲的实例
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from .singleflight import SingleFlight
+
+
+class AgentRegistry:
+    """
+    有界的用户实例注册表
+
+    - 超过 max_size 时淘汰最久未访问的实例（LRU）
+    - 空闲超过 idle_ttl 秒的实例在下一次访问注册表时被淘汰
+    - 淘汰时调用实例的 close()，由实例负责把未落盘的画像写回；被淘汰的实例可能仍在处理请求，
+      之后为同一用户新建的实例通过 get_user_profile 共用同一份内存画像，不会从存储重新加载出第二份
+    - 创建实例（读取画像等）在锁外进行，同一用户同时只创建一个实例，不阻塞其他用户的访问
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_size: int = 1000,
+        idle_ttl: Optional[float] = 1800,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            factory: 根据 user_id 创建实例的函数
+            max_size: 最多缓存的实例数
+            idle_ttl: 空闲淘汰时间（秒），None 或 0 表示不按空闲时间淘汰
+            clock: 时间函数
+        """
+        if max_size <= 0:
+            raise ValueError("max_size 必须大于 0")
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, list]" = OrderedDict()  # user_id -> [实例, 最后访问时间]
+        self._lock = threading.Lock()
+        self._creating = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id: str) -> Any:
+        """获取或创建用户实例"""
+        with self._lock:
+            now = self._clock()
+            evicted = self._expire(now)
+            instance = self._touch(user_id, now)
+            if instance is None:
+                self.misses += 1
+        self._close_all(evicted)
+
+        if instance is None:
+            instance, _ = self._creating.do(user_id, lambda: self._create(user_id))
+        return instance
+
+    def _touch(self, user_id: str, now: float) -> Optional[Any]:
+        """命中时更新访问时间并返回实例（调用方需持有锁）"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        self.hits += 1
+        entry[1] = now
+        self._entries.move_to_end(user_id)
+        return entry[0]
+
+    def _create(self, user_id: str) -> Any:
+        """在锁外创建实例后加入注册表；由 SingleFlight 保证同一用户同时只有一个线程在创建"""
+        with self._lock:
+            # 上一次创建可能在本线程未命中之后才完成
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry[1] = self._clock()
+                self._entries.move_to_end(user_id)
+                return entry[0]
+
+        instance = self.factory(user_id)
+
+        evicted = []
+        with self._lock:
+            self._entries[user_id] = [instance, self._clock()]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                _, (old, _) = self._entries.popitem(last=False)
+                self.evictions += 1
+                evicted.append(old)
+        self._close_all(evicted)
+        return instance
+
+    def _expire(self, now: float):
+        """淘汰空闲超时的实例（调用方需持有锁）；按访问顺序排列，只需检查头部"""
+        expired = []
+        if not self.idle_ttl:
+            return expired
+        while self._entries:
+            user_id, (instance, last_access) = next(iter(self._entries.items()))
+            if now - last_access < self.idle_ttl:
+                break
+            del self._entries[user_id]
+            self.expirations += 1
+            expired.append(instance)
+        return expired
+
+    @staticmethod
+    def _close_all(instances):
+        for instance in instances:
+            close = getattr(instance, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"⚠️  释放Agent失败: {e}")
+
+    def sweep(self) -> int:
+        """
+        主动淘汰空闲实例
+
+        Returns:
+            淘汰的数量
+        """
+        with self._lock:
+            expired = self._expire(self._clock())
+        self._close_all(expired)
+        return len(expired)
+
+    def pop(self, user_id: str) -> Optional[Any]:
+        """移除并释放指定用户的实例"""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return None
+        self._close_all([entry[0]])
+        return entry[0]
+
+    def clear(self):
+        """释放所有实例（进程退出前调用）"""
+        with self._lock:
+            instances = [entry[0] for entry in self._entries.values()]
+            self._entries.clear()
+        self._close_all(instances)
+
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """命中、未命中与淘汰统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "idle_ttl": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
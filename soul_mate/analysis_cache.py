@@ -0,0 +1,211 @@
+"""
+请求分析缓存模块
+缓存 analyze_user_request 的结果：规范化后完全相同的请求直接命中 LRU，
+可选的近似重复层按字符 n-gram 相似度复用相近请求的分析结果
+"""
+
+import copy
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from .cache import FRESH, TTLCache, make_key, normalize_text
+
+
+def summary_fingerprint(profile_summary: str) -> str:
+    """画像摘要的指纹；摘要一旦变化，旧的分析结果不再命中"""
+    return hashlib.sha1((profile_summary or "").encode("utf-8")).hexdigest()[:16]
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (2, 3)) -> Set[str]:
+    """字符 n-gram 集合（忽略空格），中文按字切分即可得到有意义的片段"""
+    text = text.replace(" ", "")
+    if len(text) < min(sizes):
+        return {text} if text else set()
+    grams = set()
+    for n in sizes:
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class _SimilarityIndex:
+    """
+    单个画像摘要下的 n-gram 倒排索引
+
+    查询时只遍历共享 n-gram 的条目，按 Jaccard 相似度 |A∩B| / |A∪B| 取最相近的一条
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.sizes: Dict[str, int] = {}
+        self.grams: Dict[str, Set[str]] = {}
+
+    def add(self, key: str, grams: Set[str]):
+        if key in self.sizes or not grams:
+            return
+        self.sizes[key] = len(grams)
+        self.grams[key] = grams
+        for gram in grams:
+            self.postings[gram].add(key)
+
+    def remove(self, key: str):
+        grams = self.grams.pop(key, None)
+        if grams is None:
+            return
+        del self.sizes[key]
+        for gram in grams:
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def best_match(self, grams: Set[str]) -> Tuple[Optional[str], float]:
+        shared = Counter()
+        for gram in grams:
+            for key in self.postings.get(gram, ()):
+                shared[key] += 1
+        best, best_score = None, 0.0
+        for key, inter in shared.items():
+            score = inter / (len(grams) + self.sizes[key] - inter)
+            if score > best_score:
+                best, best_score = key, score
+        return best, best_score
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+
+class AnalysisCache:
+    """
+    请求分析结果缓存
+
+    - 精确层：键为（画像摘要指纹, 规范化后的用户输入），TTL + LRU
+    - 近似层（similarity_threshold > 0 时启用）：同一画像摘要下，
+      输入的字符 n-gram Jaccard 相似度不低于阈值时复用已有结果
+    - 画像摘要变化后指纹不同，旧结果不会再被命中；invalidate_summary() 可以主动清除
+    """
+
+    def __init__(self, max_size: int = 2048, ttl: float = 3600, similarity_threshold: float = 0.0):
+        """
+        Args:
+            max_size: 最多缓存的分析结果数
+            ttl: 有效期（秒）
+            similarity_threshold: 近似命中的相似度阈值（0~1），0 表示只做精确匹配
+        """
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.similarity_threshold = similarity_threshold
+        self._indexes: Dict[str, _SimilarityIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(fingerprint: str, text: str) -> str:
+        return make_key("analysis", fingerprint, text)
+
+    def get(self, user_input: str, profile_summary: str) -> Optional[Dict]:
+        """
+        查询缓存
+
+        Returns:
+            分析结果的副本，未命中时返回 None
+        """
+        fingerprint = summary_fingerprint(profile_summary)
+        text = normalize_text(user_input)
+        value, state = self.cache.get(self._key(fingerprint, text))
+        if state == FRESH:
+            self._count("hits")
+            return copy.deepcopy(value)
+        if self.similarity_threshold > 0:
+            value = self._get_similar(fingerprint, char_ngrams(text))
+            if value is not None:
+                self._count("similar_hits")
+                return copy.deepcopy(value)
+        self._count("misses")
+        return None
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _get_similar(self, fingerprint: str, grams: Set[str]) -> Optional[Dict]:
+        while True:
+            with self._lock:
+                index = self._indexes.get(fingerprint)
+                if index is None:
+                    return None
+                key, score = index.best_match(grams)
+            if key is None or score < self.similarity_threshold:
+                return None
+            value, state = self.cache.get(key)
+            if state == FRESH:
+                return value
+            # 精确层中已过期或被淘汰，清理后继续找
+            self._remove_from_index(fingerprint, key)
+
+    def set(self, user_input: str, profile_summary: str, analysis: Dict):
+        """写入一条分析结果"""
+        fingerprint = summary_fingerprint(profile_summary)
+        text = normalize_text(user_input)
+        key = self._key(fingerprint, text)
+        self.cache.set(key, copy.deepcopy(analysis))
+        # 即使不启用近似层也按摘要登记，供 invalidate_summary() 使用
+        with self._lock:
+            index = self._indexes.setdefault(fingerprint, _SimilarityIndex())
+            index.add(key, char_ngrams(text))
+            # 近似索引不超过精确层容量，超出时整体丢弃最早建立的摘要索引
+            while sum(len(i) for i in self._indexes.values()) > self.cache.max_size and len(self._indexes) > 1:
+                oldest = next(iter(self._indexes))
+                if oldest == fingerprint:
+                    break
+                del self._indexes[oldest]
+
+    def _remove_from_index(self, fingerprint: str, key: str):
+        with self._lock:
+            index = self._indexes.get(fingerprint)
+            if index is None:
+                return
+            index.remove(key)
+            if not len(index):
+                del self._indexes[fingerprint]
+
+    def invalidate_summary(self, profile_summary: str) -> int:
+        """
+        清除某个画像摘要下的全部结果
+
+        Returns:
+            清除的条目数
+        """
+        fingerprint = summary_fingerprint(profile_summary)
+        with self._lock:
+            index = self._indexes.pop(fingerprint, None)
+        if index is None:
+            return 0
+        for key in list(index.sizes):
+            self.cache.invalidate(key)
+        return len(index)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+        self.cache.clear()
+
+    def stats(self) -> Dict:
+        """命中统计（hit_rate 包含近似命中）"""
+        cache_stats = self.cache.stats()
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "size": cache_stats["size"],
+                "max_size": cache_stats["max_size"],
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": cache_stats["evictions"],
+                "similarity_threshold": self.similarity_threshold,
+                "indexed": sum(len(index) for index in self._indexes.values()),
+            }
@@ -0,0 +1,259 @@
+"""
+异步 Agent 模块
+SoulMateAgent 的异步版本：LLM 调用与内容获取都在事件循环中等待，
+一个工作进程可以同时处理大量等待 LLM 回复的请求
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .agent import SoulMateAgent, _RequestContext, _generate_latency
+from .async_llm_client import get_async_llm_client
+from .llm_client import LLMError
+from .locks import AsyncKeyedLocks
+
+# 同一用户的推荐请求在事件循环中依次执行，不同用户并发
+_async_request_locks = AsyncKeyedLocks()
+
+
+class AsyncSoulMateAgent(SoulMateAgent):
+    """
+    异步灵魂伴侣推荐Agent
+
+    recommend、process_initial_preferences 与 chat 是协程，recommend_stream 是异步生成器；
+    画像读写、反馈等不涉及网络的方法与 SoulMateAgent 相同。
+    推荐过程中的画像读写（需要该用户的锁，可能等待其他线程落盘或查询数据库）与预排序在线程中执行，不阻塞事件循环
+    """
+
+    llm_client_factory = staticmethod(get_async_llm_client)
+
+    async def process_initial_preferences(self, user_input: str, timeout: Optional[float] = None):
+        """
+        处理新用户的初始偏好设置
+
+        Args:
+            user_input: 用户输入的偏好信息
+            timeout: LLM调用超时时间（秒）
+        """
+        preferences = await self.llm_client.extract_preferences_from_conversation(user_input, timeout=timeout)
+        await asyncio.to_thread(self._apply_preferences, preferences)
+
+    async def recommend(self, user_input: str, top_k: int = 5, offline: bool = False) -> Dict:
+        """
+        根据用户输入生成推荐
+
+        Args:
+            user_input: 用户输入
+            top_k: 返回推荐数量
+            offline: 是否使用离线模式
+
+        Returns:
+            推荐结果字典
+        """
+        # 同一用户的请求依次执行；一次请求内的画像修改合并为最多一次写入，落盘放到线程中，不阻塞事件循环
+        async with _async_request_locks.get(self.user_profile.user_id):
+            batch = self.user_profile.batch()
+            batch.__enter__()
+            try:
+                return await self._arecommend(user_input, top_k, offline)
+            finally:
+                await asyncio.to_thread(batch.__exit__, None, None, None)
+
+    async def _arecommend(self, user_input: str, top_k: int, offline: bool = False) -> Dict:
+        """recommend 的实现，步骤与 SoulMateAgent._recommend 相同"""
+        result, context = await self._aprepare(user_input, offline)
+        if result is not None:
+            return result
+
+        if self._should_use_llm(context):
+            start = time.monotonic()
+            try:
+                recommendations = await self.llm_client.generate_recommendations(
+                    user_profile_summary=context.profile_summary,
+                    user_request_analysis=context.request_analysis,
+                    candidate_items=context.candidate_items,
+                    top_k=top_k,
+                    timeout=context.remaining()
+                )
+                _generate_latency.observe(time.monotonic() - start)
+                return self._success_result(recommendations, context.request_analysis)
+            except LLMError as e:
+                print(f"⚠️  生成推荐失败，改用离线推荐: {e}")
+
+        return self._success_result(
+            await asyncio.to_thread(self._offline_recommendations, context, top_k),
+            context.request_analysis,
+            mode="offline"
+        )
+
+    async def recommend_stream(self, user_input: str, top_k: int = 5, offline: bool = False) -> AsyncIterator[Dict]:
+        """
+        流式生成推荐，产出的事件与 SoulMateAgent.recommend_stream 相同
+
+        Args:
+            user_input: 用户输入
+            top_k: 返回推荐数量
+            offline: 是否使用离线模式
+        """
+        async with _async_request_locks.get(self.user_profile.user_id):
+            batch = self.user_profile.batch()
+            batch.__enter__()
+            try:
+                result, context = await self._aprepare(user_input, offline)
+                if result is not None:
+                    yield {"event": "done", "result": result}
+                    return
+
+                yield {"event": "start", "message": "正在为你挑选推荐...", "request_analysis": context.request_analysis}
+                recommendations = []
+                if self._should_use_llm(context):
+                    start = time.monotonic()
+                    try:
+                        async for item in self.llm_client.stream_recommendations(
+                            user_profile_summary=context.profile_summary,
+                            user_request_analysis=context.request_analysis,
+                            candidate_items=context.candidate_items,
+                            top_k=top_k,
+                            timeout=context.remaining()
+                        ):
+                            yield {"event": "recommendation", "index": len(recommendations), "item": item}
+                            recommendations.append(item)
+                        _generate_latency.observe(time.monotonic() - start)
+                    except LLMError as e:
+                        print(f"⚠️  生成推荐失败，改用离线推荐: {e}")
+
+                mode = "llm"
+                if not recommendations:
+                    mode = "offline"
+                    for item in await asyncio.to_thread(self._offline_recommendations, context, top_k):
+                        yield {"event": "recommendation", "index": len(recommendations), "item": item}
+                        recommendations.append(item)
+
+                yield {"event": "done", "result": self._success_result(recommendations, context.request_analysis, mode)}
+            finally:
+                await asyncio.to_thread(batch.__exit__, None, None, None)
+
+    async def _aprepare(self, user_input: str, offline: bool = False) -> Tuple[Optional[Dict], Optional[_RequestContext]]:
+        """生成推荐之前的步骤，见 SoulMateAgent._prepare"""
+        context = self._new_context(offline)
+        is_new_user, profile_summary = await asyncio.to_thread(self._profile_state, True)
+        self.conversation_history.append({"role": "user", "content": user_input})
+
+        # 推测性抓取：不等分析结果，先用原始输入开始获取候选内容
+        speculative = None
+        if self.speculative_fetch and not offline:
+            speculative = asyncio.create_task(
+                self.content_fetcher.afetch_content(query=user_input, content_type="both", language="zh")
+            )
+
+        try:
+            if offline:
+                request_analysis = self._offline_analysis(user_input, profile_summary)
+            elif self.fused_analysis:
+                request_analysis, profile_summary = await self._analyze_fused(
+                    user_input, is_new_user, profile_summary, context.remaining()
+                )
+            else:
+                if is_new_user:
+                    await self.process_initial_preferences(user_input, timeout=context.remaining())
+                    _, profile_summary = await asyncio.to_thread(self._profile_state)
+                request_analysis = await self.llm_client.analyze_user_request(
+                    user_input, profile_summary, timeout=context.remaining()
+                )
+
+            if not request_analysis.get("is_related", True):
+                return self._refusal_result(request_analysis), None
+
+            search_query, content_type, language = self._search_params(request_analysis, user_input)
+            candidate_items = await self._fetch_candidates(
+                search_query, content_type, language, user_input, speculative
+            )
+            if not candidate_items:
+                return self._empty_result(), None
+
+            context.profile_summary = profile_summary
+            context.request_analysis = request_analysis
+            context.query = search_query if search_query == user_input else f"{search_query} {user_input}"
+            context.candidate_items = await asyncio.to_thread(self._prerank, candidate_items, context.query)
+            return None, context
+        finally:
+            if speculative is not None and not speculative.done():
+                speculative.cancel()
+
+    def _profile_state(self, increment: bool = False) -> Tuple[bool, str]:
+        """
+        在线程中读取画像状态（一次线程切换完成全部画像操作）
+
+        Args:
+            increment: 是否先记录一次交互
+
+        Returns:
+            (是否新用户, 画像摘要)
+        """
+        if increment:
+            self.user_profile.increment_interaction()
+        return self.user_profile.is_new_user(), self.user_profile.get_profile_summary()
+
+    async def _analyze_fused(
+        self,
+        user_input: str,
+        is_new_user: bool,
+        profile_summary: str,
+        timeout: Optional[float] = None
+    ):
+        """融合模式的请求分析，见 SoulMateAgent._analyze_fused；画像状态由调用方在线程中读取后传入"""
+        if not is_new_user:
+            return await self.llm_client.analyze_user_request(
+                user_input, profile_summary, timeout=timeout
+            ), profile_summary
+
+        request_analysis, preferences = await self.llm_client.analyze_request_with_preferences(
+            user_input, profile_summary, timeout=timeout
+        )
+        await asyncio.to_thread(self._apply_preferences, preferences)
+        _, profile_summary = await asyncio.to_thread(self._profile_state)
+        return request_analysis, profile_summary
+
+    async def _fetch_candidates(
+        self,
+        search_query: str,
+        content_type: str,
+        language: str,
+        user_input: str,
+        speculative: Optional[asyncio.Task]
+    ) -> List[Dict]:
+        """获取候选内容，推测结果的使用方式见 SoulMateAgent._fetch_candidates"""
+        if speculative is not None and self._use_speculative(search_query, content_type, language, user_input):
+            try:
+                return await speculative
+            except Exception as e:
+                print(f"推测性抓取失败: {str(e)}")
+
+        candidate_items = await self.content_fetcher.afetch_content(
+            query=search_query,
+            content_type=content_type,
+            language=language
+        )
+        if candidate_items or speculative is None:
+            return candidate_items
+
+        try:
+            fallback = await asyncio.wait_for(speculative, timeout=self.content_fetcher.deadline)
+        except Exception:
+            return candidate_items
+        return self._filter_speculative(fallback, content_type)
+
+    async def chat(self, user_input: str) -> str:
+        """
+        主要交互接口（特殊命令与 SoulMateAgent.chat 相同）
+
+        Args:
+            user_input: 用户输入
+
+        Returns:
+            Agent回复
+        """
+        if user_input.lower() in ["exit", "quit", "退出", "help", "帮助"]:
+            return super().chat(user_input)
+        return self.format_recommendations(await self.recommend(user_input))
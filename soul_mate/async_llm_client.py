@@ -0,0 +1,416 @@
+"""
+异步LLM客户端模块
+基于 AsyncOpenAI 的 LLMClient 异步版本：等待模型回复时不占用线程，
+提示词、解析逻辑与分析缓存和同步版本一致
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from .json_stream import JSONStream
+from .llm_client import (
+    ANALYSIS_SYSTEM_PROMPT,
+    FUSED_PREFERENCES_PROMPT,
+    LLMClient,
+    LLMError,
+    _client_config,
+    _http_limits,
+    coalesce_key,
+    default_analysis,
+    default_preferences,
+)
+from .llm_policy import CallMetrics, CallPolicy, is_retryable, remaining
+from .singleflight import AsyncSingleFlight
+
+T = TypeVar("T")
+
+
+def _consume_result(task: asyncio.Future):
+    """取走落后请求的异常，避免 "Task exception was never retrieved" 警告"""
+    if not task.cancelled():
+        task.exception()
+
+
+# AsyncOpenAI 的连接池绑定在创建它的事件循环上：每个事件循环按 (api_base, api_key) 共享。
+# 以事件循环对象为弱引用键，不同事件循环不会因为 id 复用拿到已关闭事件循环的客户端
+_shared_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_shared_async_llm_clients: Dict[tuple, "AsyncLLMClient"] = {}
+_shared_lock = threading.Lock()
+
+# 相同请求的合并，见 LLMClient.complete
+_async_llm_flight = AsyncSingleFlight()
+
+
+def get_shared_async_openai_client(api_base: str, api_key: str) -> AsyncOpenAI:
+    """获取当前事件循环共享的 AsyncOpenAI 客户端（需要在事件循环中调用）"""
+    loop = asyncio.get_running_loop()
+    key = (api_base, api_key)
+    with _shared_lock:
+        clients = _shared_async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=api_base,
+                http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+            )
+        return client
+
+
+async def close_shared_async_clients():
+    """关闭当前事件循环的共享客户端并释放连接池（事件循环结束前调用，例如 ASGI 应用关闭时）"""
+    with _shared_lock:
+        clients = _shared_async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            await client.close()
+        except Exception as e:
+            print(f"⚠️  关闭LLM客户端失败: {e}")
+
+
+def get_async_llm_client(model: Optional[str] = None, api_key: Optional[str] = None, api_base: Optional[str] = None) -> "AsyncLLMClient":
+    """
+    获取进程内共享的 AsyncLLMClient 实例
+
+    参数含义与 LLMClient 相同；相同配置返回同一个实例，只在首次使用该配置时创建
+    """
+    key = _client_config(model, api_key, api_base)
+    with _shared_lock:
+        client = _shared_async_llm_clients.get(key)
+    if client is not None:
+        return client
+    client = AsyncLLMClient(model, api_key, api_base)
+    with _shared_lock:
+        return _shared_async_llm_clients.setdefault(key, client)
+
+
+def async_llm_call_stats() -> Dict[str, Dict]:
+    """各共享 AsyncLLMClient 按调用类型的调用统计（按模型名）"""
+    with _shared_lock:
+        clients = list(_shared_async_llm_clients.values())
+    return {client.model: client.call_stats() for client in clients}
+
+
+def async_llm_coalescing_stats() -> Dict:
+    """相同LLM请求合并的统计（异步客户端）"""
+    return _async_llm_flight.stats()
+
+
+def async_analysis_cache_stats() -> Dict[str, Dict]:
+    """各共享 AsyncLLMClient 的请求分析缓存统计（按模型名）"""
+    with _shared_lock:
+        clients = list(_shared_async_llm_clients.values())
+    return {
+        client.model: client.analysis_cache.stats()
+        for client in clients
+        if client.analysis_cache is not None
+    }
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    异步LLM客户端
+
+    complete、chat、analyze_user_request、analyze_request_with_preferences、generate_recommendations
+    与 extract_preferences_from_conversation 都是协程，chat_stream 与 stream_recommendations
+    是异步生成器，参数与返回值与 LLMClient 相同
+    """
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """当前事件循环共享的 AsyncOpenAI 客户端"""
+        return get_shared_async_openai_client(self.api_base, self.api_key)
+
+    def _client_for(self, timeout: Optional[float]) -> AsyncOpenAI:
+        if timeout is None:
+            return self.client.with_options(max_retries=0)
+        return self.client.with_options(timeout=max(timeout, 0.001), max_retries=0)
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        method: str = "chat",
+        coalesce: bool = False
+    ) -> str:
+        """
+        发送聊天请求（按调用类型的策略重试、对冲与合并，见 LLMClient.complete）
+
+        Raises:
+            LLMError: 重试后仍然失败，或超过截止时间
+        """
+        policy, metrics = self._policy(method)
+
+        def call() -> Awaitable[str]:
+            return self._call_with_retries(
+                policy, metrics, timeout,
+                lambda deadline: self._attempt(policy, metrics, messages, temperature, deadline)
+            )
+
+        if not (coalesce and self.coalesce):
+            return await call()
+        key = coalesce_key(self.api_base, self.model, method, messages, temperature)
+        try:
+            content, _ = await _async_llm_flight.do(key, call, timeout=remaining(policy.deadline(timeout)))
+        except TimeoutError as e:
+            raise LLMError("等待相同的LLM请求超时") from e
+        return content
+
+    async def _call_with_retries(
+        self,
+        policy: CallPolicy,
+        metrics: CallMetrics,
+        timeout: Optional[float],
+        attempt: Callable[[Optional[float]], Awaitable[T]]
+    ) -> T:
+        """见 LLMClient._call_with_retries"""
+        deadline = policy.deadline(timeout)
+        metrics.record_call()
+        error: Optional[BaseException] = None
+        for number in range(policy.max_attempts):
+            if deadline is not None and remaining(deadline) <= 0:
+                break
+            metrics.record_attempt(retry=number > 0)
+            try:
+                return await attempt(deadline)
+            except Exception as e:
+                error = e
+            if not is_retryable(error) or number + 1 >= policy.max_attempts:
+                break
+            pause = policy.backoff(number)
+            if deadline is not None and pause >= remaining(deadline):
+                break
+            await asyncio.sleep(pause)
+        metrics.record_failure(error or TimeoutError())
+        raise LLMError(str(error) if error is not None else "LLM调用超时") from error
+
+    async def _attempt(
+        self,
+        policy: CallPolicy,
+        metrics: CallMetrics,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        deadline: Optional[float]
+    ) -> str:
+        """一次尝试，对冲方式见 LLMClient._attempt；落后的请求会被取消"""
+        if not policy.hedge:
+            return await self._create(self.model, messages, temperature, deadline, metrics)
+
+        primary = asyncio.ensure_future(self._create(self.model, messages, temperature, deadline, metrics))
+        primary.add_done_callback(_consume_result)
+        pending = {primary}
+        try:
+            delay = metrics.hedge_delay(policy)
+            left = remaining(deadline)
+            done, _ = await asyncio.wait(pending, timeout=delay if left is None else min(delay, left))
+            if done:
+                return primary.result()
+            if deadline is not None and remaining(deadline) <= 0:
+                raise TimeoutError("LLM调用超时")
+
+            metrics.record_hedge()
+            hedge = asyncio.ensure_future(
+                self._create(policy.hedge_model or self.model, messages, temperature, deadline, metrics)
+            )
+            hedge.add_done_callback(_consume_result)
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining(deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError("LLM调用超时")
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics.record_hedge_win()
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _create(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        deadline: Optional[float],
+        metrics: CallMetrics
+    ) -> str:
+        start = time.monotonic()
+        response = await self._client_for(remaining(deadline)).chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature
+        )
+        # 对冲延迟由主模型的耗时分布得出，备用模型的耗时不计入
+        if model == self.model:
+            metrics.observe(time.monotonic() - start)
+        return response.choices[0].message.content or ""
+
+    async def chat(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        """
+        发送聊天请求（失败时返回错误信息而不是抛出异常）
+
+        Args:
+            messages: 消息列表
+            temperature: 温度参数
+
+        Returns:
+            模型回复内容
+        """
+        try:
+            return await self.complete(messages, temperature)
+        except LLMError as e:
+            error_msg = f"LLM调用失败: {str(e)}"
+            print(f"❌ {error_msg}")
+            return error_msg
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        method: str = "chat"
+    ) -> AsyncIterator[str]:
+        """流式聊天请求，逐段产出回复文本；建立连接按策略重试，调用失败、超时或输出中断时抛出 LLMError"""
+        policy, metrics = self._policy(method)
+        stream = await self._call_with_retries(
+            policy, metrics, timeout,
+            lambda deadline: self._client_for(remaining(deadline)).chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                stream=True
+            )
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise LLMError(f"流式输出中断: {e}") from e
+        finally:
+            await stream.close()
+
+    async def analyze_user_request(
+        self,
+        user_input: str,
+        user_profile_summary: str,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        cache = self.analysis_cache if use_cache else None
+        if cache is not None:
+            cached = cache.get(user_input, user_profile_summary)
+            if cached is not None:
+                return cached
+
+        try:
+            response = await self.complete(
+                self._analysis_messages(ANALYSIS_SYSTEM_PROMPT, user_input, user_profile_summary),
+                temperature=0.3,
+                timeout=timeout,
+                method="analyze",
+                coalesce=True
+            )
+        except LLMError as e:
+            print(f"❌ 请求分析失败，使用默认结果: {e}")
+            return default_analysis()
+        return self._parse_analysis(response, user_input, user_profile_summary, cache)
+
+    async def analyze_request_with_preferences(
+        self,
+        user_input: str,
+        user_profile_summary: str,
+        timeout: Optional[float] = None
+    ) -> Tuple[Dict, Dict]:
+        try:
+            response = await self.complete(
+                self._analysis_messages(ANALYSIS_SYSTEM_PROMPT + FUSED_PREFERENCES_PROMPT, user_input, user_profile_summary),
+                temperature=0.3,
+                timeout=timeout,
+                method="analyze",
+                coalesce=True
+            )
+        except LLMError as e:
+            print(f"❌ 请求分析失败，使用默认结果: {e}")
+            return default_analysis(), default_preferences()
+        return self._parse_fused(response, user_input, user_profile_summary)
+
+    async def generate_recommendations(
+        self,
+        user_profile_summary: str,
+        user_request_analysis: Dict,
+        candidate_items: List[Dict],
+        top_k: int = 5,
+        timeout: Optional[float] = None
+    ) -> List[Dict]:
+        if not candidate_items:
+            return []
+
+        messages = self._recommendation_messages(
+            user_profile_summary, user_request_analysis, candidate_items, top_k, self.description_chars
+        )
+        response = await self.complete(messages, temperature=0.5, timeout=timeout, method="recommend")
+        return self._parse_recommendations(response, candidate_items, top_k)
+
+    async def stream_recommendations(
+        self,
+        user_profile_summary: str,
+        user_request_analysis: Dict,
+        candidate_items: List[Dict],
+        top_k: int = 5,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict]:
+        """流式生成推荐，行为与 LLMClient.stream_recommendations 相同"""
+        if not candidate_items:
+            return
+
+        messages = self._recommendation_messages(
+            user_profile_summary, user_request_analysis, candidate_items, top_k, self.description_chars
+        )
+        parser = JSONStream("[")
+        count = 0
+        chunks = self.chat_stream(messages, temperature=0.5, timeout=timeout, method="recommend")
+        try:
+            async for chunk in chunks:
+                for rec in parser.feed(chunk):
+                    item = self._merge_recommendation(rec, candidate_items)
+                    if item is None:
+                        continue
+                    yield item
+                    count += 1
+                    if count >= top_k:
+                        return
+        except LLMError as e:
+            if count == 0:
+                raise
+            print(f"⚠️  推荐输出中断，保留已生成的{count}个推荐: {e}")
+        finally:
+            await chunks.aclose()
+
+        if count == 0:
+            raise LLMError("流式输出中没有有效的推荐")
+
+    async def extract_preferences_from_conversation(self, conversation_history: str, timeout: Optional[float] = None) -> Dict:
+        try:
+            response = await self.complete(
+                self._preference_messages(conversation_history), temperature=0.3, timeout=timeout,
+                method="preferences", coalesce=True
+            )
+        except LLMError as e:
+            print(f"⚠️  偏好提取失败: {e}")
+            return default_preferences()
+        return self._parse_preferences(response)
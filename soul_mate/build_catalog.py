@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+书目构建工具
+把 CSV / JSONL 书目导出文件转换为可用 mmap 打开的二进制书目（.smcat），
+之后设置 BOOK_CATALOG_PATH 指向生成的文件即可
+
+使用示例:
+  python -m soul_mate.build_catalog --src books.jsonl --out data/books.smcat
+  python -m soul_mate.build_catalog --src export1.csv --src export2.jsonl --out data/books.smcat
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from typing import Dict, Iterator, List
+
+from .catalog import load_records
+from .catalog_file import write_catalog
+
+
+def iter_sources(paths: List[str], progress_every: int = 100_000) -> Iterator[Dict]:
+    """依次读取多个导出文件，每读取 progress_every 条打印一次进度"""
+    count = 0
+    for path in paths:
+        for record in load_records(path):
+            yield record
+            count += 1
+            if progress_every and count % progress_every == 0:
+                print(f"  已读取 {count} 条书目")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="把CSV/JSONL书目导出文件转换为二进制书目")
+    parser.add_argument("--src", action="append", required=True, help="书目导出文件（.csv 或 JSONL，可重复指定）")
+    parser.add_argument("--out", default="data/books.smcat", help="输出文件（默认: data/books.smcat）")
+    parser.add_argument("--limit", type=int, default=0, help="最多转换的条数（默认: 0 表示全部）")
+    parser.add_argument("--k1", type=float, default=1.2, help="BM25 参数 k1（默认: 1.2）")
+    parser.add_argument("--b", type=float, default=0.75, help="BM25 参数 b（默认: 0.75）")
+    args = parser.parse_args()
+
+    records = iter_sources(args.src)
+    if args.limit > 0:
+        records = itertools.islice(records, args.limit)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+
+    start = time.perf_counter()
+    try:
+        total = write_catalog(records, args.out, k1=args.k1, b=args.b)
+    except Exception as e:
+        print(f"构建失败: {str(e)}")
+        sys.exit(1)
+
+    size = os.path.getsize(args.out) / 1e6
+    print(f"✓ 共写入 {total} 条书目到 {args.out}（{size:.1f}MB，用时 {time.perf_counter() - start:.1f}秒）")
+
+
+if __name__ == "__main__":
+    main()
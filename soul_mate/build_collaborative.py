@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+协同过滤模型构建工具
+扫描画像存储中所有用户的反馈，构建物品-物品共现模型并写入 .npz；
+--incremental 在已有模型上只处理上次扫描之后修改过的用户，--watch 按间隔持续增量更新（准实时任务）。
+服务进程设置 COLLABORATIVE_MODEL_PATH 指向生成的文件，文件更新后自动重新加载
+
+使用示例:
+  python -m soul_mate.build_collaborative --out data/collaborative.npz
+  python -m soul_mate.build_collaborative --store sqlite --db data/user_profiles/profiles.db --out data/collaborative.npz --incremental
+  python -m soul_mate.build_collaborative --out data/collaborative.npz --watch 300
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from .collaborative import ItemCooccurrenceModel
+from .profile_store import EventLogProfileStore, JSONProfileStore, default_db_path
+
+
+def open_store(kind: str, data_dir: str, db_path: str):
+    """按类型打开画像存储（只读使用，事件日志不触发压缩）"""
+    if kind == "sqlite":
+        from .sqlite_store import SQLiteProfileStore
+        return SQLiteProfileStore(db_path)
+    if kind == "eventlog":
+        return EventLogProfileStore(data_dir, compact_every=0)
+    return JSONProfileStore(data_dir)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="从所有用户的反馈构建协同过滤模型")
+    parser.add_argument("--store", choices=["json", "eventlog", "sqlite"], default=os.getenv("PROFILE_STORE", "json"),
+                        help="画像存储后端（默认: PROFILE_STORE 或 json）")
+    parser.add_argument("--data-dir", default="data/user_profiles", help="画像目录（默认: data/user_profiles）")
+    parser.add_argument("--db", default=None, help="sqlite 后端的数据库（默认: PROFILE_DB_PATH 或 <画像目录>/profiles.db）")
+    parser.add_argument("--out", default="data/collaborative.npz", help="模型输出文件（默认: data/collaborative.npz）")
+    parser.add_argument("--incremental", action="store_true", help="在已有模型上增量更新（模型不存在时完整构建）")
+    parser.add_argument("--watch", type=float, default=0, help="每隔多少秒增量更新一次（0 表示只运行一次）")
+    parser.add_argument("--neighbors", type=int, default=100, help="每个物品保留的相似物品数（默认: 100）")
+    parser.add_argument("--min-support", type=int, default=1, help="至少被多少个用户同时喜欢才算相似（默认: 1）")
+    parser.add_argument("--max-user-items", type=int, default=500, help="每个用户只取最近的多少条喜欢（默认: 500）")
+    args = parser.parse_args()
+
+    db_path = args.db or default_db_path(args.data_dir)
+    store = open_store(args.store, args.data_dir, db_path)
+    try:
+        if (args.incremental or args.watch) and os.path.exists(args.out):
+            model = ItemCooccurrenceModel.load(args.out)
+        else:
+            model = ItemCooccurrenceModel(args.neighbors, args.min_support, args.max_user_items)
+        while True:
+            start = time.perf_counter()
+            full = model.scanned_at is None
+            users = model.update(store)
+            if full or users:
+                model.save(args.out)
+            print(f"✓ {'完整构建' if full else '增量更新'}：读取 {users} 个用户，共 {len(model)} 个物品，"
+                  f"{model.similarity.nnz} 个相似对，用时 {time.perf_counter() - start:.1f}秒")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"构建失败: {str(e)}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+书目向量构建工具
+用查询编码器把书目中的每条记录编码为 float16 向量（.npy，行号即书目文档ID），
+可选训练 IVF-PQ 索引；之后设置 EMBEDDING_VECTORS_PATH / EMBEDDING_INDEX_PATH 指向生成的文件
+
+使用示例:
+  python -m soul_mate.build_embeddings --catalog data/books.smcat --out data/books.vectors.npy
+  python -m soul_mate.build_embeddings --catalog data/books.smcat --out data/books.vectors.npy \\
+      --index-out data/books.ivfpq.npz --nlist 4096 --pq-m 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from .catalog import get_book_catalog
+from .embeddings import encode_records, load_encoder
+from .vector_index import IVFPQIndex, vectors_metadata_path
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="为书目预先计算向量并构建向量索引")
+    parser.add_argument("--catalog", default=None, help="书目文件（默认: BOOK_CATALOG_PATH 或内置示例书目）")
+    parser.add_argument("--out", default="data/books.vectors.npy", help="向量输出文件（默认: data/books.vectors.npy）")
+    parser.add_argument("--encoder", default=None, help="编码器（默认: EMBEDDING_ENCODER 或 hashing）")
+    parser.add_argument("--batch-size", type=int, default=1024, help="每批编码的条数（默认: 1024）")
+    parser.add_argument("--index-out", default=None, help="IVF-PQ 索引输出文件（.npz，不指定则不构建）")
+    parser.add_argument("--nlist", type=int, default=0, help="倒排列表数（默认: 约 4*sqrt(条数)）")
+    parser.add_argument("--pq-m", type=int, default=16, help="乘积量化段数（默认: 16）")
+    parser.add_argument("--train-sample", type=int, default=65536, help="训练使用的最多样本数（默认: 65536）")
+    args = parser.parse_args()
+
+    try:
+        catalog = get_book_catalog(args.catalog)
+        encoder = load_encoder(args.encoder)
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+
+        start = time.perf_counter()
+        vectors = encode_records(encoder, catalog.records, args.batch_size)
+        np.save(args.out, vectors)
+        with open(vectors_metadata_path(args.out), "w", encoding="utf-8") as f:
+            json.dump({"encoder": encoder.name, "dim": encoder.dim, "count": len(vectors)}, f, ensure_ascii=False)
+        print(f"✓ 共编码 {len(vectors)} 条书目到 {args.out}（{vectors.nbytes / 1e6:.1f}MB，"
+              f"用时 {time.perf_counter() - start:.1f}秒）")
+
+        if args.index_out:
+            start = time.perf_counter()
+            index = IVFPQIndex.train(
+                np.load(args.out, mmap_mode="r"), nlist=args.nlist or None, m=args.pq_m, sample=args.train_sample
+            )
+            index.save(args.index_out)
+            print(f"✓ IVF-PQ 索引（{len(index.centroids)} 个列表，{args.pq_m} 段）写入 {args.index_out}，"
+                  f"用时 {time.perf_counter() - start:.1f}秒")
+    except Exception as e:
+        print(f"构建失败: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
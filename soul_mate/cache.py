@@ -0,0 +1,327 @@
+"""
+缓存模块
+线程安全的 TTL + LRU 缓存：支持过期后先返回旧值再后台刷新（stale-while-revalidate），
+可选 SQLite 磁盘层，进程重启后仍可命中
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+# 查询末尾无意义的标点
+_TRAILING_PUNCTUATION = "?？!！。.,，;；~～…"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化查询文本作为缓存键的一部分
+
+    全角转半角（NFKC）、统一大小写、合并空白并去掉末尾标点，
+    "机器学习  AI？" 与 "机器学习 ai" 得到相同的键
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION).strip()
+
+
+def make_key(*parts: Any) -> str:
+    """把多个部分拼成字符串键（可以直接存入磁盘层）"""
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+
+
+class DiskCacheTier:
+    """
+    SQLite 磁盘缓存层
+
+    值以 JSON 存储，只保存可序列化的数据；写入时顺带清理已彻底过期的条目
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        stale_until REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_cache_stale_until ON cache (stale_until);
+    """
+
+    def __init__(self, path: str, prune_every: int = 200):
+        """
+        Args:
+            path: 数据库文件路径
+            prune_every: 每写入多少次清理一次过期条目
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, stale_until FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, value: Any, expires_at: float, stale_until: float):
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                (key, data, expires_at, stale_until),
+            )
+            self._writes += 1
+            if self.prune_every and self._writes % self.prune_every == 0:
+                self._conn.execute("DELETE FROM cache WHERE stale_until < ?", (time.time(),))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TTLCache:
+    """
+    TTL + LRU 缓存
+
+    - 每个条目有自己的 ttl；过期后在 stale_ttl 秒内仍可作为旧值返回（状态 STALE）
+    - 超过 max_size 时淘汰最久未访问的条目
+    - 配置 disk_path 时，内存未命中会查询磁盘层，写入同时落盘（值需可 JSON 序列化）
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 300,
+        stale_ttl: float = 0,
+        disk_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            max_size: 内存中最多保存的条目数
+            ttl: 默认有效期（秒）
+            stale_ttl: 过期后仍可返回旧值的时间（秒），0 表示过期即失效
+            disk_path: 磁盘层数据库路径，None 表示只用内存
+            clock: 时间函数（磁盘层跨进程使用，需为墙上时间）
+        """
+        if max_size <= 0:
+            raise ValueError("max_size 必须大于 0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, list]" = OrderedDict()  # key -> [值, 过期时间, 旧值可用截止时间]
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.disk: Optional[DiskCacheTier] = None
+        if disk_path:
+            try:
+                self.disk = DiskCacheTier(disk_path)
+            except sqlite3.Error as e:
+                print(f"⚠️  缓存磁盘层不可用，仅使用内存: {e}")
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _store(self, key: str, entry: list):
+        """写入内存并按 LRU 淘汰（调用方需持有锁）"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Tuple[Any, str]:
+        """
+        查询缓存
+
+        Returns:
+            (值, 状态)，状态为 FRESH / STALE / MISS，未命中时值为 None
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry[2]:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return self._count_hit(entry, now)
+
+        if self.disk is not None:
+            try:
+                stored = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"⚠️  读取缓存磁盘层失败: {e}")
+                stored = None
+            if stored is not None and now < stored[2]:
+                entry = list(stored)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, entry)
+                    return self._count_hit(entry, now)
+
+        with self._lock:
+            self.misses += 1
+        return None, MISS
+
+    def _count_hit(self, entry: list, now: float) -> Tuple[Any, str]:
+        if now < entry[1]:
+            self.hits += 1
+            return entry[0], FRESH
+        self.stale_hits += 1
+        return entry[0], STALE
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """
+        写入缓存
+
+        Args:
+            key: 键
+            value: 值
+            ttl: 有效期（秒），默认使用缓存配置；不大于 0 时不缓存
+            stale_ttl: 过期后旧值可用时间（秒），默认使用缓存配置
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        now = self._clock()
+        entry = [value, now + ttl, now + ttl + max(stale_ttl, 0)]
+        with self._lock:
+            self._store(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, entry[1], entry[2])
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"⚠️  写入缓存磁盘层失败: {e}")
+
+    def refresh(self, key: str, loader: Callable[[], Any], executor: Executor,
+                ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> bool:
+        """
+        在后台重新加载一个条目（同一个键同时只有一个刷新任务）
+
+        加载失败时保留旧值，由下一次 STALE 命中再次触发刷新
+
+        Returns:
+            是否提交了新的刷新任务
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.refreshes += 1
+
+        def run():
+            try:
+                self.set(key, loader(), ttl=ttl, stale_ttl=stale_ttl)
+            except Exception as e:
+                with self._lock:
+                    self.refresh_failures += 1
+                print(f"⚠️  缓存后台刷新失败: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        try:
+            executor.submit(run)
+        except RuntimeError:
+            # 线程池已关闭（进程退出中）
+            with self._lock:
+                self._refreshing.discard(key)
+            return False
+        return True
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], executor: Optional[Executor] = None,
+                    ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> Any:
+        """
+        读取缓存，未命中时同步加载并写入
+
+        命中旧值时，提供了 executor 则先返回旧值并在后台刷新，否则同步重新加载
+        """
+        value, state = self.get(key)
+        if state == FRESH:
+            return value
+        if state == STALE and executor is not None:
+            self.refresh(key, loader, executor, ttl=ttl, stale_ttl=stale_ttl)
+            return value
+        value = loader()
+        self.set(key, value, ttl=ttl, stale_ttl=stale_ttl)
+        return value
+
+    def invalidate(self, key: str):
+        """删除一个条目（内存与磁盘）"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        """清空缓存（内存与磁盘）"""
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """命中、未命中与淘汰统计"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "disk": self.disk.path if self.disk is not None else None,
+            }
@@ -0,0 +1,427 @@
+"""
+本地书目检索模块
+从 JSONL / CSV 导出的书目构建倒排索引：标题、作者、简介与标签按字段加权，
+中文按相邻两字切分（与预排序使用同一个分词），BM25 打分，支持语言与类型过滤，
+并作为 "books" 来源接入 ContentFetcher
+"""
+
+import csv
+import json
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .content_sources import ContentSource, SourceNotReady, load_in_background
+from .ranker import tokenize
+
+
+# 参与检索的字段及其权重：词在标题中出现一次相当于在简介中出现三次
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "author": 2.0,
+    "tags": 2.0,
+    "description": 1.0,
+}
+
+# 返回给 Agent 的字段（与 ContentFetcher 其他来源的格式一致）
+RECORD_FIELDS = ("title", "author", "description", "url", "source", "type", "language", "tags")
+
+# 内置的示例书目，未设置 BOOK_CATALOG_PATH 时使用
+SAMPLE_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "data", "sample_books.jsonl")
+
+_CJK_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+_TAG_SEPARATORS = re.compile(r"[;,|、，；]")
+
+
+def guess_language(record: Dict) -> str:
+    """书目没有 language 字段时按标题与简介中是否有汉字判断"""
+    text = f"{record.get('title', '')}{record.get('description', '')}"
+    return "zh" if _CJK_PATTERN.search(text) else "en"
+
+
+def normalize_record(raw: Dict) -> Dict:
+    """
+    把一条导出记录整理为统一格式
+
+    tags 可以是列表，也可以是用分号、逗号、竖线或顿号分隔的字符串；缺少的字段补默认值
+    """
+    tags = raw.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in _TAG_SEPARATORS.split(tags) if tag.strip()]
+    record = {
+        "title": str(raw.get("title") or "").strip(),
+        "author": str(raw.get("author") or "").strip(),
+        "description": str(raw.get("description") or "").strip(),
+        "url": str(raw.get("url") or "").strip(),
+        "source": str(raw.get("source") or "本地书目").strip(),
+        "type": str(raw.get("type") or "book").strip().lower(),
+        "tags": [str(tag) for tag in tags],
+    }
+    record["language"] = str(raw.get("language") or guess_language(record)).strip().lower()
+    return record
+
+
+def load_records(path: str) -> Iterator[Dict]:
+    """
+    逐条读取书目导出文件（按扩展名区分 .csv 与 JSONL），跳过没有标题或无法解析的行
+
+    Args:
+        path: 文件路径
+
+    Yields:
+        统一格式的书目记录
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows: Iterable = csv.DictReader(f)
+        else:
+            rows = _jsonl_rows(f, path)
+        for row in rows:
+            record = normalize_record(row)
+            if record["title"]:
+                yield record
+
+
+def _jsonl_rows(lines: Iterable[str], path: str) -> Iterator[Dict]:
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"⚠️  跳过 {path} 第{number}行: {e}")
+
+
+def field_terms(record: Dict) -> Counter:
+    """一条记录中每个词按字段权重累加的词频"""
+    terms: Counter = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = record.get(field) or ""
+        if isinstance(value, list):
+            value = " ".join(value)
+        for token, count in Counter(tokenize(value)).items():
+            terms[token] += count * weight
+    return terms
+
+
+class CatalogIndex:
+    """
+    倒排索引（CSR 布局，全部为 NumPy 数组）
+
+    - terms: 词 -> 词ID
+    - offsets: 词ID 对应的倒排列表在 docs / impacts 中的区间 [offsets[t], offsets[t+1])
+    - docs: 倒排列表中的文档ID（按文档ID升序）
+    - impacts: 预先算好的 BM25 词频部分 tf*(k1+1)/(tf+k1*(1-b+b*dl/avgdl))，查询时只需乘以 idf 累加
+    - idf: 每个词的逆文档频率
+    - languages / types: 每个文档的语言与类型编码，编码表为 language_codes / type_codes
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        impacts: np.ndarray,
+        idf: np.ndarray,
+        languages: np.ndarray,
+        types: np.ndarray,
+        language_codes: Sequence[str],
+        type_codes: Sequence[str]
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.impacts = impacts
+        self.idf = idf
+        self.languages = languages
+        self.types = types
+        self.language_codes = list(language_codes)
+        self.type_codes = list(type_codes)
+
+    def __len__(self) -> int:
+        return len(self.languages)
+
+    @classmethod
+    def build(cls, records: Iterable[Dict], k1: float = 1.2, b: float = 0.75) -> "CatalogIndex":
+        """
+        从书目记录构建索引
+
+        Args:
+            records: 统一格式的书目记录（只读取一遍，可以是生成器）
+            k1, b: BM25 参数
+        """
+        terms: Dict[str, int] = {}
+        language_codes: Dict[str, int] = {}
+        type_codes: Dict[str, int] = {}
+        posting_terms, posting_docs, posting_tf = array("i"), array("i"), array("f")
+        lengths, languages, types = array("f"), array("B"), array("B")
+
+        for doc, record in enumerate(records):
+            counts = field_terms(record)
+            for token, tf in counts.items():
+                posting_terms.append(terms.setdefault(token, len(terms)))
+                posting_docs.append(doc)
+                posting_tf.append(tf)
+            lengths.append(sum(counts.values()))
+            languages.append(_code(language_codes, record.get("language", "")))
+            types.append(_code(type_codes, record.get("type", "")))
+
+        term_ids = np.frombuffer(posting_terms, dtype=np.int32)
+        # 稳定排序：同一个词的倒排列表保持文档ID升序
+        order = np.argsort(term_ids, kind="stable")
+        docs = np.frombuffer(posting_docs, dtype=np.int32)[order]
+        tf = np.frombuffer(posting_tf, dtype=np.float32)[order]
+        df = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        n = len(lengths)
+        lengths_array = np.frombuffer(lengths, dtype=np.float32)
+        avg_length = float(lengths_array.mean()) if n else 1.0
+        norms = k1 * (1 - b + b * lengths_array / max(avg_length, 1e-9))
+        impacts = (tf * (k1 + 1) / (tf + norms[docs])).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        return cls(
+            terms=terms,
+            offsets=offsets,
+            docs=docs,
+            impacts=impacts,
+            idf=idf,
+            languages=np.frombuffer(languages, dtype=np.uint8),
+            types=np.frombuffer(types, dtype=np.uint8),
+            language_codes=_code_table(language_codes),
+            type_codes=_code_table(type_codes),
+        )
+
+    def term_id(self, token: str) -> Optional[int]:
+        return self.terms.get(token)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        language: Optional[str] = None,
+        content_type: Optional[str] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            language: 只返回该语言的文档，None 表示不限
+            content_type: 只返回该类型的文档，None 表示不限
+
+        Returns:
+            [(文档ID, 得分)]，按得分从高到低排列；得分相同时文档ID小的在前
+        """
+        postings_docs, postings_scores = [], []
+        for token, count in Counter(tokenize(query)).items():
+            term = self.term_id(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            postings_docs.append(self.docs[start:end])
+            postings_scores.append(self.impacts[start:end] * (self.idf[term] * count))
+        if not postings_docs or top_k <= 0:
+            return []
+
+        docs = np.concatenate(postings_docs)
+        contributions = np.concatenate(postings_scores)
+        if len(docs) * 8 >= len(self):
+            # 命中的文档很多时直接按文档ID累加
+            scores = np.bincount(docs, weights=contributions, minlength=len(self))
+            candidates = np.flatnonzero(scores)
+            scores = scores[candidates]
+        else:
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions)
+
+        mask = self._filter_mask(candidates, language, content_type)
+        if mask is not None:
+            candidates, scores = candidates[mask], scores[mask]
+        if len(candidates) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def _filter_mask(
+        self,
+        candidates: np.ndarray,
+        language: Optional[str],
+        content_type: Optional[str]
+    ) -> Optional[np.ndarray]:
+        mask = None
+        for value, column, codes in (
+            (language, self.languages, self.language_codes),
+            (content_type, self.types, self.type_codes),
+        ):
+            if value is None:
+                continue
+            value = value.lower()
+            if value not in codes:
+                return np.zeros(len(candidates), dtype=bool)
+            matches = column[candidates] == codes.index(value)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+
+def _code(table: Dict[str, int], value: str) -> int:
+    code = table.setdefault(value, len(table))
+    if code > 255:
+        raise ValueError(f"取值种类超过 256 个: {value}")
+    return code
+
+
+def _code_table(table: Dict[str, int]) -> List[str]:
+    return sorted(table, key=table.get)
+
+
+class BookCatalog:
+    """
+    本地书目：倒排索引 + 按文档ID读取的记录
+
+    用法:
+        catalog = BookCatalog.from_file("books.jsonl")
+        books = catalog.search("机器学习 入门", top_k=10, language="zh")
+    """
+
+    def __init__(self, index: CatalogIndex, records: Sequence[Dict]):
+        self.index = index
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], **kwargs) -> "BookCatalog":
+        """从统一格式的书目记录构建（kwargs 传给 CatalogIndex.build）"""
+        records = list(records)
+        return cls(CatalogIndex.build(records, **kwargs), records)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "BookCatalog":
+        """从 JSONL / CSV 导出文件构建"""
+        return cls.from_records(load_records(path), **kwargs)
+
+    def record(self, doc: int) -> Dict:
+        """读取一条记录（副本）"""
+        record = self.records[doc]
+        return {field: record.get(field) for field in RECORD_FIELDS}
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        language: Optional[str] = None,
+        content_type: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        检索书目
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            language: 语言过滤（zh / en），None 表示不限
+            content_type: 类型过滤（例如 book），None 表示不限
+
+        Returns:
+            书目记录列表，每条带有 score 字段
+        """
+        results = []
+        for doc, score in self.index.search(query, top_k, language, content_type):
+            record = self.record(doc)
+            record["score"] = round(score, 4)
+            results.append(record)
+        return results
+
+
+class CatalogSource(ContentSource):
+    """
+    以本地书目为后端的书籍来源
+
+    按请求的语言过滤；该语言没有结果时不限语言再查一次（例如只有英文版的技术书）。
+    没有传入 catalog 时，创建时即在后台线程加载共享的书目（见 load_book_catalog），
+    加载完成之前的检索抛出 SourceNotReady（跳过本来源），大书目的加载不会占用请求的超时时间
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[BookCatalog] = None,
+        path: Optional[str] = None,
+        name: str = "books",
+        top_k: int = 20,
+        timeout: float = 2.0
+    ):
+        self.catalog = catalog
+        self.path = path
+        self.name = name
+        self.top_k = top_k
+        self.timeout = timeout
+        self._loading = load_book_catalog(path) if catalog is None else None
+
+    def matches(self, query: str, content_type: str, language: str) -> bool:
+        return content_type in ["book", "both"]
+
+    def search(self, query: str, content_type: str, language: str) -> List[Dict]:
+        if self.catalog is None:
+            if not self._loading.done():
+                raise SourceNotReady("书目正在后台加载")
+            try:
+                self.catalog = self._loading.result()
+            except Exception:
+                # 加载失败：重新开始加载，本次按来源故障处理
+                self._loading = load_book_catalog(self.path)
+                raise
+        results = self.catalog.search(query, self.top_k, language=language or None)
+        if not results and language:
+            results = self.catalog.search(query, self.top_k)
+        return results
+
+
+# 进程内共享的书目（按路径）：加载中或已加载的 Future，加载在后台线程中进行，全局锁只保护字典本身
+_catalogs: Dict[str, Future] = {}
+_catalogs_lock = threading.Lock()
+
+
+def load_book_catalog(path: Optional[str] = None) -> Future:
+    """
+    开始（或复用）在后台线程加载进程内共享的书目，加载失败后再次调用会重新加载
+
+    Args:
+        path: 书目文件路径（默认从环境变量 BOOK_CATALOG_PATH 读取，未设置时使用内置示例书目）。
+            build_catalog 生成的二进制文件用 mmap 打开，JSONL / CSV 导出文件在内存中构建索引
+
+    Returns:
+        结果为 BookCatalog 的 Future
+    """
+    from .catalog_file import is_catalog_file, open_catalog
+
+    path = os.path.abspath(path or os.getenv("BOOK_CATALOG_PATH") or SAMPLE_CATALOG_PATH)
+    with _catalogs_lock:
+        future = _catalogs.get(path)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _catalogs[path] = load_in_background(
+                lambda: open_catalog(path) if is_catalog_file(path) else BookCatalog.from_file(path),
+                f"catalog-load {os.path.basename(path)}"
+            )
+        return future
+
+
+def get_book_catalog(path: Optional[str] = None) -> BookCatalog:
+    """
+    获取进程内共享的书目，尚未加载完成时等待加载结束（离线工具与不限时的调用方使用）
+
+    Args:
+        path: 书目文件路径，见 load_book_catalog
+    """
+    return load_book_catalog(path).result()
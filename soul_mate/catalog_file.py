@@ -0,0 +1,272 @@
+"""
+书目二进制文件模块
+把书目与倒排索引写成一个列式二进制文件（.smcat），用 mmap 只读打开：
+打开时只解析文件头，索引数组直接映射为 NumPy 数组，记录只在读取命中的文档时解码。
+多个工作进程打开同一个文件时通过操作系统页缓存共享内存
+
+文件布局（所有区段按 64 字节对齐）:
+  8 字节魔数 b"SMCATLG1" | 8 字节小端文件头长度 | JSON 文件头 | 各区段
+文件头记录书目条数、编码表与每个区段的 (偏移, 字节数, dtype)：
+  - 定长列: languages / types（uint8 编码）
+  - 字符串列: <字段>.offsets（uint64，n+1 个）+ <字段>.data（UTF-8 拼接），tags 以 \\x1f 分隔
+  - 词典: terms.offsets + terms.data，按 UTF-8 字节序排列，词ID 即排序位置，查询时二分查找
+  - 倒排索引: postings.offsets（int64）/ postings.docs（int32）/ postings.impacts（float32）/ idf（float32）
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .catalog import RECORD_FIELDS, BookCatalog, CatalogIndex
+
+
+MAGIC = b"SMCATLG1"
+VERSION = 1
+ALIGNMENT = 64
+TAG_SEPARATOR = "\x1f"
+
+# 以字符串列存储的字段（language / type 以编码列存储）
+STRING_FIELDS = ("title", "author", "description", "url", "source", "tags")
+
+
+class CatalogFormatError(ValueError):
+    """文件不是书目二进制文件，或版本不受支持"""
+
+
+class _StringColumnWriter:
+    """边读取记录边把字符串追加到临时文件，构建时不在内存中保留记录"""
+
+    def __init__(self, directory: str, name: str):
+        self.path = os.path.join(directory, f"{name}.data")
+        self._file = open(self.path, "wb")
+        self.offsets = array("Q", [0])
+
+    def append(self, value: str):
+        encoded = value.encode("utf-8")
+        self._file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+    def close(self):
+        self._file.close()
+
+
+def _sorted_index(index: CatalogIndex):
+    """把词ID 重新编号为词的 UTF-8 字节序，返回 (排序后的词, offsets, docs, impacts, idf)"""
+    terms = sorted(index.terms, key=lambda term: term.encode("utf-8"))
+    order = np.fromiter((index.terms[term] for term in terms), dtype=np.int64, count=len(terms))
+    lengths = np.diff(index.offsets)[order]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # 第 i 个新区段依次取旧区段 [index.offsets[order[i]], ...) 的元素
+    gather = np.repeat(index.offsets[:-1][order] - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+    return terms, offsets, index.docs[gather], index.impacts[gather], index.idf[order]
+
+
+def write_catalog(records: Iterable[Dict], path: str, **kwargs) -> int:
+    """
+    把书目记录写成二进制文件（先写临时文件再原子替换）
+
+    Args:
+        records: 统一格式的书目记录（只读取一遍，可以是生成器）
+        path: 输出路径
+        kwargs: 传给 CatalogIndex.build 的 BM25 参数
+
+    Returns:
+        写入的记录条数
+    """
+    workdir = tempfile.mkdtemp(prefix="catalog_build_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        columns = {field: _StringColumnWriter(workdir, field) for field in STRING_FIELDS}
+
+        def spool() -> Iterator[Dict]:
+            for record in records:
+                for field, column in columns.items():
+                    value = record.get(field) or ""
+                    column.append(TAG_SEPARATOR.join(value) if isinstance(value, list) else str(value))
+                yield record
+
+        index = CatalogIndex.build(spool(), **kwargs)
+        for column in columns.values():
+            column.close()
+        terms, offsets, docs, impacts, idf = _sorted_index(index)
+
+        term_offsets = array("Q", [0])
+        term_data = bytearray()
+        for term in terms:
+            term_data += term.encode("utf-8")
+            term_offsets.append(len(term_data))
+
+        sections = [
+            ("languages", index.languages),
+            ("types", index.types),
+            ("terms.offsets", np.frombuffer(term_offsets, dtype=np.uint64)),
+            ("terms.data", np.frombuffer(bytes(term_data), dtype=np.uint8)),
+            ("postings.offsets", offsets),
+            ("postings.docs", docs.astype(np.int32, copy=False)),
+            ("postings.impacts", impacts.astype(np.float32, copy=False)),
+            ("idf", idf.astype(np.float32, copy=False)),
+        ]
+        for field, column in columns.items():
+            sections.append((f"{field}.offsets", np.frombuffer(column.offsets, dtype=np.uint64)))
+            sections.append((f"{field}.data", column.path))
+
+        _write_file(path, workdir, sections, {
+            "version": VERSION,
+            "count": len(index),
+            "language_codes": index.language_codes,
+            "type_codes": index.type_codes,
+        })
+        return len(index)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _section_size(content) -> int:
+    return os.path.getsize(content) if isinstance(content, str) else content.nbytes
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def _data_start(header_length: int) -> int:
+    """区段从文件头之后的第一个对齐位置开始，文件头中的偏移相对于该位置"""
+    return _align(len(MAGIC) + 8 + header_length)
+
+
+def _write_file(path: str, workdir: str, sections: List, header: Dict):
+    layout = {}
+    position = 0
+    for name, content in sections:
+        dtype = "uint8" if isinstance(content, str) else str(content.dtype)
+        layout[name] = [position, _section_size(content), dtype]
+        position = _align(position + _section_size(content))
+    header["sections"] = layout
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    base = _data_start(len(encoded))
+
+    tmp_path = os.path.join(workdir, "catalog.smcat")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        for name, content in sections:
+            f.write(b"\0" * (base + layout[name][0] - f.tell()))
+            if isinstance(content, str):
+                with open(content, "rb") as source:
+                    shutil.copyfileobj(source, f, 1 << 20)
+            else:
+                f.write(np.ascontiguousarray(content).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MappedCatalogIndex(CatalogIndex):
+    """映射到二进制文件上的倒排索引：数组直接引用 mmap，词典用二分查找"""
+
+    def __init__(self, sections: Dict[str, np.ndarray], header: Dict):
+        super().__init__(
+            terms={},
+            offsets=sections["postings.offsets"],
+            docs=sections["postings.docs"],
+            impacts=sections["postings.impacts"],
+            idf=sections["idf"],
+            languages=sections["languages"],
+            types=sections["types"],
+            language_codes=header["language_codes"],
+            type_codes=header["type_codes"],
+        )
+        self._term_offsets = sections["terms.offsets"]
+        self._term_data = sections["terms.data"]
+
+    def _term(self, position: int) -> bytes:
+        start, end = self._term_offsets[position], self._term_offsets[position + 1]
+        return self._term_data[start:end].tobytes()
+
+    def term_id(self, token: str) -> Optional[int]:
+        target = token.encode("utf-8")
+        low, high = 0, len(self._term_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._term_offsets) - 1 and self._term(low) == target:
+            return low
+        return None
+
+
+class MappedRecords(Sequence):
+    """按文档ID 惰性解码的记录列"""
+
+    def __init__(self, sections: Dict[str, np.ndarray], index: CatalogIndex, count: int):
+        self._sections = sections
+        self._index = index
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, field: str, doc: int) -> str:
+        offsets = self._sections[f"{field}.offsets"]
+        return self._sections[f"{field}.data"][offsets[doc]:offsets[doc + 1]].tobytes().decode("utf-8")
+
+    def __getitem__(self, doc: int) -> Dict:
+        if not 0 <= doc < self._count:
+            raise IndexError(doc)
+        record = {field: self._string(field, doc) for field in STRING_FIELDS}
+        record["tags"] = record["tags"].split(TAG_SEPARATOR) if record["tags"] else []
+        record["language"] = self._index.language_codes[self._index.languages[doc]]
+        record["type"] = self._index.type_codes[self._index.types[doc]]
+        return {field: record[field] for field in RECORD_FIELDS}
+
+
+def is_catalog_file(path: str) -> bool:
+    """文件是否以书目二进制文件的魔数开头"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def open_catalog(path: str) -> BookCatalog:
+    """
+    用 mmap 只读打开书目二进制文件
+
+    Args:
+        path: write_catalog 生成的文件
+
+    Returns:
+        BookCatalog（索引与记录都引用映射的内存，不复制）
+
+    Raises:
+        CatalogFormatError: 文件格式或版本不正确
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise CatalogFormatError(f"不是书目二进制文件: {path}")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (header_length,) = struct.unpack_from("<Q", mapped, len(MAGIC))
+    start = len(MAGIC) + 8
+    header = json.loads(mapped[start:start + header_length].decode("utf-8"))
+    if header.get("version") != VERSION:
+        raise CatalogFormatError(f"不支持的书目文件版本: {header.get('version')}")
+
+    # 数组通过缓冲区引用 mmap，最后一个数组释放后映射才会关闭
+    base = _data_start(header_length)
+    sections = {}
+    for name, (offset, nbytes, dtype) in header["sections"].items():
+        dtype = np.dtype(dtype)
+        sections[name] = np.frombuffer(mapped, dtype=dtype, count=nbytes // dtype.itemsize, offset=base + offset)
+    index = MappedCatalogIndex(sections, header)
+    return BookCatalog(index, MappedRecords(sections, index, header["count"]))
@@ -0,0 +1,434 @@
+"""
+协同过滤模块
+汇总所有用户的喜欢/不喜欢反馈，构建物品-物品共现模型（SciPy 稀疏矩阵）：
+两个物品被同一用户喜欢的次数为共现数，相似度为余弦 C_ij / sqrt(n_i * n_j)，每个物品只保留最相似的若干个邻居。
+增量更新只读取上次扫描之后修改过的画像，按每个用户新旧反馈的差值更新共现矩阵，不需要重新扫描全部用户。
+CollaborativeSource 把 recommend_for_user 的结果作为 "collaborative" 来源接入 ContentFetcher
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .cache import normalize_text
+from .catalog import RECORD_FIELDS
+from .content_sources import ContentSource
+from .profile_events import index_feedback
+from .profile_store import ProfileStore
+from .ranker import item_key
+
+
+# 增量扫描的时间回退（秒）：文件修改时间精度有限，回退一点重复处理同一用户是无害的
+_SCAN_MARGIN = 2.0
+
+
+def feedback_item_key(item_id: str, entry: Dict) -> str:
+    """
+    反馈条目对应的物品键：有标题时为 类型 + 规范化后的标题与作者（不同用户用不同 item_id 反馈同一本书也能对上），
+    否则为规范化后的 item_id
+    """
+    if entry.get("title"):
+        return "\x1f".join(part or "" for part in item_key(entry))
+    return f"id\x1f{normalize_text(str(item_id))}"
+
+
+def _pairs(indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """一个用户喜欢的物品两两组合（含自身，对角线即喜欢人数）"""
+    return np.repeat(indices, len(indices)), np.tile(indices, len(indices))
+
+
+def load_user_feedback(store: ProfileStore, user_id: str) -> Optional[Tuple[List[Dict], List[Dict]]]:
+    """
+    读出一个用户的反馈（每个物品只保留最新一次，按时间排序）
+
+    Returns:
+        (喜欢的条目, 不喜欢的条目)；用户不存在时返回 None
+    """
+    profile = store.load(user_id)
+    if profile is None:
+        return None
+    if "feedback" not in profile:
+        profile.update(store.load_collections(user_id))
+    feedback = index_feedback(profile)["feedback"]
+    return (
+        [dict(entry, item_id=item_id) for item_id, entry in feedback["liked"].items()],
+        [dict(entry, item_id=item_id) for item_id, entry in feedback["disliked"].items()],
+    )
+
+
+class ItemCooccurrenceModel:
+    """
+    物品-物品共现模型
+
+    - cooccurrence: 物品数 x 物品数的 CSR 共现计数矩阵（对角线为喜欢该物品的用户数），增量更新直接加减
+    - similarity: 由共现矩阵计算的余弦相似度（去掉对角线与共现数不足 min_support 的组合），每行保留前 neighbors 个
+    - users: 每个用户计入模型的喜欢/不喜欢物品下标，增量更新时据此扣除旧的贡献
+    """
+
+    def __init__(
+        self,
+        neighbors: int = 100,
+        min_support: int = 1,
+        max_user_items: int = 500,
+        dislike_weight: float = 1.0
+    ):
+        """
+        Args:
+            neighbors: 每个物品保留的相似物品数
+            min_support: 至少被多少个用户同时喜欢才算相似
+            max_user_items: 每个用户只取最近的多少条喜欢（限制单个用户产生的组合数）
+            dislike_weight: recommend_for_user 中不喜欢物品的相似物品扣分权重
+        """
+        self.neighbors = neighbors
+        self.min_support = min_support
+        self.max_user_items = max_user_items
+        self.dislike_weight = dislike_weight
+        self._reset()
+
+    def _reset(self):
+        self.keys: List[str] = []
+        self.items: List[Dict] = []
+        self.aliases: Dict[str, int] = {}  # 规范化后的 item_id -> 物品下标
+        self.users: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.scanned_at: Optional[float] = None
+        self.cooccurrence = sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.similarity = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _item(self, item_id: str, entry: Dict) -> int:
+        """物品下标（新物品追加到末尾），并用最新的反馈条目更新物品信息"""
+        key = feedback_item_key(item_id, entry)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.keys)
+            self.keys.append(key)
+            self.items.append({})
+        item = {field: entry[field] for field in RECORD_FIELDS if entry.get(field)}
+        if item:
+            self.items[index] = item
+        self.aliases[normalize_text(str(item_id))] = index
+        return index
+
+    def lookup(self, item_id: str, entry: Optional[Dict] = None) -> Optional[int]:
+        """按反馈条目（标题与作者）或 item_id 查找物品下标"""
+        if entry:
+            index = self._index.get(feedback_item_key(item_id, entry))
+            if index is not None:
+                return index
+        return self.aliases.get(normalize_text(str(item_id)))
+
+    def apply_users(self, changes: Dict[str, Optional[Tuple[List[Dict], List[Dict]]]]):
+        """
+        用一批用户的最新反馈更新模型：共现矩阵加上新组合、减去该用户旧的组合，然后重算相似度
+
+        Args:
+            changes: user_id -> (喜欢的条目, 不喜欢的条目)，None 表示用户已删除
+        """
+        rows, cols, data = [], [], []
+        for user_id, feedback in changes.items():
+            old_liked, _ = self.users.pop(user_id, ([], []))
+            if old_liked:
+                old = np.asarray(old_liked, dtype=np.int64)
+                old_rows, old_cols = _pairs(old)
+                rows.append(old_rows)
+                cols.append(old_cols)
+                data.append(np.full(len(old_rows), -1, dtype=np.int32))
+            if feedback is None:
+                continue
+            liked, disliked = feedback
+            liked = [self._item(entry["item_id"], entry) for entry in liked[-self.max_user_items:]]
+            disliked = [self._item(entry["item_id"], entry) for entry in disliked[-self.max_user_items:]]
+            if liked or disliked:
+                self.users[user_id] = (liked, disliked)
+            if liked:
+                new_rows, new_cols = _pairs(np.asarray(liked, dtype=np.int64))
+                rows.append(new_rows)
+                cols.append(new_cols)
+                data.append(np.ones(len(new_rows), dtype=np.int32))
+
+        n = len(self.keys)
+        cooccurrence = self.cooccurrence.copy()
+        cooccurrence.resize((n, n))
+        if rows:
+            delta = sparse.csr_matrix(
+                (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n), dtype=np.int32
+            )
+            cooccurrence = cooccurrence + delta
+            cooccurrence.eliminate_zeros()
+        self.cooccurrence = cooccurrence.tocsr()
+        self.similarity = self._compute_similarity()
+
+    def _compute_similarity(self) -> sparse.csr_matrix:
+        """由共现矩阵计算余弦相似度，每行只保留得分最高的 neighbors 个"""
+        n = len(self.keys)
+        counts = self.cooccurrence.diagonal().astype(np.float64)
+        pairs = self.cooccurrence.tocoo()
+        keep = (pairs.row != pairs.col) & (pairs.data >= self.min_support)
+        rows, cols = pairs.row[keep], pairs.col[keep]
+        scores = pairs.data[keep] / np.sqrt(np.maximum(counts[rows] * counts[cols], 1.0))
+        # 按行、得分从高到低排序后，每行取前 neighbors 个
+        order = np.lexsort((-scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        starts = np.searchsorted(rows, np.arange(n))
+        keep = np.arange(len(rows)) - starts[rows] < self.neighbors
+        return sparse.csr_matrix(
+            (scores[keep].astype(np.float32), (rows[keep], cols[keep])), shape=(n, n)
+        )
+
+    def fit(self, store: ProfileStore) -> int:
+        """
+        扫描存储中的全部用户，重新构建模型
+
+        Returns:
+            扫描的用户数
+        """
+        started = time.time()
+        self._reset()
+        changes = self._scan(store, store.list_users())
+        self.apply_users(changes)
+        self.scanned_at = started
+        return len(changes)
+
+    def update(self, store: ProfileStore) -> int:
+        """
+        增量更新：只读取上次扫描之后写入过存储的用户（见 ProfileStore.updated_users），并移除已删除的用户；
+        从未扫描过时等同于 fit()
+
+        Returns:
+            重新读取的用户数
+        """
+        if self.scanned_at is None:
+            return self.fit(store)
+        started = time.time()
+        changes = self._scan(store, store.updated_users(self.scanned_at - _SCAN_MARGIN))
+        existing = set(store.list_users())
+        changes.update({user_id: None for user_id in self.users if user_id not in existing})
+        self.apply_users(changes)
+        self.scanned_at = started
+        return len(changes)
+
+    @staticmethod
+    def _scan(store: ProfileStore, user_ids: Iterable[str]) -> Dict[str, Optional[Tuple[List[Dict], List[Dict]]]]:
+        changes = {}
+        for user_id in user_ids:
+            try:
+                changes[user_id] = load_user_feedback(store, user_id)
+            except Exception as e:
+                print(f"⚠️  跳过 {user_id}: {e}")
+        return changes
+
+    def _results(self, indices: np.ndarray, scores: np.ndarray, k: int, content_type: Optional[str]) -> List[Dict]:
+        """按得分从高到低返回物品信息（带 score 字段），可按内容类型过滤；没有标题的物品（只有 item_id）跳过"""
+        results = []
+        for position in np.argsort(-scores, kind="stable"):
+            if scores[position] <= 0 or len(results) >= k:
+                break
+            item = dict(self.items[indices[position]])
+            if not item.get("title"):
+                continue
+            if content_type not in (None, "both") and item.get("type") not in (None, content_type):
+                continue
+            item["score"] = round(float(scores[position]), 4)
+            results.append(item)
+        return results
+
+    def similar_items(self, item_id: str, k: int = 10, entry: Optional[Dict] = None) -> List[Dict]:
+        """
+        与某个物品最相似的物品
+
+        Args:
+            item_id: 反馈时使用的 item_id
+            k: 返回数量
+            entry: 物品信息（有标题与作者时优先按它们查找）
+
+        Returns:
+            物品信息列表，每条带有 score 字段（余弦相似度）；物品不在模型中时为空
+        """
+        index = self.lookup(item_id, entry)
+        if index is None:
+            return []
+        row = self.similarity.getrow(index)
+        return self._results(row.indices, row.data, k, None)
+
+    def recommend_for_user(
+        self,
+        user_id: str,
+        k: int = 10,
+        liked: Optional[List[Dict]] = None,
+        disliked: Optional[List[Dict]] = None,
+        content_type: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        为用户推荐：喜欢的物品的相似物品得分相加，减去不喜欢物品的相似物品得分，排除已反馈过的物品
+
+        Args:
+            user_id: 用户ID
+            k: 返回数量
+            liked / disliked: 用户最新的反馈条目（带 item_id）；都为 None 时使用模型中记录的该用户反馈
+            content_type: 只返回该类型的物品（book / article），None 或 both 表示不限
+
+        Returns:
+            物品信息列表，每条带有 score 字段
+        """
+        if liked is None and disliked is None:
+            liked_indices, disliked_indices = self.users.get(user_id, ([], []))
+        else:
+            liked_indices = [self.lookup(entry.get("item_id", ""), entry) for entry in liked or []]
+            disliked_indices = [self.lookup(entry.get("item_id", ""), entry) for entry in disliked or []]
+            liked_indices = [index for index in liked_indices if index is not None]
+            disliked_indices = [index for index in disliked_indices if index is not None]
+        rated = list(liked_indices) + list(disliked_indices)
+        if not liked_indices or len(self.keys) == 0:
+            return []
+
+        # 一次稀疏的行向量 x 矩阵乘法汇总所有已反馈物品的邻居
+        weights = np.concatenate([
+            np.ones(len(liked_indices), dtype=np.float32),
+            np.full(len(disliked_indices), -self.dislike_weight, dtype=np.float32),
+        ])
+        selector = sparse.csr_matrix(
+            (weights, (np.zeros(len(rated), dtype=np.int64), np.arange(len(rated)))), shape=(1, len(rated))
+        )
+        scores = (selector @ self.similarity[rated]).tocsr()
+        indices, values = scores.indices, scores.data
+        keep = ~np.isin(indices, rated)
+        return self._results(indices[keep], values[keep], k, content_type)
+
+    def save(self, path: str):
+        """原子写入 .npz（共现矩阵、相似度矩阵与 JSON 元数据）"""
+        meta = {
+            "neighbors": self.neighbors,
+            "min_support": self.min_support,
+            "max_user_items": self.max_user_items,
+            "dislike_weight": self.dislike_weight,
+            "scanned_at": self.scanned_at,
+            "keys": self.keys,
+            "items": self.items,
+            "aliases": self.aliases,
+            "users": self.users,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                    cooccurrence_data=self.cooccurrence.data,
+                    cooccurrence_indices=self.cooccurrence.indices,
+                    cooccurrence_indptr=self.cooccurrence.indptr,
+                    similarity_data=self.similarity.data,
+                    similarity_indices=self.similarity.indices,
+                    similarity_indptr=self.similarity.indptr,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "ItemCooccurrenceModel":
+        """从 save() 写入的文件加载"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(meta["neighbors"], meta["min_support"], meta["max_user_items"], meta["dislike_weight"])
+            n = len(meta["keys"])
+            for name in ("cooccurrence", "similarity"):
+                setattr(model, name, sparse.csr_matrix(
+                    (data[f"{name}_data"], data[f"{name}_indices"], data[f"{name}_indptr"]), shape=(n, n)
+                ))
+        model.scanned_at = meta["scanned_at"]
+        model.keys = meta["keys"]
+        model.items = meta["items"]
+        model.aliases = meta["aliases"]
+        model.users = {user_id: (liked, disliked) for user_id, (liked, disliked) in meta["users"].items()}
+        model._index = {key: index for index, key in enumerate(model.keys)}
+        return model
+
+
+# 进程内共享的模型（按路径），文件被离线任务替换后在下次使用时重新加载
+_models: Dict[str, Tuple[float, ItemCooccurrenceModel]] = {}
+_models_lock = threading.Lock()
+
+
+def get_collaborative_model(path: Optional[str] = None) -> Optional[ItemCooccurrenceModel]:
+    """
+    获取（或重新加载）进程内共享的协同过滤模型
+
+    Args:
+        path: 模型文件（默认从环境变量 COLLABORATIVE_MODEL_PATH 读取）
+
+    Returns:
+        模型；未配置或文件不存在时返回 None
+    """
+    path = path or os.getenv("COLLABORATIVE_MODEL_PATH")
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _models_lock:
+        cached = _models.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _models[path] = (mtime, ItemCooccurrenceModel.load(path))
+        return cached[1]
+
+
+class CollaborativeSource(ContentSource):
+    """
+    协同过滤来源：按该用户最新的反馈，从共现模型中取与其喜欢的物品相似、其他用户也喜欢的内容
+
+    结果与查询无关、只对该用户有效：不缓存，请求合并按用户区分（scope）
+    """
+
+    cache_ttl = 0
+
+    def __init__(
+        self,
+        user_profile,
+        model: Optional[ItemCooccurrenceModel] = None,
+        path: Optional[str] = None,
+        name: str = "collaborative",
+        top_k: int = 10,
+        timeout: float = 1.0
+    ):
+        """
+        Args:
+            user_profile: 当前用户的 UserProfile
+            model: 协同过滤模型，不传入时通过 get_collaborative_model(path) 加载
+            path: 模型文件路径
+            name: 来源名称
+            top_k: 每次返回的数量
+            timeout: 单次调用超时（秒）
+        """
+        self.user_profile = user_profile
+        self.model = model
+        self.path = path
+        self.name = name
+        self.scope = user_profile.user_id
+        self.top_k = top_k
+        self.timeout = timeout
+
+    def search(self, query: str, content_type: str, language: str) -> List[Dict]:
+        model = self.model or get_collaborative_model(self.path)
+        if model is None:
+            return []
+        return model.recommend_for_user(
+            self.user_profile.user_id,
+            self.top_k,
+            liked=self.user_profile.get_recent_feedback(liked=True, limit=model.max_user_items),
+            disliked=self.user_profile.get_recent_feedback(liked=False, limit=model.max_user_items),
+            content_type=content_type,
+        )
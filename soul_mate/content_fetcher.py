@@ -3,79 +3,342 @@
 负责从多个来源获取书籍和文章信息
 """
 
+import asyncio
 import json
+import os
+import shlex
 import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Dict, Optional
 
+from .cache import FRESH, MISS, STALE, TTLCache, make_key, normalize_text
+from .catalog import CatalogSource, get_book_catalog
+from .ranker import reciprocal_rank_fusion
+from .vector_index import EmbeddingSource
+from .mcp_client import MCPConnectionError, get_mcp_session, tool_result_text
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .content_sources import (
+    HUGGINGFACE_KEYWORDS,
+    ContentSource,
+    FunctionSource,
+    SourceNotReady,
+    circuit_breaker_stats,
+    get_circuit_breaker,
+)
+
+
+# 各来源的默认超时（秒），并发模式下超时的来源结果被丢弃
+DEFAULT_SOURCE_TIMEOUTS = {
+    "books": 2.0,
+    "articles": 2.0,
+    "huggingface": 6.0,
+}
+
+# 各来源结果的默认缓存时间（秒），未列出的来源使用 FETCH_CACHE_TTL
+DEFAULT_SOURCE_CACHE_TTLS = {
+    "books": 3600.0,
+    "articles": 600.0,
+    "huggingface": 1800.0,
+}
+
+# 所有 ContentFetcher 共享的抓取线程池
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("FETCH_MAX_WORKERS", "16")),
+                    thread_name_prefix="content-fetch"
+                )
+    return _executor
+
+
+# 所有 ContentFetcher 共享的请求合并：同时进行的相同查询（相同来源、规范化后的查询、类型与语言）只抓取一次
+_fetch_flight = SingleFlight()
+_async_fetch_flight = AsyncSingleFlight()
+
+
+# 所有 ContentFetcher 共享的结果缓存（热门查询在不同用户之间复用）
+_result_cache: Optional[TTLCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> TTLCache:
+    """获取进程内共享的内容结果缓存（配置从环境变量读取）"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = TTLCache(
+                    max_size=int(os.getenv("FETCH_CACHE_SIZE", "1024")),
+                    ttl=float(os.getenv("FETCH_CACHE_TTL", "300")),
+                    stale_ttl=float(os.getenv("FETCH_CACHE_STALE", "600")),
+                    disk_path=os.getenv("FETCH_CACHE_PATH") or None,
+                )
+    return _result_cache
+
+
+class _FetchPlan:
+    """一次获取的计划：适用的来源、缓存命中的结果与需要实际请求的来源"""
+    
+    __slots__ = ("routed", "fetch_key", "cached", "by_source", "sources", "complete")
+    
+    def __init__(self, routed: List[ContentSource]):
+        self.routed = routed
+        self.fetch_key: Optional[str] = None
+        self.cached: Optional[List[Dict]] = None  # 整体结果缓存命中
+        self.by_source: Dict[str, List[Dict]] = {}
+        self.sources: List[ContentSource] = []
+        self.complete = True  # 所有来源都拿到了新鲜结果
+
 
 class ContentFetcher:
     """内容获取类"""
     
-    def __init__(self):
-        """初始化内容获取器"""
-        pass
+    def __init__(
+        self,
+        concurrent: Optional[bool] = None,
+        deadline: Optional[float] = None,
+        source_timeouts: Optional[Dict[str, float]] = None,
+        use_cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
+        merge: Optional[str] = None
+    ):
+        """
+        初始化内容获取器
+        
+        Args:
+            concurrent: 是否并发请求各来源（默认从环境变量 FETCH_CONCURRENT 读取，默认开启）
+            deadline: 并发模式下整体截止时间（秒，默认从 FETCH_DEADLINE 读取）
+            source_timeouts: 各来源的超时时间，覆盖 DEFAULT_SOURCE_TIMEOUTS
+            use_cache: 是否使用共享结果缓存（默认从 FETCH_CACHE 读取，默认开启）
+            coalesce: 是否合并同时进行的相同查询（默认从 FETCH_COALESCE 读取，默认开启）
+            merge: 多个来源结果的合并方式（默认从 FETCH_MERGE 读取）：rrf 为倒数排名融合，
+                同一本书在多个来源（例如关键词与语义检索）中出现时合并并排在前面；concat 为按注册顺序拼接
+        """
+        if concurrent is None:
+            concurrent = os.getenv("FETCH_CONCURRENT", "1").lower() in ("1", "true", "yes")
+        self.concurrent = concurrent
+        self.deadline = deadline if deadline is not None else float(os.getenv("FETCH_DEADLINE", "8"))
+        self.source_timeouts = dict(DEFAULT_SOURCE_TIMEOUTS)
+        if source_timeouts:
+            self.source_timeouts.update(source_timeouts)
+        if use_cache is None:
+            use_cache = os.getenv("FETCH_CACHE", "1").lower() in ("1", "true", "yes")
+        self.cache: Optional[TTLCache] = get_result_cache() if use_cache else None
+        if coalesce is None:
+            coalesce = os.getenv("FETCH_COALESCE", "1").lower() in ("1", "true", "yes")
+        self.coalesce = coalesce
+        self.merge = (merge or os.getenv("FETCH_MERGE", "rrf")).lower()
+        
+        # 已注册的来源，顺序即结果合并顺序
+        self.sources: List[ContentSource] = []
+        self._register_builtin_sources()
+    
+    def _register_builtin_sources(self):
+        """注册内置的书籍（本地书目）、语义检索（EMBEDDING_SEARCH=1 时）、文章与 Hugging Face 来源"""
+        self.register_source(CatalogSource(top_k=int(os.getenv("BOOK_CATALOG_TOP_K", "20"))))
+        if os.getenv("EMBEDDING_SEARCH", "0").lower() in ("1", "true", "yes"):
+            self.register_source(EmbeddingSource(
+                top_k=int(os.getenv("EMBEDDING_TOP_K", "20")),
+                min_score=float(os.getenv("EMBEDDING_MIN_SCORE", "0.1")),
+            ))
+        self.register_source(FunctionSource(
+            "articles",
+            lambda query, content_type, language: self.search_web_articles(query, language),
+            predicate=lambda query, content_type, language: content_type in ["article", "both"],
+        ))
+        # 主要用于技术/学术内容，只取前3个
+        self.register_source(FunctionSource(
+            "huggingface",
+            lambda query, content_type, language: self._call_huggingface(
+                query, "paper", self.source_timeouts.get("huggingface", 30)
+            ),
+            predicate=lambda query, content_type, language: any(
+                keyword in query for keyword in HUGGINGFACE_KEYWORDS
+            ),
+            limit=3,
+            asearch=lambda query, content_type, language: self._acall_huggingface(
+                query, "paper", self.source_timeouts.get("huggingface", 30)
+            ),
+        ))
+    
+    def register_source(self, source: ContentSource, index: Optional[int] = None):
+        """
+        注册内容来源（同名来源会被替换）
+        
+        Args:
+            source: 来源插件
+            index: 插入位置，默认追加到末尾
+        """
+        if source.name in self.source_timeouts:
+            source.timeout = self.source_timeouts[source.name]
+        existing = [i for i, s in enumerate(self.sources) if s.name == source.name]
+        if existing:
+            self.sources[existing[0]] = source
+        elif index is None:
+            self.sources.append(source)
+        else:
+            self.sources.insert(index, source)
+    
+    def unregister_source(self, name: str) -> Optional[ContentSource]:
+        """移除指定名称的来源"""
+        for i, source in enumerate(self.sources):
+            if source.name == name:
+                return self.sources.pop(i)
+        return None
     
-    def search_huggingface(self, query: str, content_type: str = "dataset") -> List[Dict]:
+    @staticmethod
+    def source_stats() -> Dict[str, Dict]:
+        """各来源的调用、错误率、延迟与熔断状态"""
+        return circuit_breaker_stats()
+    
+    @staticmethod
+    def coalescing_stats() -> Dict:
+        """查询合并统计（线程版与异步版）"""
+        return {"sync": _fetch_flight.stats(), "async": _async_fetch_flight.stats()}
+    
+    @staticmethod
+    def cache_stats() -> Dict:
+        """共享结果缓存的命中统计"""
+        return get_result_cache().stats()
+    
+    def search_huggingface(self, query: str, content_type: str = "dataset", timeout: float = 30) -> List[Dict]:
         """
         通过Hugging Face MCP搜索内容
         
         Args:
             query: 搜索查询
             content_type: 内容类型（dataset, model, paper）
+            timeout: 子进程超时时间（秒）
             
         Returns:
             搜索结果列表
         """
-        results = []
-        
         try:
-            # 根据内容类型选择工具
-            if content_type == "paper":
-                tool_name = "search_papers"
-            elif content_type == "model":
-                tool_name = "search_models"
-            else:
-                tool_name = "search_datasets"
-            
-            # 构建MCP命令
-            input_json = json.dumps({"query": query, "limit": 10})
-            cmd = [
-                "manus-mcp-cli", "tool", "call", tool_name,
-                "--server", "hugging-face",
-                "--input", input_json
-            ]
-            
-            # 执行命令
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode == 0:
-                # 解析输出
-                output = result.stdout
-                # MCP输出可能包含多行，尝试解析JSON
-                try:
-                    data = json.loads(output)
-                    if isinstance(data, list):
-                        for item in data:
-                            results.append({
-                                "title": item.get("title") or item.get("name") or item.get("id", "Unknown"),
-                                "author": item.get("author", "Unknown"),
-                                "description": item.get("description", "No description"),
-                                "url": item.get("url", ""),
-                                "source": "Hugging Face",
-                                "type": content_type
-                            })
-                except json.JSONDecodeError:
-                    pass
+            return self._call_huggingface(query, content_type, timeout)
         except Exception as e:
             print(f"Hugging Face搜索失败: {str(e)}")
-        
+            return []
+    
+    @staticmethod
+    def _hf_tool_name(content_type: str) -> str:
+        """根据内容类型选择工具"""
+        if content_type == "paper":
+            return "search_papers"
+        elif content_type == "model":
+            return "search_models"
+        return "search_datasets"
+    
+    @staticmethod
+    def _parse_hf_items(output: str, content_type: str) -> List[Dict]:
+        """将 Hugging Face 工具输出转换为统一的内容格式"""
+        results = []
+        # MCP输出可能包含多行，尝试解析JSON
+        try:
+            data = json.loads(output)
+            if isinstance(data, list):
+                for item in data:
+                    results.append({
+                        "title": item.get("title") or item.get("name") or item.get("id", "Unknown"),
+                        "author": item.get("author", "Unknown"),
+                        "description": item.get("description", "No description"),
+                        "url": item.get("url", ""),
+                        "source": "Hugging Face",
+                        "type": content_type
+                    })
+        except json.JSONDecodeError:
+            pass
         return results
     
+    def _call_huggingface(self, query: str, content_type: str, timeout: float) -> List[Dict]:
+        """
+        搜索 Hugging Face，失败时抛出异常（供熔断器统计）
+        
+        配置了 HF_MCP_COMMAND 时通过持久化 MCP 会话调用；会话不可用或未配置时
+        退回到每次启动一个 manus-mcp-cli 子进程（命令可通过 MCP_CLI 覆盖）
+        """
+        server_command = os.getenv("HF_MCP_COMMAND")
+        if server_command:
+            try:
+                return self._call_huggingface_session(server_command, query, content_type, timeout)
+            except MCPConnectionError as e:
+                print(f"MCP会话不可用，退回子进程调用: {str(e)}")
+        return self._call_huggingface_subprocess(query, content_type, timeout)
+    
+    def _call_huggingface_session(self, server_command: str, query: str, content_type: str, timeout: float) -> List[Dict]:
+        """通过共享的长连接 MCP 会话调用 Hugging Face 工具"""
+        session = get_mcp_session(server_command, timeout=timeout)
+        result = session.call_tool(
+            self._hf_tool_name(content_type),
+            {"query": query, "limit": 10},
+            timeout=timeout
+        )
+        return self._parse_hf_items(tool_result_text(result), content_type)
+    
+    def _hf_subprocess_command(self, query: str, content_type: str) -> List[str]:
+        # 构建MCP命令
+        input_json = json.dumps({"query": query, "limit": 10})
+        return shlex.split(os.getenv("MCP_CLI", "manus-mcp-cli")) + [
+            "tool", "call", self._hf_tool_name(content_type),
+            "--server", "hugging-face",
+            "--input", input_json
+        ]
+    
+    def _call_huggingface_subprocess(self, query: str, content_type: str, timeout: float) -> List[Dict]:
+        """每次调用启动一个 manus-mcp-cli 子进程"""
+        # 执行命令
+        result = subprocess.run(
+            self._hf_subprocess_command(query, content_type),
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        
+        if result.returncode != 0:
+            raise RuntimeError(f"manus-mcp-cli 返回 {result.returncode}: {result.stderr.strip()[:200]}")
+        
+        return self._parse_hf_items(result.stdout, content_type)
+    
+    async def _acall_huggingface(self, query: str, content_type: str, timeout: float) -> List[Dict]:
+        """_call_huggingface 的异步版本：MCP 会话调用放到线程中等待，子进程用 asyncio 启动"""
+        server_command = os.getenv("HF_MCP_COMMAND")
+        if server_command:
+            try:
+                return await asyncio.to_thread(
+                    self._call_huggingface_session, server_command, query, content_type, timeout
+                )
+            except MCPConnectionError as e:
+                print(f"MCP会话不可用，退回子进程调用: {str(e)}")
+        return await self._acall_huggingface_subprocess(query, content_type, timeout)
+    
+    async def _acall_huggingface_subprocess(self, query: str, content_type: str, timeout: float) -> List[Dict]:
+        """异步启动 manus-mcp-cli 子进程，超时后结束进程"""
+        process = await asyncio.create_subprocess_exec(
+            *self._hf_subprocess_command(query, content_type),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        
+        if process.returncode != 0:
+            message = stderr.decode("utf-8", errors="replace").strip()[:200]
+            raise RuntimeError(f"manus-mcp-cli 返回 {process.returncode}: {message}")
+        
+        return self._parse_hf_items(stdout.decode("utf-8", errors="replace"), content_type)
+    
     def search_web_articles(self, query: str, language: str = "zh") -> List[Dict]:
         """
         搜索网络文章（模拟实现）
@@ -122,140 +385,367 @@ class ContentFetcher:
     
     def search_books(self, query: str, language: str = "zh") -> List[Dict]:
         """
-        搜索书籍（模拟实现）
+        在本地书目中搜索书籍
+        
+        书目文件由环境变量 BOOK_CATALOG_PATH 指定（JSONL 或 CSV），未设置时使用内置示例书目
         
         Args:
             query: 搜索查询
             language: 语言偏好
             
         Returns:
-            书籍列表
+            书籍列表（按相关度排序，没有匹配时为空）
         """
-        # 这里使用模拟数据，实际应用中可以集成豆瓣API、Google Books API等
-        
-        books = []
-        
-        # 根据查询生成模拟书籍数据
-        # 实际应用中应该调用真实的书籍数据库API
-        
-        if "机器学习" in query or "machine learning" in query.lower():
-            books.extend([
-                {
-                    "title": "机器学习",
-                    "author": "周志华",
-                    "description": "机器学习领域的经典教材，系统全面地介绍了机器学习的基本概念、原理和方法。",
-                    "url": "https://book.douban.com/subject/26708119/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                },
-                {
-                    "title": "Python机器学习",
-                    "author": "Sebastian Raschka",
-                    "description": "通过Python实践机器学习，适合初学者入门。",
-                    "url": "https://book.douban.com/subject/27000110/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                },
-                {
-                    "title": "统计学习方法",
-                    "author": "李航",
-                    "description": "统计学习方法的经典著作，深入浅出地介绍了各种算法。",
-                    "url": "https://book.douban.com/subject/10590856/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                }
-            ])
-        
-        if "小说" in query or "fiction" in query.lower():
-            books.extend([
-                {
-                    "title": "三体",
-                    "author": "刘慈欣",
-                    "description": "中国科幻文学的里程碑之作，讲述了人类文明与外星文明的碰撞。",
-                    "url": "https://book.douban.com/subject/2567698/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                },
-                {
-                    "title": "百年孤独",
-                    "author": "加西亚·马尔克斯",
-                    "description": "魔幻现实主义的代表作，讲述了布恩迪亚家族七代人的传奇故事。",
-                    "url": "https://book.douban.com/subject/6082808/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                }
-            ])
+        top_k = int(os.getenv("BOOK_CATALOG_TOP_K", "20"))
+        return CatalogSource(get_book_catalog(), top_k=top_k).search(query, "book", language)
+    
+    def _route(self, query: str, content_type: str, language: str) -> List[ContentSource]:
+        """根据路由规则确定适用于本次查询的来源"""
+        routed = []
+        for source in self.sources:
+            try:
+                if source.matches(query, content_type, language):
+                    routed.append(source)
+            except Exception as e:
+                print(f"{source.name} 路由判断失败: {str(e)}")
+        return routed
+    
+    def _cache_ttl(self, source: ContentSource) -> float:
+        if source.cache_ttl is not None:
+            return source.cache_ttl
+        return DEFAULT_SOURCE_CACHE_TTLS.get(source.name, self.cache.ttl if self.cache else 0)
+    
+    @staticmethod
+    def _cache_key(name: str, query: str, content_type: str, language: str) -> str:
+        return make_key(name, normalize_text(query), content_type, language)
+    
+    @staticmethod
+    def _source_id(source: ContentSource) -> str:
+        """来源在缓存与请求合并键中的标识：名称，设置了 scope 时再加上范围"""
+        return f"{source.name}@{source.scope}" if source.scope else source.name
+    
+    @staticmethod
+    def _routed_key(routed: List[ContentSource], query: str, content_type: str, language: str) -> str:
+        """一次查询的键（整体结果缓存与请求合并共用）：路由到的来源标识与规范化后的查询"""
+        return ContentFetcher._cache_key(
+            "|".join(ContentFetcher._source_id(source) for source in routed), query, content_type, language
+        )
+    
+    @staticmethod
+    def _limit(source: ContentSource, results: List[Dict]) -> List[Dict]:
+        return results[:source.limit] if source.limit is not None else results
+    
+    @staticmethod
+    def _run_source(source: ContentSource, query: str, content_type: str, language: str) -> List[Dict]:
+        return ContentFetcher._limit(source, source.search(query, content_type, language))
+    
+    @staticmethod
+    def _record(source: ContentSource, started: float, error: Optional[Exception] = None, timeout: bool = False):
+        """记录一次调用结果；耗时超过来源超时也计为失败"""
+        if isinstance(error, SourceNotReady):
+            # 数据仍在后台加载，不是来源故障
+            return
+        latency = time.monotonic() - started
+        breaker = get_circuit_breaker(source.name)
+        if error is not None or timeout:
+            breaker.record_failure(latency, timeout=timeout)
+        elif latency > source.timeout:
+            breaker.record_failure(latency, timeout=True)
+        else:
+            breaker.record_success(latency)
+    
+    def _load_source(self, source: ContentSource, query: str, content_type: str, language: str) -> List[Dict]:
+        """后台刷新缓存时调用单个来源，同样受熔断器约束并计入统计"""
+        if not get_circuit_breaker(source.name).allow():
+            raise RuntimeError(f"{source.name} 来源已熔断")
+        started = time.monotonic()
+        try:
+            results = self._run_source(source, query, content_type, language)
+        except Exception as e:
+            self._record(source, started, error=e)
+            raise
+        self._record(source, started)
+        return results
+    
+    def _plan(self, routed: List[ContentSource], query: str, content_type: str, language: str) -> "_FetchPlan":
+        """
+        查询缓存并确定需要实际请求的来源
         
-        if "心理" in query or "psychology" in query.lower():
-            books.extend([
-                {
-                    "title": "思考，快与慢",
-                    "author": "丹尼尔·卡尼曼",
-                    "description": "诺贝尔经济学奖得主的经典著作，揭示了人类思维的两种模式。",
-                    "url": "https://book.douban.com/subject/10785583/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                },
-                {
-                    "title": "心理学与生活",
-                    "author": "理查德·格里格",
-                    "description": "心理学入门的经典教材，生动有趣地介绍了心理学的各个领域。",
-                    "url": "https://book.douban.com/subject/1032501/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                }
-            ])
+        先查整体结果缓存，再逐个来源查缓存；命中过期旧值的来源直接使用旧值，并在后台刷新
+        """
+        cache = self.cache
+        plan = _FetchPlan(routed)
+        if cache is not None:
+            plan.fetch_key = self._routed_key(routed, query, content_type, language)
+            cached, state = cache.get(plan.fetch_key)
+            if state == FRESH:
+                plan.cached = cached
+                return plan
         
-        # 如果没有匹配到特定主题，返回一些通用推荐
-        if not books:
-            books.extend([
-                {
-                    "title": f"关于{query}的推荐书籍",
-                    "author": "待查询",
-                    "description": f"这是一本关于{query}的优质书籍，建议通过豆瓣或其他平台搜索更多信息。",
-                    "url": "https://book.douban.com/",
-                    "source": "豆瓣读书",
-                    "type": "book"
-                }
-            ])
+        for source in plan.routed:
+            ttl = self._cache_ttl(source) if cache is not None else 0
+            if ttl > 0:
+                key = self._cache_key(self._source_id(source), query, content_type, language)
+                cached, state = cache.get(key)
+                if state != MISS:
+                    plan.by_source[source.name] = cached
+                    if state == STALE:
+                        plan.complete = False
+                        cache.refresh(
+                            key,
+                            lambda source=source: self._load_source(source, query, content_type, language),
+                            _get_executor(),
+                            ttl=ttl
+                        )
+                    continue
+            if get_circuit_breaker(source.name).allow():
+                plan.sources.append(source)
+            else:
+                plan.complete = False
+        return plan
+    
+    def _finish(
+        self,
+        plan: "_FetchPlan",
+        fetched: Dict[str, List[Dict]],
+        query: str,
+        content_type: str,
+        language: str
+    ) -> List[Dict]:
+        """缓存新获取的来源结果，并合并各来源的结果（见 merge）"""
+        cache = self.cache
+        plan.complete = plan.complete and len(fetched) == len(plan.sources)
+        plan.by_source.update(fetched)
+        if cache is not None:
+            for source in plan.sources:
+                ttl = self._cache_ttl(source)
+                if source.name in fetched and ttl > 0:
+                    cache.set(
+                        self._cache_key(self._source_id(source), query, content_type, language),
+                        fetched[source.name],
+                        ttl=ttl
+                    )
         
-        return books
+        # 倒数排名融合，或按注册顺序拼接
+        result_lists = [plan.by_source.get(source.name, []) for source in plan.routed]
+        if self.merge == "rrf":
+            results = reciprocal_rank_fusion(result_lists)
+        else:
+            results = [item for items in result_lists for item in items]
+        # 所有来源都拿到新鲜结果时才缓存合并后的整体结果
+        if plan.fetch_key is not None and plan.complete and plan.routed:
+            ttls = [self._cache_ttl(source) for source in plan.routed]
+            if min(ttls) > 0:
+                # 整体结果不提供旧值，过期后回到逐来源缓存
+                cache.set(plan.fetch_key, results, ttl=min(ttls), stale_ttl=0)
+        return [dict(item) for item in results]
     
     def fetch_content(
         self, 
         query: str, 
         content_type: str = "both",
-        language: str = "zh"
+        language: str = "zh",
+        concurrent: Optional[bool] = None,
+        deadline: Optional[float] = None
     ) -> List[Dict]:
         """
         综合获取内容
         
+        只请求缓存未命中的来源；命中过期旧值的来源直接使用旧值，并在后台刷新
+        
         Args:
             query: 搜索查询
             content_type: 内容类型（book, article, both）
             language: 语言偏好
+            concurrent: 本次是否并发请求各来源（默认使用实例配置）
+            deadline: 本次的整体截止时间（秒，默认使用实例配置）
             
         Returns:
             内容列表
         """
-        results = []
+        routed = self._route(query, content_type, language)
+        if not self.coalesce:
+            return self._fetch(routed, query, content_type, language, concurrent, deadline)
+        # 同时进行的相同查询共享一次抓取，共享方得到结果的副本
+        results, shared = _fetch_flight.do(
+            self._routed_key(routed, query, content_type, language),
+            lambda: self._fetch(routed, query, content_type, language, concurrent, deadline)
+        )
+        return [dict(item) for item in results] if shared else results
+    
+    def _fetch(
+        self,
+        routed: List[ContentSource],
+        query: str,
+        content_type: str,
+        language: str,
+        concurrent: Optional[bool],
+        deadline: Optional[float]
+    ) -> List[Dict]:
+        """fetch_content 的实现（不合并）"""
+        plan = self._plan(routed, query, content_type, language)
+        if plan.cached is not None:
+            return [dict(item) for item in plan.cached]
+        
+        if concurrent is None:
+            concurrent = self.concurrent
+        fetched = {}
+        if plan.sources:
+            if not concurrent or len(plan.sources) <= 1:
+                fetched = self._fetch_sequentially(plan.sources, query, content_type, language)
+            else:
+                fetched = self._fetch_concurrently(
+                    plan.sources, query, content_type, language,
+                    self.deadline if deadline is None else deadline
+                )
+        return self._finish(plan, fetched, query, content_type, language)
+    
+    async def afetch_content(
+        self,
+        query: str,
+        content_type: str = "both",
+        language: str = "zh",
+        deadline: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        fetch_content 的异步版本
         
-        # 搜索书籍
-        if content_type in ["book", "both"]:
-            books = self.search_books(query, language)
-            results.extend(books)
+        缓存与熔断逻辑相同；各来源通过 asearch() 在事件循环中并发执行，
+        每个来源最多等待 min(来源超时, 整体截止时间)
         
-        # 搜索文章
-        if content_type in ["article", "both"]:
-            articles = self.search_web_articles(query, language)
-            results.extend(articles)
+        Args:
+            query: 搜索查询
+            content_type: 内容类型（book, article, both）
+            language: 语言偏好
+            deadline: 本次的整体截止时间（秒，默认使用实例配置）
+            
+        Returns:
+            内容列表
+        """
+        routed = self._route(query, content_type, language)
+        if not self.coalesce:
+            return await self._afetch(routed, query, content_type, language, deadline)
+        results, shared = await _async_fetch_flight.do(
+            self._routed_key(routed, query, content_type, language),
+            lambda: self._afetch(routed, query, content_type, language, deadline)
+        )
+        return [dict(item) for item in results] if shared else results
+    
+    async def _afetch(
+        self,
+        routed: List[ContentSource],
+        query: str,
+        content_type: str,
+        language: str,
+        deadline: Optional[float]
+    ) -> List[Dict]:
+        """afetch_content 的实现（不合并）"""
+        plan = self._plan(routed, query, content_type, language)
+        if plan.cached is not None:
+            return [dict(item) for item in plan.cached]
         
-        # 搜索Hugging Face（主要用于技术/学术内容）
-        if any(keyword in query for keyword in ["机器学习", "深度学习", "AI", "数据", "算法"]):
+        deadline = self.deadline if deadline is None else deadline
+        outcomes = await asyncio.gather(*(
+            self._arun_source(source, query, content_type, language, deadline)
+            for source in plan.sources
+        ))
+        fetched = {
+            source.name: results
+            for source, results in zip(plan.sources, outcomes)
+            if results is not None
+        }
+        return self._finish(plan, fetched, query, content_type, language)
+    
+    async def _arun_source(
+        self,
+        source: ContentSource,
+        query: str,
+        content_type: str,
+        language: str,
+        deadline: float
+    ) -> Optional[List[Dict]]:
+        """异步请求单个来源并计入熔断统计，失败或超时返回 None"""
+        started = time.monotonic()
+        try:
+            results = await asyncio.wait_for(
+                source.asearch(query, content_type, language),
+                timeout=min(source.timeout, deadline)
+            )
+        except asyncio.TimeoutError:
+            self._record(source, started, timeout=True)
+            print(f"{source.name} 来源超时，已跳过")
+            return None
+        except Exception as e:
+            self._record(source, started, error=e)
+            print(f"{source.name} 来源获取失败: {str(e)}")
+            return None
+        self._record(source, started)
+        return self._limit(source, results)
+    
+    def _fetch_sequentially(
+        self,
+        plan: List[ContentSource],
+        query: str,
+        content_type: str,
+        language: str
+    ) -> Dict[str, List[Dict]]:
+        """依次请求各来源，返回成功来源的结果"""
+        fetched = {}
+        for source in plan:
+            started = time.monotonic()
             try:
-                hf_papers = self.search_huggingface(query, "paper")
-                results.extend(hf_papers[:3])  # 只取前3个
-            except:
-                pass
+                fetched[source.name] = self._run_source(source, query, content_type, language)
+                self._record(source, started)
+            except Exception as e:
+                self._record(source, started, error=e)
+                print(f"{source.name} 来源获取失败: {str(e)}")
+        return fetched
+    
+    def _fetch_concurrently(
+        self,
+        plan: List[ContentSource],
+        query: str,
+        content_type: str,
+        language: str,
+        deadline: float
+    ) -> Dict[str, List[Dict]]:
+        """
+        并发请求所有来源，在截止时间内返回已完成来源的结果
         
-        return results
+        每个来源的等待时间为 min(来源超时, 整体截止时间)，不会等待最慢的来源
+        """
+        executor = _get_executor()
+        start = time.monotonic()
+        futures = {}
+        cutoffs = {}
+        for source in plan:
+            future = executor.submit(self._run_source, source, query, content_type, language)
+            futures[future] = source
+            cutoffs[future] = start + min(source.timeout, deadline)
+        
+        pending = set(futures)
+        timed_out = set()
+        while pending:
+            now = time.monotonic()
+            # 放弃已超时的来源
+            for future in [f for f in pending if cutoffs[f] <= now]:
+                pending.discard(future)
+                timed_out.add(future)
+                self._record(futures[future], start, timeout=True)
+                print(f"{futures[future].name} 来源超时，已跳过")
+            if not pending:
+                break
+            timeout = min(cutoffs[f] for f in pending) - now
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._record(futures[future], start, error=future.exception())
+        
+        fetched = {}
+        for future, source in futures.items():
+            if future in timed_out:
+                continue
+            try:
+                fetched[source.name] = future.result()
+            except Exception as e:
+                print(f"{source.name} 来源获取失败: {str(e)}")
+        return fetched
@@ -0,0 +1,249 @@
+"""
+内容来源插件模块
+定义 ContentSource 插件接口、按来源共享的熔断器，以及内置来源的路由规则
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+# Hugging Face 只用于技术/学术类查询
+HUGGINGFACE_KEYWORDS = ["机器学习", "深度学习", "AI", "数据", "算法"]
+
+
+class SourceNotReady(RuntimeError):
+    """来源的数据仍在后台加载：本次查询跳过该来源，结果不缓存，也不计入熔断统计"""
+
+
+def load_in_background(load: Callable[[], object], name: str) -> Future:
+    """
+    在独立的守护线程中执行 load（书目、向量等耗时的一次性加载），不占用请求路径上的线程池
+
+    Returns:
+        加载结果的 Future
+    """
+    future: Future = Future()
+
+    def run():
+        try:
+            future.set_result(load())
+        except BaseException as e:
+            print(f"⚠️  {name} 加载失败: {e}")
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+class ContentSource:
+    """
+    内容来源插件接口
+
+    子类实现 search()，可覆盖 matches() 决定是否参与某次查询。
+    search() 出错时应直接抛出异常，由 ContentFetcher 统一计入熔断统计；数据尚未加载完成时抛出 SourceNotReady。
+    异步路径调用 asearch()，默认在线程中执行 search()，IO 密集的来源可以覆盖为原生协程。
+    """
+
+    name = "source"
+    timeout = 5.0  # 单次调用的超时（秒）
+    limit: Optional[int] = None  # 每次最多取多少条结果
+    cache_ttl: Optional[float] = None  # 结果缓存时间（秒），None 使用默认值，0 表示不缓存
+    scope: Optional[str] = None  # 结果只对某个范围有效（例如某个用户）时设置，相同查询的请求合并与缓存按范围区分
+
+    def matches(self, query: str, content_type: str, language: str) -> bool:
+        """路由判断：该来源是否适用于本次查询"""
+        return True
+
+    def search(self, query: str, content_type: str, language: str) -> List[Dict]:
+        """执行搜索，返回统一格式的内容列表"""
+        raise NotImplementedError
+
+    async def asearch(self, query: str, content_type: str, language: str) -> List[Dict]:
+        """异步执行搜索"""
+        return await asyncio.to_thread(self.search, query, content_type, language)
+
+
+class FunctionSource(ContentSource):
+    """用函数快速定义的来源"""
+
+    def __init__(
+        self,
+        name: str,
+        search: Callable[[str, str, str], List[Dict]],
+        predicate: Optional[Callable[[str, str, str], bool]] = None,
+        timeout: float = 5.0,
+        limit: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+        asearch: Optional[Callable[[str, str, str], Awaitable[List[Dict]]]] = None
+    ):
+        """
+        Args:
+            name: 来源名称（同名来源共享熔断器）
+            search: 搜索函数 (query, content_type, language) -> 内容列表
+            predicate: 路由函数 (query, content_type, language) -> 是否适用，默认总是适用
+            timeout: 单次调用超时（秒）
+            limit: 每次最多取多少条结果
+            cache_ttl: 结果缓存时间（秒），None 使用默认值，0 表示不缓存
+            asearch: 异步搜索函数，默认在线程中执行 search
+        """
+        self.name = name
+        self._search = search
+        self._predicate = predicate
+        self.timeout = timeout
+        self.limit = limit
+        self.cache_ttl = cache_ttl
+        self._asearch = asearch
+
+    def matches(self, query: str, content_type: str, language: str) -> bool:
+        if self._predicate is None:
+            return True
+        return self._predicate(query, content_type, language)
+
+    def search(self, query: str, content_type: str, language: str) -> List[Dict]:
+        return self._search(query, content_type, language)
+
+    async def asearch(self, query: str, content_type: str, language: str) -> List[Dict]:
+        if self._asearch is None:
+            return await super().asearch(query, content_type, language)
+        return await self._asearch(query, content_type, language)
+
+
+class CircuitBreaker:
+    """
+    单个来源的熔断器
+
+    统计最近 window 次调用的错误率与延迟（超时也计为错误）。连续失败达到 failure_threshold，
+    或样本数不少于 min_calls 且错误率达到 error_rate_threshold 时打开熔断，
+    cooldown 秒内跳过该来源；冷却结束后放行一次探测调用（半开），成功则恢复，失败则重新计时。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        error_rate_threshold: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        cooldown: float = 60.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True 表示失败
+        self._consecutive_failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.avg_latency = 0.0  # 指数移动平均（秒）
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """本次是否允许调用该来源"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.skipped += 1
+            return False
+
+    def _record_latency(self, latency: float):
+        if self.calls == 1:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self._record_latency(latency)
+            self._outcomes.append(False)
+            self._consecutive_failures = 0
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._probe_in_flight = False
+
+    def record_failure(self, latency: float, timeout: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            if timeout:
+                self.timeouts += 1
+            self._record_latency(latency)
+            self._outcomes.append(True)
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+
+            error_rate = sum(self._outcomes) / len(self._outcomes)
+            if (self._state == self.HALF_OPEN
+                    or self._consecutive_failures >= self.failure_threshold
+                    or (len(self._outcomes) >= self.min_calls and error_rate >= self.error_rate_threshold)):
+                if self._state != self.OPEN:
+                    print(f"⚠️  来源 {self.name} 已熔断，{self.cooldown:.0f}秒内跳过")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                "state": self._current_state(),
+                "calls": self.calls,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "skipped": self.skipped,
+                "error_rate": round(sum(outcomes) / len(outcomes), 4) if outcomes else 0.0,
+                "avg_latency_ms": round(self.avg_latency * 1000, 1),
+            }
+
+
+# 熔断器按来源名在进程内共享，不同用户的 ContentFetcher 看到同一份健康状态
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """获取（或首次创建）指定来源的共享熔断器"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict]:
+    """所有来源熔断器的统计"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,127 @@
+"""
+文本向量编码模块
+把查询与书目记录编码为单位长度的向量，供向量检索使用。
+默认的 HashingEncoder 不依赖模型与网络：词（英文单词、中文相邻两字）经特征哈希映射到固定维度；
+也可以通过 EMBEDDING_ENCODER 接入本地的句向量模型
+"""
+
+import importlib
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .ranker import tokenize
+
+
+class HashingEncoder:
+    """
+    特征哈希编码器
+
+    每个词用 CRC32 映射到 HASHES 个维度，另一个哈希决定各维度的正负号（减少冲突带来的偏差）：
+    两个不同的词只在一个维度上冲突时，相似度只有真正匹配时的一部分。
+    词频取 1+log(tf)，最后归一化为单位向量。结果只反映字面重合，不理解语义
+    """
+
+    HASHES = 2
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        编码一批文本
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            (len(texts), dim) 的 float32 数组，每行为单位向量（没有特征的文本为零向量）
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in Counter(tokenize(text)).items():
+                weight = 1.0 + math.log(count)
+                for seed in range(self.HASHES):
+                    encoded = f"{seed}\x00{feature}".encode("utf-8")
+                    column = zlib.crc32(encoded) % self.dim
+                    sign = 1.0 if zlib.adler32(encoded) & 1 else -1.0
+                    vectors[row, column] += sign * weight
+        return normalize(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行归一化为单位向量（零向量保持不变）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def document_text(record: Dict) -> str:
+    """书目记录参与编码的文本：标题、作者、标签与简介"""
+    tags = record.get("tags") or []
+    if not isinstance(tags, str):
+        tags = " ".join(map(str, tags))
+    return " ".join([record.get("title") or "", record.get("author") or "", tags, record.get("description") or ""])
+
+
+def load_encoder(spec: Optional[str] = None):
+    """
+    创建编码器
+
+    Args:
+        spec: "hashing"、"hashing:<维度>"，或 "<模块>:<工厂函数>"（工厂函数返回带有 dim 属性与
+            encode(texts) -> ndarray 方法的对象，例如封装本地 sentence-transformers 模型）。
+            默认从环境变量 EMBEDDING_ENCODER 读取
+
+    Raises:
+        ValueError: spec 无法解析
+    """
+    spec = spec or os.getenv("EMBEDDING_ENCODER", "hashing")
+    name, _, argument = spec.partition(":")
+    if name == "hashing":
+        return HashingEncoder(int(argument) if argument else 512)
+    if not argument:
+        raise ValueError(f"无法解析的编码器: {spec}（应为 hashing[:维度] 或 模块:工厂函数）")
+    encoder = getattr(importlib.import_module(name), argument)()
+    encoder.name = spec
+    return encoder
+
+
+# 进程内共享的编码器（按 spec），本地模型只加载一次
+_encoders: Dict[str, object] = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(spec: Optional[str] = None):
+    """获取（或首次创建）进程内共享的编码器，参数见 load_encoder"""
+    spec = spec or os.getenv("EMBEDDING_ENCODER", "hashing")
+    with _encoders_lock:
+        encoder = _encoders.get(spec)
+        if encoder is None:
+            encoder = _encoders[spec] = load_encoder(spec)
+        return encoder
+
+
+def encode_records(encoder, records: Sequence[Dict], batch_size: int = 1024) -> np.ndarray:
+    """
+    分批编码书目记录
+
+    Returns:
+        (len(records), encoder.dim) 的 float16 数组
+    """
+    vectors = np.zeros((len(records), encoder.dim), dtype=np.float16)
+    for start in range(0, len(records), batch_size):
+        batch = [document_text(records[i]) for i in range(start, min(start + batch_size, len(records)))]
+        vectors[start:start + len(batch)] = normalize(np.asarray(encoder.encode(batch), dtype=np.float32))
+    return vectors
+
+
+def encode_queries(encoder, queries: List[str]) -> np.ndarray:
+    """编码查询，返回 float32 单位向量"""
+    return normalize(np.asarray(encoder.encode(queries), dtype=np.float32))
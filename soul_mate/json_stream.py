@@ -0,0 +1,299 @@
+"""
+流式 JSON 解析模块
+从模型回复中提取 JSON：既可以逐段输入（流式输出），也可以一次输入完整字符串。
+容忍前后的说明文字与 markdown 代码块，数组的每个顶层元素闭合后立即可用，
+输出被截断时保留已完成的数组元素，或把对象修复到最后一个完整的字段
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+
+class JSONExtractError(ValueError):
+    """回复中没有可用的 JSON"""
+
+
+_OPENERS = {"[": "]", "{": "}"}
+_SIGNIFICANT = re.compile(r'["\[\]{},]')  # 字符串外需要处理的字符
+_STRING_SPECIAL = re.compile(r'["\\]')  # 字符串内需要处理的字符
+# 对象修复时最多尝试的截断位置数
+_MAX_REPAIR_ATTEMPTS = 64
+
+
+def strip_trailing_commas(text: str) -> str:
+    """去掉 "]" 或 "}" 前多余的逗号（字符串内的不处理）"""
+    out = []
+    in_string = escape = False
+    pending_comma = None  # 逗号之后的空白，等看到下一个有效字符再决定是否保留逗号
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if ch.isspace():
+                pending_comma.append(ch)
+                continue
+            if ch not in "]}":
+                out.append(",")
+            out.extend(pending_comma)
+            pending_comma = None
+        if ch == ",":
+            pending_comma = []
+            continue
+        if ch == '"':
+            in_string = True
+        out.append(ch)
+    if pending_comma is not None:
+        out.append(",")
+        out.extend(pending_comma)
+    return "".join(out)
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        repaired = strip_trailing_commas(text)
+        if repaired == text:
+            raise
+        return json.loads(repaired)
+
+
+class JSONStream:
+    """
+    增量 JSON 提取器
+
+    跳过第一个 "[" 或 "{"（指定 expect 时只认该字符）之前的内容，之后按字符跟踪嵌套深度与字符串状态；
+    顶层值闭合后忽略剩余文本。顶层是数组时，每个元素一闭合就解析并由 feed 返回，无法解析的元素被跳过。
+    一段"看起来像 JSON"的文字解析失败且没有产出任何元素时，从它之后继续寻找下一个起点。
+
+    用法:
+        stream = JSONStream(expect="[")
+        for chunk in chunks:
+            for element in stream.feed(chunk):
+                ...  # 提前处理已完成的元素
+        value = stream.result()
+    """
+
+    def __init__(self, expect: Optional[str] = None):
+        if expect not in (None, "[", "{"):
+            raise ValueError("expect 只能是 None、'[' 或 '{'")
+        self.expect = expect
+        self._opener = re.compile(re.escape(expect) if expect else r"[\[{]")
+        self.closed = False  # 顶层值已闭合
+        self.errors = 0  # 解析失败被跳过的数组元素数
+        self.elements: List[Any] = []  # 顶层数组中已完成的元素
+        self._text = ""  # 尚未找到起点时为待搜索的文本，之后为顶层值的全部文本
+        self._reset_value()
+
+    def _reset_value(self):
+        self.started = False  # 已遇到顶层值的开头
+        self._pos = 0  # _text 中下一个待扫描的位置
+        self._stack: List[str] = []
+        self._in_string = False
+        self._element_start = 0  # 当前数组元素在 _text 中的起点
+        self._cuts: List[Tuple[int, Tuple[str, ...]]] = []  # 对象修复用：逗号位置与当时的嵌套栈
+        self._value: Any = None
+
+    @property
+    def kind(self) -> Optional[str]:
+        """顶层值的类型："[" 或 "{"，尚未开始时为 None"""
+        return self._text[0] if self.started else None
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        输入一段文本
+
+        Returns:
+            本段文本中闭合的顶层数组元素（顶层是对象时总是空列表）
+        """
+        emitted: List[Any] = []
+        if self.closed or not chunk:
+            return emitted
+        self._text += chunk
+        while not self.closed and self._scan(emitted):
+            # 不是有效的 JSON：从起点之后重新寻找
+            self._text = self._text[1:]
+            self.errors = 0
+            self._reset_value()
+        return emitted
+
+    def _scan(self, emitted: List[Any]) -> bool:
+        """扫描新输入的文本，需要重新寻找起点时返回 True"""
+        if not self.started:
+            match = self._opener.search(self._text)
+            if match is None:
+                # 还没有起点，丢掉说明文字
+                self._text = ""
+                return False
+            self._text = self._text[match.start():]
+            self.started = True
+            self._stack.append(self._text[0])
+            self._pos = self._element_start = 1
+
+        text = self._text
+        pos = self._pos
+        stack = self._stack
+        top_array = text[0] == "["
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pos = len(text)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(text):
+                        # 转义符在本段末尾，等下一段再处理
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _SIGNIFICANT.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            ch = match.group()
+            index = match.start()
+            pos = match.end()
+            if ch == '"':
+                self._in_string = True
+            elif ch in _OPENERS:
+                stack.append(ch)
+            elif ch in "]}":
+                stack.pop()
+                if not stack:
+                    if top_array:
+                        self._emit_element(index, emitted)
+                    if not self._finish(text[:pos]):
+                        return True
+                    self._text = text[:pos]  # 忽略剩余文本
+                    break
+                if len(stack) == 1 and top_array:
+                    # 顶层数组中的对象/数组刚闭合，立即产出
+                    self._emit_element(pos, emitted)
+            elif len(stack) == 1 and top_array:
+                self._emit_element(index, emitted)
+                self._element_start = pos
+            elif not top_array:
+                self._cuts.append((index, tuple(stack)))
+        self._pos = pos
+        return False
+
+    def _emit_element(self, end: int, emitted: List[Any]):
+        text = self._text[self._element_start:end].strip()
+        self._element_start = end
+        if not text:
+            return
+        try:
+            element = _loads(text)
+        except json.JSONDecodeError:
+            self.errors += 1
+            return
+        self.elements.append(element)
+        emitted.append(element)
+
+    def _finish(self, text: str) -> bool:
+        """顶层值闭合，返回是否得到了有效的结果"""
+        if text[0] == "[":
+            # 元素已经逐个解析过；一个元素也没解析出来时视为说明文字中的方括号
+            if not self.elements and self.errors:
+                return False
+            self._value = list(self.elements)
+        else:
+            try:
+                self._value = _loads(text)
+            except json.JSONDecodeError:
+                return False
+        self.closed = True
+        return True
+
+    @property
+    def truncated(self) -> bool:
+        """已开始但顶层值未闭合（输出被截断）"""
+        return self.started and not self.closed
+
+    def partial(self) -> Any:
+        """
+        当前能得到的结果，不抛出异常
+
+        Returns:
+            已闭合时为完整的值；数组未闭合时为已完成元素的列表；
+            对象未闭合时为修复后的对象；没有可用内容时为 None
+        """
+        if self.closed:
+            return self._value
+        if not self.started:
+            return None
+        if self.kind == "[":
+            return list(self.elements)
+        return self._repair_object()
+
+    def result(self) -> Any:
+        """
+        最终结果
+
+        Returns:
+            顶层值；被截断时见 partial
+
+        Raises:
+            JSONExtractError: 没有找到 JSON 或无法修复
+        """
+        value = self.partial()
+        if value is None:
+            if not self.started:
+                raise JSONExtractError("回复中没有找到JSON")
+            raise JSONExtractError("JSON不完整且无法修复")
+        return value
+
+    def _repair_object(self) -> Optional[Any]:
+        """
+        依次尝试在当前位置和之前的逗号处截断，补全括号后解析
+
+        被截断的字符串、数字等标量可能不完整（"book" 只输出了 "bo"），
+        只有末尾恰好是逗号或闭合的对象/数组时才保留到当前位置
+        """
+        text = self._text
+        candidates = []
+        if not self._in_string and text.rstrip()[-1:] in (",", "]", "}"):
+            candidates.append((text, tuple(self._stack)))
+        for end, stack in reversed(self._cuts[-_MAX_REPAIR_ATTEMPTS:]):
+            candidates.append((text[:end], stack))
+
+        for prefix, stack in candidates:
+            prefix = prefix.rstrip().rstrip(",")
+            closers = "".join(_OPENERS[opener] for opener in reversed(stack))
+            try:
+                return _loads(prefix + closers)
+            except json.JSONDecodeError:
+                continue
+        return None
+
+
+def extract_json(text: str, expect: Optional[str] = None) -> Any:
+    """
+    从完整的模型回复中提取 JSON
+
+    Args:
+        text: 模型回复
+        expect: 期望的顶层类型 "[" 或 "{"，None 表示都可以
+
+    Returns:
+        解析结果（被截断时为修复后的结果）
+
+    Raises:
+        JSONExtractError: 没有可用的 JSON
+    """
+    stream = JSONStream(expect)
+    stream.feed(text)
+    return stream.result()
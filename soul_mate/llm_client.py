@@ -4,9 +4,233 @@ LLM客户端模块
 """
 
 import os
-import json
-from openai import OpenAI
-from typing import List, Dict, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, TypeVar
+
+from .analysis_cache import AnalysisCache
+from .cache import make_key, normalize_text
+from .json_stream import JSONExtractError, JSONStream
+from .llm_policy import METHODS, CallMetrics, CallPolicy, is_retryable, load_policies, remaining
+from .ranker import truncate_text
+from .singleflight import SingleFlight
+
+
+# 进程内共享的 OpenAI 客户端，按 (api_base, api_key, model) 复用同一个带连接池的 HTTP 传输
+_shared_openai_clients: Dict[tuple, OpenAI] = {}
+_shared_llm_clients: Dict[tuple, "LLMClient"] = {}
+_shared_lock = threading.Lock()
+
+# 对冲请求使用的线程池（主请求与对冲请求都在其中执行，调用线程只等待先完成的一个）
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+# 相同请求的合并（见 LLMClient.complete 的 coalesce 参数），所有客户端共享，键中包含接口地址与模型
+_llm_flight = SingleFlight()
+
+T = TypeVar("T")
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _shared_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("LLM_HEDGE_WORKERS", "32")),
+                    thread_name_prefix="llm-hedge"
+                )
+    return _hedge_executor
+
+# 请求分析的系统提示词
+ANALYSIS_SYSTEM_PROMPT = """你是一个名为"灵魂伴侣"的专业阅读推荐Agent。你的核心职责是根据用户的需求和喜好推荐好书和好文章。
+
+你的角色属性：
+1. 专注性：你只回答与书籍、文章、阅读、文学、学术资料和知识探索相关的问题。
+2. 引导性：如果用户的问题与阅读无关，你应该礼貌地拒绝，并引导用户回到阅读话题上。
+3. 深度：你对书籍和文章有深刻的见解，推荐理由应体现出对内容的理解。
+
+任务：
+请分析用户的需求，首先判断该需求是否与阅读/书籍/文章相关。
+如果相关，提取以下信息并返回JSON。
+如果不相关，请在JSON中将 "is_related" 设为 false，并提供一段礼貌的拒绝话术。
+
+返回JSON格式：
+{
+  "is_related": true,
+  "topics": ["关键词"],
+  "content_type": "book/article/both",
+  "purpose": "learning/entertainment/etc",
+  "level": "beginner/intermediate/advanced",
+  "mood": "情感倾向",
+  "language": "zh/en",
+  "refusal_message": null
+}
+
+如果不相关：
+{
+  "is_related": false,
+  "refusal_message": "抱歉，作为您的'灵魂伴侣'阅读助手，我专注于为您发现好书和好文章。关于[用户话题]的问题，我可能无法为您提供专业的建议。不如我们聊聊您最近想读什么类型的书？"
+}"""
+
+# 偏好提取的系统提示词
+PREFERENCES_SYSTEM_PROMPT = """分析对话历史，提取用户的阅读偏好信息。
+
+请提取：
+1. genres: 喜欢的类型列表
+2. topics: 感兴趣的主题列表
+3. authors: 喜欢的作者列表
+4. reading_level: 阅读水平（beginner/intermediate/advanced）
+
+返回JSON格式：
+{
+  "genres": ["科幻", "推理"],
+  "topics": ["人工智能", "心理学"],
+  "authors": ["刘慈欣"],
+  "reading_level": "intermediate"
+}"""
+
+# 融合模式下追加到分析提示词后，让同一次调用顺带提取偏好
+FUSED_PREFERENCES_PROMPT = """
+
+同时，请从用户请求中提取用户表达出的阅读偏好，放在结果的 "preferences" 字段中（没有则为空列表）：
+{
+  "preferences": {
+    "genres": ["科幻", "推理"],
+    "topics": ["人工智能", "心理学"],
+    "authors": ["刘慈欣"],
+    "reading_level": "intermediate"
+  }
+}"""
+
+
+def default_analysis() -> Dict:
+    """请求分析失败时使用的默认结果"""
+    return {
+        "is_related": True,
+        "topics": [],
+        "content_type": "book",
+        "purpose": "general",
+        "level": "intermediate",
+        "mood": "neutral",
+        "language": "zh",
+        "refusal_message": None
+    }
+
+
+def default_preferences() -> Dict:
+    """偏好提取失败时使用的默认结果"""
+    return {
+        "genres": [],
+        "topics": [],
+        "authors": [],
+        "reading_level": "intermediate"
+    }
+
+
+def _http_limits() -> httpx.Limits:
+    """连接池上限（可通过环境变量配置）"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def get_shared_openai_client(api_base: str, api_key: str, model: str) -> OpenAI:
+    """
+    获取共享的 OpenAI 客户端（首次调用时创建）
+    
+    Args:
+        api_base: API基础URL
+        api_key: API密钥
+        model: 模型名称
+        
+    Returns:
+        复用 keep-alive 连接池的 OpenAI 客户端
+    """
+    key = (api_base, api_key, model)
+    client = _shared_openai_clients.get(key)
+    if client is not None:
+        return client
+    with _shared_lock:
+        client = _shared_openai_clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=api_base,
+                http_client=DefaultHttpxClient(limits=_http_limits()),
+            )
+            _shared_openai_clients[key] = client
+            print(f"✓ LLM客户端已初始化")
+            print(f"  模型: {model}")
+            print(f"  API端点: {api_base}")
+        return client
+
+
+def _client_config(model: Optional[str], api_key: Optional[str], api_base: Optional[str]) -> Tuple[str, str, str]:
+    """按参数与环境变量得到 (api_base, api_key, model)，与 LLMClient 初始化时的取值规则一致"""
+    return (
+        api_base or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
+        api_key or os.getenv("OPENAI_API_KEY"),
+        model or os.getenv("OPENAI_MODEL", "gpt-4-mini"),
+    )
+
+
+def get_llm_client(model: Optional[str] = None, api_key: Optional[str] = None, api_base: Optional[str] = None) -> "LLMClient":
+    """
+    获取进程内共享的 LLMClient 实例
+    
+    参数含义与 LLMClient 相同；相同配置返回同一个实例，只在首次使用该配置时创建（创建时不分配网络资源）
+    """
+    key = _client_config(model, api_key, api_base)
+    with _shared_lock:
+        client = _shared_llm_clients.get(key)
+    if client is not None:
+        return client
+    client = LLMClient(model, api_key, api_base)
+    with _shared_lock:
+        return _shared_llm_clients.setdefault(key, client)
+
+
+def llm_call_stats() -> Dict[str, Dict]:
+    """各共享 LLMClient 按调用类型的调用统计（按模型名）"""
+    with _shared_lock:
+        clients = list(_shared_llm_clients.values())
+    return {client.model: client.call_stats() for client in clients}
+
+
+def llm_coalescing_stats() -> Dict:
+    """相同LLM请求合并的统计：正在执行、实际执行与共享结果的次数"""
+    return _llm_flight.stats()
+
+
+def coalesce_key(api_base: str, model: str, method: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    """请求合并的键：消息内容逐行按 normalize_text 规范化，只有大小写、空白或行末标点不同的请求视为相同"""
+    return make_key(
+        api_base, model, method, temperature,
+        [
+            (message.get("role"), [normalize_text(line) for line in (message.get("content") or "").splitlines()])
+            for message in messages
+        ]
+    )
+
+
+def analysis_cache_stats() -> Dict[str, Dict]:
+    """各共享 LLMClient 的请求分析缓存统计（按模型名）"""
+    with _shared_lock:
+        clients = list(_shared_llm_clients.values())
+    return {
+        client.model: client.analysis_cache.stats()
+        for client in clients
+        if client.analysis_cache is not None
+    }
+
+
+class LLMError(RuntimeError):
+    """LLM调用失败（超时、网络或服务端错误），或回复中没有可用的结果"""
 
 
 class LLMClient:
@@ -22,26 +246,183 @@ class LLMClient:
             api_base: API基础URL（默认从环境变量读取）
         """
         # 从环境变量读取配置
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.api_base = api_base or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
-        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4-mini")
+        self.api_base, self.api_key, self.model = _client_config(model, api_key, api_base)
         
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY 环境变量未设置")
         
-        # 初始化OpenAI客户端（兼容HaiHub等API）
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.api_base
-        )
+        # 请求分析结果缓存（ANALYSIS_CACHE_SIZE=0 关闭）
+        cache_size = int(os.getenv("ANALYSIS_CACHE_SIZE", "2048"))
+        self.analysis_cache: Optional[AnalysisCache] = AnalysisCache(
+            max_size=cache_size,
+            ttl=float(os.getenv("ANALYSIS_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("ANALYSIS_CACHE_SIMILARITY", "0")),
+        ) if cache_size > 0 else None
+        
+        # 推荐提示词中每个候选项描述的最大字符数（0 表示不截断）
+        self.description_chars = int(os.getenv("LLM_DESCRIPTION_CHARS", "160"))
         
-        print(f"✓ LLM客户端已初始化")
-        print(f"  模型: {self.model}")
-        print(f"  API端点: {self.api_base}")
+        # 按调用类型的截止时间、重试与对冲策略（见 llm_policy.CallPolicy.from_env），以及调用统计
+        self.policies: Dict[str, CallPolicy] = load_policies()
+        self.metrics: Dict[str, CallMetrics] = {method: CallMetrics() for method in METHODS}
+        # 是否合并同时进行的相同请求（LLM_COALESCE=0 关闭）
+        self.coalesce = os.getenv("LLM_COALESCE", "1").lower() in ("1", "true", "yes")
+    
+    @property
+    def client(self) -> OpenAI:
+        """OpenAI客户端（兼容HaiHub等API），首次使用时获取共享实例"""
+        return get_shared_openai_client(self.api_base, self.api_key, self.model)
+    
+    def _client_for(self, timeout: Optional[float]) -> OpenAI:
+        """关闭SDK自带重试（由调用策略负责）的客户端副本（共享连接池），有截止时间时带超时"""
+        if timeout is None:
+            return self.client.with_options(max_retries=0)
+        return self.client.with_options(timeout=max(timeout, 0.001), max_retries=0)
+    
+    def _policy(self, method: str) -> Tuple[CallPolicy, CallMetrics]:
+        if method not in self.policies:
+            method = "chat"
+        return self.policies[method], self.metrics[method]
+    
+    def call_stats(self) -> Dict[str, Dict]:
+        """按调用类型的调用统计"""
+        return {method: metrics.stats() for method, metrics in self.metrics.items()}
+    
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        method: str = "chat",
+        coalesce: bool = False
+    ) -> str:
+        """
+        发送聊天请求（按调用类型的策略重试与对冲）
+        
+        Args:
+            messages: 消息列表
+            temperature: 温度参数
+            timeout: 超时时间（秒），与策略的截止时间取较小值；None 表示只使用策略的截止时间
+            method: 调用类型（analyze/preferences/recommend/chat），决定使用的策略与统计
+            coalesce: 是否与同时进行的相同请求合并为一次调用（只适合结果不依赖调用方的请求）
+            
+        Returns:
+            模型回复内容
+            
+        Raises:
+            LLMError: 重试后仍然失败，或超过截止时间
+        """
+        policy, metrics = self._policy(method)
+        
+        def call() -> str:
+            return self._call_with_retries(
+                policy, metrics, timeout,
+                lambda deadline: self._attempt(policy, metrics, messages, temperature, deadline)
+            )
+        
+        if not (coalesce and self.coalesce):
+            return call()
+        key = coalesce_key(self.api_base, self.model, method, messages, temperature)
+        try:
+            content, _ = _llm_flight.do(key, call, timeout=remaining(policy.deadline(timeout)))
+        except TimeoutError as e:
+            raise LLMError("等待相同的LLM请求超时") from e
+        return content
+    
+    def _call_with_retries(
+        self,
+        policy: CallPolicy,
+        metrics: CallMetrics,
+        timeout: Optional[float],
+        attempt: Callable[[Optional[float]], T]
+    ) -> T:
+        """在截止时间内调用 attempt(截止时刻)，可重试的错误按带随机抖动的指数退避重试"""
+        deadline = policy.deadline(timeout)
+        metrics.record_call()
+        error: Optional[BaseException] = None
+        for number in range(policy.max_attempts):
+            if deadline is not None and remaining(deadline) <= 0:
+                break
+            metrics.record_attempt(retry=number > 0)
+            try:
+                return attempt(deadline)
+            except Exception as e:
+                error = e
+            if not is_retryable(error) or number + 1 >= policy.max_attempts:
+                break
+            pause = policy.backoff(number)
+            if deadline is not None and pause >= remaining(deadline):
+                break
+            time.sleep(pause)
+        metrics.record_failure(error or TimeoutError())
+        raise LLMError(str(error) if error is not None else "LLM调用超时") from error
+    
+    def _attempt(
+        self,
+        policy: CallPolicy,
+        metrics: CallMetrics,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        deadline: Optional[float]
+    ) -> str:
+        """
+        一次尝试：开启对冲时，主请求在对冲延迟内没有返回就再发一个请求，取先成功的结果
+        
+        落后的请求无法中断，会在后台线程中运行到结束或超时
+        """
+        if not policy.hedge:
+            return self._create(self.model, messages, temperature, deadline, metrics)
+        
+        executor = _get_hedge_executor()
+        primary = executor.submit(self._create, self.model, messages, temperature, deadline, metrics)
+        delay = metrics.hedge_delay(policy)
+        left = remaining(deadline)
+        done, _ = wait([primary], timeout=delay if left is None else min(delay, left))
+        if done:
+            return primary.result()
+        if deadline is not None and remaining(deadline) <= 0:
+            raise TimeoutError("LLM调用超时")
+        
+        metrics.record_hedge()
+        hedge = executor.submit(
+            self._create, policy.hedge_model or self.model, messages, temperature, deadline, metrics
+        )
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining(deadline), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError("LLM调用超时")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.record_hedge_win()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+    
+    def _create(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        deadline: Optional[float],
+        metrics: CallMetrics
+    ) -> str:
+        start = time.monotonic()
+        response = self._client_for(remaining(deadline)).chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature
+        )
+        # 对冲延迟由主模型的耗时分布得出，备用模型的耗时不计入
+        if model == self.model:
+            metrics.observe(time.monotonic() - start)
+        return response.choices[0].message.content or ""
     
     def chat(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
         """
-        发送聊天请求
+        发送聊天请求（失败时返回错误信息而不是抛出异常）
         
         Args:
             messages: 消息列表
@@ -51,58 +432,130 @@ class LLMClient:
             模型回复内容
         """
         try:
-            response = self.client.chat.completions.create(
+            return self.complete(messages, temperature)
+        except LLMError as e:
+            error_msg = f"LLM调用失败: {str(e)}"
+            print(f"❌ {error_msg}")
+            return error_msg
+    
+    def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        method: str = "chat"
+    ) -> Iterator[str]:
+        """
+        发送流式聊天请求（stream=True）
+        
+        建立连接按调用类型的策略重试（不对冲）；开始输出后截止时间作用于每次读取
+        
+        Args:
+            messages: 消息列表
+            temperature: 温度参数
+            timeout: 超时时间（秒），与策略的截止时间取较小值
+            method: 调用类型
+            
+        Yields:
+            模型回复的文本片段
+            
+        Raises:
+            LLMError: 调用失败、超时或输出中断
+        """
+        policy, metrics = self._policy(method)
+        stream = self._call_with_retries(
+            policy, metrics, timeout,
+            lambda deadline: self._client_for(remaining(deadline)).chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=temperature
+                temperature=temperature,
+                stream=True
             )
-            return response.choices[0].message.content
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         except Exception as e:
-            error_msg = f"LLM调用失败: {str(e)}"
-            print(f"❌ {error_msg}")
-            return error_msg
+            raise LLMError(f"流式输出中断: {e}") from e
+        finally:
+            stream.close()
     
-    def analyze_user_request(self, user_input: str, user_profile_summary: str) -> Dict:
+    def analyze_user_request(
+        self,
+        user_input: str,
+        user_profile_summary: str,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> Dict:
         """
         分析用户请求，提取关键信息
         
+        相同画像摘要下重复（或足够相近）的请求直接返回缓存的分析结果，不再调用LLM
+        
         Args:
             user_input: 用户输入
             user_profile_summary: 用户画像摘要
+            use_cache: 是否使用分析结果缓存
+            timeout: LLM调用超时时间（秒）
             
         Returns:
-            分析结果字典
+            分析结果字典（调用失败时为默认结果）
         """
-        system_prompt = """你是一个名为"灵魂伴侣"的专业阅读推荐Agent。你的核心职责是根据用户的需求和喜好推荐好书和好文章。
-
-你的角色属性：
-1. 专注性：你只回答与书籍、文章、阅读、文学、学术资料和知识探索相关的问题。
-2. 引导性：如果用户的问题与阅读无关，你应该礼貌地拒绝，并引导用户回到阅读话题上。
-3. 深度：你对书籍和文章有深刻的见解，推荐理由应体现出对内容的理解。
-
-任务：
-请分析用户的需求，首先判断该需求是否与阅读/书籍/文章相关。
-如果相关，提取以下信息并返回JSON。
-如果不相关，请在JSON中将 "is_related" 设为 false，并提供一段礼貌的拒绝话术。
-
-返回JSON格式：
-{
-  "is_related": true,
-  "topics": ["关键词"],
-  "content_type": "book/article/both",
-  "purpose": "learning/entertainment/etc",
-  "level": "beginner/intermediate/advanced",
-  "mood": "情感倾向",
-  "language": "zh/en",
-  "refusal_message": null
-}
-
-如果不相关：
-{
-  "is_related": false,
-  "refusal_message": "抱歉，作为您的'灵魂伴侣'阅读助手，我专注于为您发现好书和好文章。关于[用户话题]的问题，我可能无法为您提供专业的建议。不如我们聊聊您最近想读什么类型的书？"
-}"""
+        cache = self.analysis_cache if use_cache else None
+        if cache is not None:
+            cached = cache.get(user_input, user_profile_summary)
+            if cached is not None:
+                return cached
+        
+        try:
+            response = self.complete(
+                self._analysis_messages(ANALYSIS_SYSTEM_PROMPT, user_input, user_profile_summary),
+                temperature=0.3,
+                timeout=timeout,
+                method="analyze",
+                coalesce=True
+            )
+        except LLMError as e:
+            print(f"❌ 请求分析失败，使用默认结果: {e}")
+            return default_analysis()
+        return self._parse_analysis(response, user_input, user_profile_summary, cache)
+    
+    def analyze_request_with_preferences(
+        self,
+        user_input: str,
+        user_profile_summary: str,
+        timeout: Optional[float] = None
+    ) -> Tuple[Dict, Dict]:
+        """
+        融合模式：一次LLM调用同时完成请求分析与偏好提取
         
+        替代 extract_preferences_from_conversation + analyze_user_request 两次串行调用，
+        成功解析的分析结果同样写入分析缓存
+        
+        Args:
+            user_input: 用户输入
+            user_profile_summary: 用户画像摘要
+            timeout: LLM调用超时时间（秒）
+            
+        Returns:
+            (分析结果字典, 偏好信息字典)，调用失败时为默认结果
+        """
+        try:
+            response = self.complete(
+                self._analysis_messages(ANALYSIS_SYSTEM_PROMPT + FUSED_PREFERENCES_PROMPT, user_input, user_profile_summary),
+                temperature=0.3,
+                timeout=timeout,
+                method="analyze",
+                coalesce=True
+            )
+        except LLMError as e:
+            print(f"❌ 请求分析失败，使用默认结果: {e}")
+            return default_analysis(), default_preferences()
+        return self._parse_fused(response, user_input, user_profile_summary)
+    
+    @staticmethod
+    def _analysis_messages(system_prompt: str, user_input: str, user_profile_summary: str) -> List[Dict[str, str]]:
         user_message = f"""用户画像：
 {user_profile_summary}
 
@@ -111,44 +564,72 @@ class LLMClient:
 
 请分析并返回JSON格式的结果。"""
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ]
+    
+    @staticmethod
+    def _extract_json(response: str, expect: str) -> Tuple[object, bool]:
+        """
+        从模型回复中提取JSON（容忍代码块、前后说明文字与截断）
         
-        response = self.chat(messages, temperature=0.3)
-        
+        Args:
+            response: 模型回复
+            expect: 期望的顶层类型 "[" 或 "{"
+            
+        Returns:
+            (解析结果, 是否被截断后修复)
+            
+        Raises:
+            JSONExtractError: 回复中没有可用的JSON
+        """
+        stream = JSONStream(expect)
+        stream.feed(response)
+        value = stream.result()
+        if stream.truncated:
+            print("⚠️  模型输出的JSON不完整，已保留完整的部分")
+        return value, stream.truncated
+    
+    def _parse_analysis(self, response: str, user_input: str, user_profile_summary: str,
+                        cache: Optional[AnalysisCache]) -> Dict:
         # 尝试解析JSON
         try:
-            # 提取JSON部分（可能包含在markdown代码块中）
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-            elif "```" in response:
-                json_str = response.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response.strip()
-            
-            return json.loads(json_str)
+            analysis, truncated = self._extract_json(response, "{")
+            if truncated:
+                # 截断的结果用默认值补齐缺失字段，不缓存
+                return {**default_analysis(), **analysis}
+            # 只缓存成功解析的结果，调用失败时的默认值不缓存
+            if cache is not None:
+                cache.set(user_input, user_profile_summary, analysis)
+            return analysis
         except Exception as e:
             print(f"⚠️  JSON解析失败: {e}")
             # 解析失败，返回默认值
-            return {
-                "is_related": True,
-                "topics": [],
-                "content_type": "book",
-                "purpose": "general",
-                "level": "intermediate",
-                "mood": "neutral",
-                "language": "zh",
-                "refusal_message": None
-            }
+            return default_analysis()
+    
+    def _parse_fused(self, response: str, user_input: str, user_profile_summary: str) -> Tuple[Dict, Dict]:
+        try:
+            analysis, truncated = self._extract_json(response, "{")
+            preferences = analysis.pop("preferences", None)
+            if not isinstance(preferences, dict):
+                preferences = default_preferences()
+            if truncated:
+                return {**default_analysis(), **analysis}, preferences
+            if self.analysis_cache is not None:
+                self.analysis_cache.set(user_input, user_profile_summary, analysis)
+            return analysis, preferences
+        except Exception as e:
+            print(f"⚠️  JSON解析失败: {e}")
+            return default_analysis(), default_preferences()
     
     def generate_recommendations(
         self, 
         user_profile_summary: str,
         user_request_analysis: Dict,
         candidate_items: List[Dict],
-        top_k: int = 5
+        top_k: int = 5,
+        timeout: Optional[float] = None
     ) -> List[Dict]:
         """
         基于候选项生成推荐结果
@@ -158,18 +639,36 @@ class LLMClient:
             user_request_analysis: 用户请求分析结果
             candidate_items: 候选项列表
             top_k: 返回前k个推荐
+            timeout: LLM调用超时时间（秒）
             
         Returns:
             推荐结果列表
+            
+        Raises:
+            LLMError: 调用失败、超时，或回复中没有有效的推荐
         """
         if not candidate_items:
             return []
         
-        # 构建候选项描述
+        messages = self._recommendation_messages(
+            user_profile_summary, user_request_analysis, candidate_items, top_k, self.description_chars
+        )
+        response = self.complete(messages, temperature=0.5, timeout=timeout, method="recommend")
+        return self._parse_recommendations(response, candidate_items, top_k)
+    
+    @staticmethod
+    def _recommendation_messages(
+        user_profile_summary: str,
+        user_request_analysis: Dict,
+        candidate_items: List[Dict],
+        top_k: int,
+        description_chars: int = 0
+    ) -> List[Dict[str, str]]:
+        # 构建候选项描述（描述按 description_chars 截断）
         candidates_text = "\n\n".join([
             f"[{i+1}] 标题: {item.get('title', 'Unknown')}\n"
             f"作者: {item.get('author', 'Unknown')}\n"
-            f"描述: {item.get('description', 'No description')}\n"
+            f"描述: {truncate_text(item.get('description', 'No description'), description_chars)}\n"
             f"来源: {item.get('source', 'Unknown')}"
             for i, item in enumerate(candidate_items[:20])  # 最多处理20个候选项
         ])
@@ -213,92 +712,128 @@ class LLMClient:
 
 请选择最合适的{top_k}个推荐并返回JSON格式结果。"""
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ]
-        
-        response = self.chat(messages, temperature=0.5)
-        
+    
+    def _parse_recommendations(self, response: str, candidate_items: List[Dict], top_k: int) -> List[Dict]:
         # 解析JSON
         try:
-            # 提取JSON部分
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-            elif "```" in response:
-                json_str = response.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response.strip()
-            
-            recommendations = json.loads(json_str)
-            
-            # 合并候选项信息和推荐信息
-            result = []
-            for rec in recommendations[:top_k]:
-                idx = rec.get("index", 1) - 1
-                if 0 <= idx < len(candidate_items):
-                    item = candidate_items[idx].copy()
-                    item.update({
-                        "reason": rec.get("reason", ""),
-                        "highlights": rec.get("highlights", ""),
-                        "scenario": rec.get("scenario", ""),
-                        "score": rec.get("score", 7)
-                    })
-                    result.append(item)
+            recommendations, _ = self._extract_json(response, "[")
+        except JSONExtractError as e:
+            raise LLMError(f"推荐JSON解析失败: {e}") from e
+        
+        # 合并候选项信息和推荐信息
+        result = []
+        for rec in recommendations[:top_k]:
+            item = self._merge_recommendation(rec, candidate_items)
+            if item is not None:
+                result.append(item)
+        if not result:
+            raise LLMError("回复中没有有效的推荐")
+        return result
+    
+    @staticmethod
+    def _merge_recommendation(rec: Dict, candidate_items: List[Dict]) -> Optional[Dict]:
+        """把一条推荐与对应的候选项合并，序号无效（缺失、非数字、越界）时返回 None"""
+        if not isinstance(rec, dict):
+            return None
+        try:
+            idx = int(rec.get("index", 1)) - 1
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if not 0 <= idx < len(candidate_items):
+            return None
+        item = candidate_items[idx].copy()
+        item.update({
+            "reason": rec.get("reason", ""),
+            "highlights": rec.get("highlights", ""),
+            "scenario": rec.get("scenario", ""),
+            "score": rec.get("score", 7)
+        })
+        return item
+    
+    def stream_recommendations(
+        self,
+        user_profile_summary: str,
+        user_request_analysis: Dict,
+        candidate_items: List[Dict],
+        top_k: int = 5,
+        timeout: Optional[float] = None
+    ) -> Iterator[Dict]:
+        """
+        流式生成推荐：模型输出中每个推荐对象闭合后立即产出合并后的推荐项
+        
+        参数与 generate_recommendations 相同；已经产出部分推荐后输出中断时，保留已产出的部分
+        
+        Yields:
+            推荐项
             
-            return result
-        except Exception as e:
-            print(f"⚠️  推荐JSON解析失败: {e}")
-            # 解析失败，返回前top_k个候选项
-            return candidate_items[:top_k]
+        Raises:
+            LLMError: 产出任何推荐之前调用失败、超时，或输出中没有有效的推荐
+        """
+        if not candidate_items:
+            return
+        
+        messages = self._recommendation_messages(
+            user_profile_summary, user_request_analysis, candidate_items, top_k, self.description_chars
+        )
+        parser = JSONStream("[")
+        count = 0
+        chunks = self.chat_stream(messages, temperature=0.5, timeout=timeout, method="recommend")
+        try:
+            for chunk in chunks:
+                for rec in parser.feed(chunk):
+                    item = self._merge_recommendation(rec, candidate_items)
+                    if item is None:
+                        continue
+                    yield item
+                    count += 1
+                    if count >= top_k:
+                        return
+        except LLMError as e:
+            if count == 0:
+                raise
+            print(f"⚠️  推荐输出中断，保留已生成的{count}个推荐: {e}")
+        finally:
+            chunks.close()
+        
+        if count == 0:
+            raise LLMError("流式输出中没有有效的推荐")
     
-    def extract_preferences_from_conversation(self, conversation_history: str) -> Dict:
+    def extract_preferences_from_conversation(self, conversation_history: str, timeout: Optional[float] = None) -> Dict:
         """
         从对话历史中提取用户偏好
         
         Args:
             conversation_history: 对话历史
+            timeout: LLM调用超时时间（秒）
             
         Returns:
-            提取的偏好信息
+            提取的偏好信息（调用失败时为默认结果）
         """
-        system_prompt = """分析对话历史，提取用户的阅读偏好信息。
-
-请提取：
-1. genres: 喜欢的类型列表
-2. topics: 感兴趣的主题列表
-3. authors: 喜欢的作者列表
-4. reading_level: 阅读水平（beginner/intermediate/advanced）
-
-返回JSON格式：
-{
-  "genres": ["科幻", "推理"],
-  "topics": ["人工智能", "心理学"],
-  "authors": ["刘慈欣"],
-  "reading_level": "intermediate"
-}"""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
+        try:
+            response = self.complete(
+                self._preference_messages(conversation_history), temperature=0.3, timeout=timeout,
+                method="preferences", coalesce=True
+            )
+        except LLMError as e:
+            print(f"⚠️  偏好提取失败: {e}")
+            return default_preferences()
+        return self._parse_preferences(response)
+    
+    @staticmethod
+    def _preference_messages(conversation_history: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": PREFERENCES_SYSTEM_PROMPT},
             {"role": "user", "content": f"对话历史：\n{conversation_history}"}
         ]
-        
-        response = self.chat(messages, temperature=0.3)
-        
+    
+    def _parse_preferences(self, response: str) -> Dict:
         try:
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-            elif "```" in response:
-                json_str = response.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response.strip()
-            
-            return json.loads(json_str)
+            preferences, _ = self._extract_json(response, "{")
+            return preferences
         except Exception as e:
             print(f"⚠️  偏好提取失败: {e}")
-            return {
-                "genres": [],
-                "topics": [],
-                "authors": [],
-                "reading_level": "intermediate"
-            }
+            return default_preferences()
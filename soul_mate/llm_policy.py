@@ -0,0 +1,191 @@
+"""
+LLM调用策略模块
+按调用类型（请求分析 / 偏好提取 / 生成推荐 / 通用对话）配置截止时间、重试与对冲请求，
+并统计各类调用的尝试、重试、对冲与对冲获胜次数
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+import openai
+
+
+# 调用类型：analyze 为请求分析（含融合分析），preferences 为偏好提取，recommend 为生成推荐，chat 为其他对话
+METHODS = ("analyze", "preferences", "recommend", "chat")
+
+# 各调用类型默认的截止时间（秒）：请求分析与偏好提取的输出短，比生成推荐收得更紧
+DEFAULT_TIMEOUTS = {
+    "analyze": 15.0,
+    "preferences": 15.0,
+    "recommend": 45.0,
+    "chat": 60.0,
+}
+
+
+def _env(method: str, name: str, default: str) -> str:
+    """先读 LLM_<调用类型>_<名称>，再读 LLM_<名称>"""
+    return os.getenv(f"LLM_{method.upper()}_{name}", os.getenv(f"LLM_{name}", default))
+
+
+class CallPolicy:
+    """
+    一类LLM调用的策略
+
+    - timeout: 整次调用（含重试与对冲）的截止时间（秒），None 表示不限制
+    - max_attempts: 最多尝试次数（1 表示不重试）；只重试超时、连接错误、429 与 5xx
+    - backoff_base / backoff_max: 重试间隔取 [0, min(backoff_max, backoff_base * 2^n)] 内的随机值
+    - hedge: 是否对冲：请求在近期成功耗时的 hedge_quantile 分位数内没有返回时，再发一个相同请求，
+      取先成功的结果；样本不足 min_samples 时等待 hedge_delay 秒
+    - hedge_model: 对冲请求使用的模型（例如更便宜的备用模型），None 表示与主请求相同
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_delay: float = 1.0,
+        hedge_model: Optional[str] = None,
+        min_samples: int = 20
+    ):
+        self.timeout = timeout
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.hedge_model = hedge_model
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_env(cls, method: str) -> "CallPolicy":
+        """
+        从环境变量读取策略，每项都可以按调用类型单独配置，例如:
+        LLM_TIMEOUT=60、LLM_ANALYZE_TIMEOUT=8、LLM_RETRIES=2、LLM_RECOMMEND_HEDGE=1、LLM_HEDGE_MODEL=gpt-4.1-nano
+        """
+        timeout = float(_env(method, "TIMEOUT", str(DEFAULT_TIMEOUTS.get(method, DEFAULT_TIMEOUTS["chat"]))))
+        return cls(
+            timeout=timeout if timeout > 0 else None,
+            max_attempts=int(_env(method, "RETRIES", "2")) + 1,
+            backoff_base=float(_env(method, "BACKOFF", "0.2")),
+            backoff_max=float(_env(method, "BACKOFF_MAX", "2.0")),
+            hedge=_env(method, "HEDGE", "0").lower() in ("1", "true", "yes"),
+            hedge_quantile=float(_env(method, "HEDGE_QUANTILE", "0.95")),
+            hedge_delay=float(_env(method, "HEDGE_DELAY", "1.0")),
+            hedge_model=_env(method, "HEDGE_MODEL", "") or None,
+        )
+
+    def deadline(self, timeout: Optional[float] = None) -> Optional[float]:
+        """本次调用的截止时刻（time.monotonic），取策略与调用方超时中较小的一个"""
+        limits = [t for t in (self.timeout, timeout) if t is not None]
+        return time.monotonic() + min(limits) if limits else None
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def load_policies() -> Dict[str, CallPolicy]:
+    """所有调用类型的策略"""
+    return {method: CallPolicy.from_env(method) for method in METHODS}
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """距离截止时刻的秒数（不小于 0），没有截止时间时为 None"""
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def is_timeout(error: Optional[BaseException]) -> bool:
+    return isinstance(error, (openai.APITimeoutError, httpx.TimeoutException, TimeoutError))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """超时、连接错误、限流与服务端错误可以重试；鉴权、参数等错误重试也不会成功"""
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+class CallMetrics:
+    """一类调用的统计：调用、尝试、重试、对冲、对冲获胜、失败与超时次数，以及近期成功耗时"""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def record_attempt(self, retry: bool):
+        with self._lock:
+            self.attempts += 1
+            if retry:
+                self.retries += 1
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def record_failure(self, error: Optional[BaseException]):
+        with self._lock:
+            self.failures += 1
+            if is_timeout(error):
+                self.timeouts += 1
+
+    def observe(self, latency: float):
+        """记录一次成功请求的耗时（秒）"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def hedge_delay(self, policy: CallPolicy) -> float:
+        """发出对冲请求前等待的时间：近期耗时的分位数，样本不足时为配置的固定值"""
+        delay = self.quantile(policy.hedge_quantile, policy.min_samples)
+        return policy.hedge_delay if delay is None else delay
+
+    def stats(self) -> Dict:
+        p50 = self.quantile(0.5)
+        p95 = self.quantile(0.95)
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
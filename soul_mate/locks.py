@@ -0,0 +1,63 @@
+"""
+按键分配锁的模块
+同一个键（例如用户ID）总是得到同一把锁，不同键互不影响；不再被引用的锁自动回收
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Callable, Hashable
+
+
+class KeyedLocks:
+    """
+    按键分配的线程锁，默认为可重入锁
+
+    用法:
+        locks = KeyedLocks()
+        with locks.get(user_id):
+            ...  # 同一用户的操作串行执行，不同用户并行
+
+    需要在其他线程中释放时（例如跨 yield 持有锁的生成器可能在其他线程中关闭）使用 KeyedLocks(threading.Lock)
+    """
+
+    def __init__(self, factory: Callable = threading.RLock):
+        self._factory = factory
+        self._guard = threading.Lock()
+        self._locks: "weakref.WeakValueDictionary[Hashable, object]" = weakref.WeakValueDictionary()
+
+    def get(self, key: Hashable):
+        """返回该键的锁；调用方需要持有返回值，否则锁会被回收"""
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._factory()
+                self._locks[key] = lock
+            return lock
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+
+class AsyncKeyedLocks:
+    """按键分配的 asyncio.Lock（不可重入），按事件循环区分"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        # 事件循环（弱引用）-> 键 -> 锁（弱引用）
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, weakref.WeakValueDictionary]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self, key: Hashable) -> asyncio.Lock:
+        """返回当前事件循环中该键的锁（需要在事件循环中调用）"""
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            locks = self._locks.get(loop)
+            if locks is None:
+                locks = self._locks[loop] = weakref.WeakValueDictionary()
+            lock = locks.get(key)
+            if lock is None:
+                lock = locks[key] = asyncio.Lock()
+            return lock
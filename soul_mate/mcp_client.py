@@ -0,0 +1,257 @@
+"""
+MCP 客户端模块
+与 MCP 服务器保持长连接（stdio 上的 JSON-RPC 2.0），在多个请求间复用同一个会话
+"""
+
+import itertools
+import json
+import shlex
+import subprocess
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+
+PROTOCOL_VERSION = "2024-11-05"
+
+
+class MCPError(Exception):
+    """MCP 服务器返回的错误"""
+
+
+class MCPConnectionError(MCPError):
+    """会话断开或无法建立"""
+
+
+class _PendingCall:
+    """等待响应的一次调用"""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[Exception] = None
+
+
+class MCPSession:
+    """
+    持久化 MCP 会话
+
+    - 启动一次服务器进程并完成 initialize 握手，之后所有调用复用该进程
+    - 每个请求带独立 id，由后台读线程按 id 分发响应，多个线程可以同时发起调用
+    - 进程退出或管道断开时，挂起的调用全部失败，下一次调用自动重连
+    """
+
+    def __init__(self, command: Union[str, List[str]], timeout: float = 10.0, env: Optional[Dict] = None):
+        """
+        Args:
+            command: 启动 MCP 服务器的命令（字符串会按 shell 规则拆分）
+            timeout: 握手与默认调用超时（秒）
+            env: 服务器进程的环境变量
+        """
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        self.timeout = timeout
+        self.env = env
+        self._process: Optional[subprocess.Popen] = None
+        self._pending: Dict[int, _PendingCall] = {}
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self.server_info: Dict = {}
+        self.connects = 0
+        self.calls = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def connect(self):
+        """启动服务器进程并握手（已连接时直接返回）"""
+        if self.connected:
+            return
+        with self._connect_lock:
+            if self.connected:
+                return
+            self._close_process()
+            try:
+                process = subprocess.Popen(
+                    self.command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    encoding="utf-8",
+                    bufsize=1,
+                    env=self.env,
+                )
+            except OSError as e:
+                raise MCPConnectionError(f"无法启动MCP服务器: {e}") from e
+            self._process = process
+            self.connects += 1
+            reader = threading.Thread(
+                target=self._read_loop, args=(process,), name="mcp-reader", daemon=True
+            )
+            reader.start()
+
+            try:
+                result = self._request("initialize", {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {},
+                    "clientInfo": {"name": "soul-mate-agent", "version": "1.0.0"},
+                }, self.timeout)
+                self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+            except Exception as e:
+                self._close_process()
+                raise MCPConnectionError(f"MCP握手失败: {e}") from e
+            self.server_info = result.get("serverInfo", {}) if isinstance(result, dict) else {}
+
+    def _send(self, message: Dict):
+        process = self._process
+        if process is None or process.stdin is None:
+            raise MCPConnectionError("MCP会话未连接")
+        data = json.dumps(message, ensure_ascii=False) + "\n"
+        try:
+            with self._write_lock:
+                process.stdin.write(data)
+                process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise MCPConnectionError(f"写入MCP服务器失败: {e}") from e
+
+    def _request(self, method: str, params: Dict, timeout: float) -> Any:
+        request_id = next(self._ids)
+        call = _PendingCall()
+        with self._pending_lock:
+            self._pending[request_id] = call
+        try:
+            self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+            if not call.event.wait(timeout):
+                raise TimeoutError(f"MCP调用 {method} 超时（{timeout}秒）")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _read_loop(self, process: subprocess.Popen):
+        """后台读线程：按 id 分发响应；进程结束时让所有挂起调用失败"""
+        try:
+            for line in process.stdout:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                request_id = message.get("id")
+                if request_id is None or "method" in message:
+                    # 服务器通知或服务器发起的请求，当前不需要处理
+                    continue
+                with self._pending_lock:
+                    call = self._pending.get(request_id)
+                if call is None:
+                    continue
+                if "error" in message:
+                    error = message["error"] or {}
+                    call.error = MCPError(error.get("message", "未知错误"))
+                else:
+                    call.result = message.get("result")
+                call.event.set()
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._fail_pending(process)
+
+    def _fail_pending(self, process: subprocess.Popen):
+        if self._process is not process:
+            return
+        with self._pending_lock:
+            pending = list(self._pending.values())
+        for call in pending:
+            if not call.event.is_set():
+                call.error = MCPConnectionError("MCP服务器连接已断开")
+                call.event.set()
+
+    def call_tool(self, name: str, arguments: Dict, timeout: Optional[float] = None, retries: int = 1) -> Any:
+        """
+        调用 MCP 工具
+
+        Args:
+            name: 工具名
+            arguments: 工具参数
+            timeout: 超时时间（秒），默认使用会话超时
+            retries: 连接断开时重连重试的次数
+
+        Returns:
+            tools/call 的 result
+        """
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(retries + 1):
+            try:
+                self.connect()
+                self.calls += 1
+                result = self._request("tools/call", {"name": name, "arguments": arguments}, timeout)
+                if isinstance(result, dict) and result.get("isError"):
+                    raise MCPError(tool_result_text(result) or f"工具 {name} 调用失败")
+                return result
+            except MCPConnectionError:
+                # 只清理已经失效的进程，其他线程可能已经重连成功
+                with self._connect_lock:
+                    if not self.connected:
+                        self._close_process()
+                if attempt >= retries:
+                    raise
+
+    def _close_process(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.stdin:
+                process.stdin.close()
+        except OSError:
+            pass
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        # 让仍在等待这个进程的调用立即失败
+        with self._pending_lock:
+            pending = list(self._pending.values())
+        for call in pending:
+            if not call.event.is_set():
+                call.error = MCPConnectionError("MCP会话已关闭")
+                call.event.set()
+
+    def close(self):
+        """关闭会话并结束服务器进程"""
+        with self._connect_lock:
+            self._close_process()
+
+
+def tool_result_text(result: Dict) -> str:
+    """拼接 tools/call 结果中的文本内容"""
+    parts = [
+        block.get("text", "")
+        for block in (result or {}).get("content", [])
+        if isinstance(block, dict) and block.get("type") == "text"
+    ]
+    return "\n".join(parts)
+
+
+_sessions: Dict[tuple, MCPSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_mcp_session(command: Union[str, List[str]], timeout: float = 10.0) -> MCPSession:
+    """获取进程内共享的 MCP 会话（按启动命令区分）"""
+    key = tuple(shlex.split(command) if isinstance(command, str) else command)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = MCPSession(list(key), timeout=timeout)
+        return session
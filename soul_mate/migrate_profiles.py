@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+用户画像迁移工具
+将 data/user_profiles 下的JSON（或事件日志）画像批量导入 SQLite 存储
+
+使用示例:
+  python -m soul_mate.migrate_profiles
+  python -m soul_mate.migrate_profiles --src data/user_profiles --db data/user_profiles/profiles.db
+  python -m soul_mate.migrate_profiles --source-store eventlog --batch-size 1000
+"""
+
+import argparse
+import sys
+from typing import Dict, Iterator
+
+from .profile_store import EventLogProfileStore, JSONProfileStore, ProfileStore, default_db_path
+from .sqlite_store import SQLiteProfileStore
+
+
+def iter_profiles(source: ProfileStore) -> Iterator[Dict]:
+    """逐个读出源存储中的完整画像，无法解析的文件跳过"""
+    for user_id in source.list_users():
+        try:
+            profile = source.load(user_id)
+        except Exception as e:
+            print(f"⚠️  跳过 {user_id}: {e}")
+            continue
+        if profile is None:
+            continue
+        profile.setdefault("user_id", user_id)
+        if "feedback" not in profile:
+            profile.update(source.load_collections(user_id))
+        yield profile
+
+
+def migrate(source: ProfileStore, target: SQLiteProfileStore, batch_size: int = 500) -> int:
+    """
+    批量迁移画像，每 batch_size 个用户一个事务
+
+    Returns:
+        迁移的画像数量
+    """
+    total = 0
+    batch = []
+    for profile in iter_profiles(source):
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            total += target.import_profiles(batch)
+            batch = []
+            print(f"  已导入 {total} 个画像")
+    if batch:
+        total += target.import_profiles(batch)
+    return total
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="将JSON画像批量导入SQLite存储")
+    parser.add_argument("--src", default="data/user_profiles", help="源画像目录（默认: data/user_profiles）")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="目标SQLite数据库（默认: PROFILE_DB_PATH 或 <源画像目录>/profiles.db，与服务进程一致）"
+    )
+    parser.add_argument(
+        "--source-store",
+        choices=["json", "eventlog"],
+        default="json",
+        help="源目录使用的存储格式（默认: json）"
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="每个事务导入的画像数（默认: 500）")
+    args = parser.parse_args()
+    args.db = args.db or default_db_path(args.src)
+
+    if args.source_store == "eventlog":
+        source = EventLogProfileStore(args.src, compact_every=0)
+    else:
+        source = JSONProfileStore(args.src)
+    target = SQLiteProfileStore(args.db)
+
+    try:
+        total = migrate(source, target, args.batch_size)
+    except Exception as e:
+        print(f"迁移失败: {str(e)}")
+        sys.exit(1)
+    finally:
+        source.close()
+        target.close()
+
+    print(f"✓ 共迁移 {total} 个画像到 {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+离线推荐模块
+不调用LLM，根据本地打分与模板生成推荐理由、亮点和适合场景。
+用于按请求选择的快速模式，以及LLM超时、失败或剩余时间预算不足时的兜底
+"""
+
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .cache import normalize_text
+from .llm_client import default_analysis
+from .ranker import CandidateRanker, truncate_text
+
+
+LEVEL_TEXT = {
+    "beginner": "适合入门阅读",
+    "intermediate": "适合有一定基础的读者",
+    "advanced": "适合深入研究",
+}
+
+PURPOSE_SCENARIOS = {
+    "learning": "系统学习时按章节阅读并做笔记",
+    "research": "专题研究时作为参考资料",
+    "work": "工作中遇到相关问题时查阅",
+    "entertainment": "睡前或周末放松时阅读",
+    "relax": "睡前或周末放松时阅读",
+}
+
+_SENTENCE_END = re.compile(r"[。！？!?\n]|\.\s")
+
+# 离线推荐评分区间（与LLM给出的1-10分可比）
+MIN_SCORE = 6
+MAX_SCORE = 9
+
+
+def heuristic_analysis(user_input: str) -> Dict:
+    """
+    不调用LLM的请求分析：按关键词判断内容类型，其余字段使用默认值
+
+    Args:
+        user_input: 用户输入
+
+    Returns:
+        与 analyze_user_request 格式相同的分析结果（topics 为空，搜索时直接使用原始输入）
+    """
+    analysis = default_analysis()
+    wants_article = "文章" in user_input or "article" in user_input.lower()
+    wants_book = "书" in user_input or "book" in user_input.lower()
+    if wants_article and not wants_book:
+        analysis["content_type"] = "article"
+    elif wants_book and not wants_article:
+        analysis["content_type"] = "book"
+    else:
+        analysis["content_type"] = "both"
+    return analysis
+
+
+def _first_sentence(text: str, limit: int = 60) -> str:
+    match = _SENTENCE_END.search(text)
+    sentence = text[:match.start()] if match else text
+    return truncate_text(sentence.strip(), limit)
+
+
+class OfflineRecommender:
+    """基于 CandidateRanker 得分与模板的离线推荐生成器"""
+
+    def __init__(self, ranker: Optional[CandidateRanker] = None):
+        self.ranker = ranker or CandidateRanker()
+
+    def recommend(
+        self,
+        candidate_items: List[Dict],
+        request_analysis: Dict,
+        query: str,
+        preferences: Optional[Dict] = None,
+        disliked: Optional[List[Dict]] = None,
+        top_k: int = 5,
+        taste: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        生成离线推荐
+
+        Args:
+            candidate_items: 候选项列表
+            request_analysis: 请求分析结果（可以是 heuristic_analysis 的结果）
+            query: 请求文本
+            preferences: 用户偏好（genres/topics/authors）
+            disliked: 不喜欢的项目
+            top_k: 返回推荐数量
+            taste: 用户口味向量
+
+        Returns:
+            与 generate_recommendations 格式相同的推荐列表（reason/highlights/scenario/score）
+        """
+        if not candidate_items:
+            return []
+        preferences = preferences or {}
+        scores = self.ranker.score(candidate_items, query, preferences, disliked, taste)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+
+        low, high = float(scores.min()), float(scores.max())
+        recommendations = []
+        for i in order:
+            if high > low:
+                score = MIN_SCORE + round((float(scores[i]) - low) / (high - low) * (MAX_SCORE - MIN_SCORE))
+            else:
+                score = (MIN_SCORE + MAX_SCORE) // 2
+            item = candidate_items[i].copy()
+            item.update({
+                "reason": self._reason(item, request_analysis, preferences, query),
+                "highlights": self._highlights(item),
+                "scenario": self._scenario(item, request_analysis),
+                "score": score,
+            })
+            recommendations.append(item)
+        return recommendations
+
+    @staticmethod
+    def _reason(item: Dict, request_analysis: Dict, preferences: Dict, query: str) -> str:
+        text = normalize_text(f"{item.get('title', '')} {item.get('description', '')}")
+        parts = []
+
+        topics = [topic for topic in request_analysis.get("topics", []) if normalize_text(topic) in text]
+        if topics:
+            parts.append(f"与你想了解的「{'、'.join(topics[:2])}」直接相关")
+
+        author = item.get("author") or ""
+        if author and normalize_text(author) in {normalize_text(a) for a in preferences.get("authors", [])}:
+            parts.append(f"来自你喜欢的作者{author}")
+
+        interests = [
+            interest for interest in list(preferences.get("topics", [])) + list(preferences.get("genres", []))
+            if normalize_text(interest) in text
+        ]
+        if interests:
+            parts.append(f"符合你对「{'、'.join(interests[:2])}」的兴趣")
+
+        if not parts:
+            parts.append(f"与你的需求「{truncate_text(query.strip(), 20)}」相关")
+
+        level = LEVEL_TEXT.get(request_analysis.get("level", ""))
+        if level:
+            parts.append(level)
+        return "，".join(parts) + "。"
+
+    @staticmethod
+    def _highlights(item: Dict) -> str:
+        description = item.get("description") or ""
+        if description:
+            return _first_sentence(description)
+        kind = "文章" if item.get("type") == "article" else "书籍"
+        source = item.get("source")
+        return f"来自{source}的{kind}" if source else kind
+
+    @staticmethod
+    def _scenario(item: Dict, request_analysis: Dict) -> str:
+        if item.get("type") == "article":
+            return "通勤或午休等碎片时间阅读"
+        return PURPOSE_SCENARIOS.get(request_analysis.get("purpose", ""), "空闲时慢慢阅读")
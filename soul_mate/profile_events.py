@@ -0,0 +1,143 @@
+"""
+用户画像事件模块
+定义画像的默认结构和修改事件，供 UserProfile 与各存储后端共享同一套状态变更逻辑
+"""
+
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Optional
+
+from .taste import TASTE_KEY, update_taste
+
+
+# 事件类型
+EVENT_PREFERENCES = "preferences"  # 偏好字段整体替换: {"values": {...}}
+EVENT_HISTORY = "history"  # 追加阅读历史: {"item": {...}}
+EVENT_FEEDBACK = "feedback"  # 喜欢/不喜欢反馈: {"item_id", "liked", "entry"}
+EVENT_INTERACTION = "interaction"  # 交互计数 +1
+
+
+def default_profile(user_id: str) -> Dict:
+    """新用户的默认画像"""
+    now = datetime.now().isoformat()
+    return {
+        "user_id": user_id,
+        "created_at": now,
+        "updated_at": now,
+        "preferences": {
+            "genres": [],  # 喜欢的类型
+            "topics": [],  # 感兴趣的主题
+            "authors": [],  # 喜欢的作者
+            "reading_level": "intermediate",  # 阅读水平: beginner, intermediate, advanced
+            "content_types": ["book", "article"],  # 内容类型偏好
+            "languages": ["zh", "en"],  # 语言偏好
+        },
+        "reading_history": [],  # 阅读历史
+        "feedback": {
+            "liked": [],  # 喜欢的推荐
+            "disliked": [],  # 不喜欢的推荐
+        },
+        "interaction_count": 0,  # 交互次数
+        TASTE_KEY: None,  # 口味向量（见 taste.py），随反馈增量更新
+    }
+
+
+def index_feedback(profile: Dict) -> Dict:
+    """
+    将反馈列表转换为内存中的索引形式（原地修改）
+
+    内存中 feedback["liked"/"disliked"] 是按最近反馈时间排序的 {item_id: entry} 字典，
+    切换、重复点赞都是 O(1)；同一项目的重复反馈只保留最新一条。
+    持久化时再由 persisted_profile() 还原为列表，旧版本读取方不受影响。
+    """
+    feedback = profile.get("feedback")
+    if feedback is None or isinstance(feedback.get("liked"), dict):
+        return profile
+
+    latest = {}  # item_id -> (timestamp, state, entry)
+    for state in ("liked", "disliked"):
+        for entry in feedback.get(state, []):
+            item_id = entry.get("item_id")
+            previous = latest.pop(item_id, None)
+            if previous is not None and previous[0] > entry.get("timestamp", ""):
+                latest[item_id] = previous
+            else:
+                latest[item_id] = (entry.get("timestamp", ""), state, entry)
+
+    indexed = {"liked": {}, "disliked": {}}
+    for item_id, (_, state, entry) in sorted(latest.items(), key=lambda kv: kv[1][0]):
+        indexed[state][item_id] = entry
+    profile["feedback"] = indexed
+    return profile
+
+
+def persisted_profile(profile: Dict) -> Dict:
+    """返回可直接序列化的画像副本（反馈还原为按时间排序的列表）"""
+    snapshot = dict(profile)
+    feedback = profile.get("feedback")
+    if feedback is not None and isinstance(feedback.get("liked"), dict):
+        snapshot["feedback"] = {
+            state: list(feedback[state].values()) for state in ("liked", "disliked")
+        }
+    return snapshot
+
+
+def recent_entries(entries: Dict, limit: int) -> List[Dict]:
+    """按时间顺序返回索引形式反馈中最近的 limit 条，O(limit)"""
+    if limit <= 0:
+        return []
+    return list(islice(reversed(entries.values()), limit))[::-1]
+
+
+def make_event(op: str, **fields) -> Dict:
+    """构造一条带时间戳的画像事件"""
+    event = {"op": op, "ts": datetime.now().isoformat()}
+    event.update(fields)
+    return event
+
+
+def apply_event(profile: Dict, event: Dict) -> Optional[Dict]:
+    """
+    将事件应用到画像上（原地修改）
+
+    Args:
+        profile: 画像数据
+        event: 画像事件
+
+    Returns:
+        修改后的画像；未知事件类型返回 None
+    """
+    op = event.get("op")
+
+    if op == EVENT_PREFERENCES:
+        for key, value in event.get("values", {}).items():
+            if key in profile["preferences"]:
+                profile["preferences"][key] = value
+
+    elif op == EVENT_HISTORY:
+        profile["reading_history"].append(event["item"])
+
+    elif op == EVENT_FEEDBACK:
+        item_id = event["item_id"]
+        feedback = index_feedback(profile)["feedback"]
+        keep, drop = ("liked", "disliked") if event["liked"] else ("disliked", "liked")
+        previous, previous_liked = None, None
+        for state, liked in (("liked", True), ("disliked", False)):
+            if item_id in feedback[state]:
+                previous, previous_liked = feedback[state][item_id], liked
+        # 口味向量要扣除同一项目旧反馈的贡献，需在修改反馈列表之前更新
+        update_taste(profile, event["liked"], event["entry"], previous, previous_liked)
+        # 从相反的列表中移除（如果存在），重复反馈移到最新位置
+        feedback[drop].pop(item_id, None)
+        feedback[keep].pop(item_id, None)
+        feedback[keep][item_id] = event["entry"]
+
+    elif op == EVENT_INTERACTION:
+        profile["interaction_count"] += 1
+
+    else:
+        return None
+
+    if event.get("ts"):
+        profile["updated_at"] = event["ts"]
+    return profile
@@ -0,0 +1,469 @@
+"""
+用户画像存储模块
+提供可插拔的画像存储后端：整文件JSON（默认）、追加写事件日志与SQLite
+"""
+
+import glob
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .locks import KeyedLocks
+from .profile_events import apply_event, persisted_profile
+
+
+def atomic_write_json(path: str, data: Dict, indent: Optional[int] = 2):
+    """先写临时文件并 fsync，再原子替换目标文件"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ProfileStore:
+    """
+    画像存储后端接口
+
+    lazy_collections 为 True 的后端在 load() 时不返回 reading_history / feedback，
+    由 UserProfile 在首次需要时通过 load_collections() 取回
+    """
+
+    lazy_collections = False
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        """
+        加载用户画像
+
+        Returns:
+            画像数据；用户不存在时返回 None
+        """
+        raise NotImplementedError
+
+    def save_snapshot(self, user_id: str, profile: Dict):
+        """写入完整画像快照"""
+        raise NotImplementedError
+
+    def append_events(self, user_id: str, profile: Dict, events: List[Dict]):
+        """
+        持久化一批画像事件
+
+        Args:
+            user_id: 用户ID
+            profile: 已应用这些事件后的内存画像（整文件型后端直接写快照）
+            events: 自上次持久化以来的事件
+        """
+        raise NotImplementedError
+
+    def load_collections(self, user_id: str) -> Dict:
+        """
+        加载阅读历史与反馈列表
+
+        Returns:
+            {"reading_history": [...], "feedback": {"liked": [...], "disliked": [...]}}
+        """
+        profile = self.load(user_id) or {}
+        return {
+            "reading_history": profile.get("reading_history", []),
+            "feedback": profile.get("feedback", {"liked": [], "disliked": []}),
+        }
+
+    def recent_feedback(self, user_id: str, liked: bool, limit: int) -> List[Dict]:
+        """按时间顺序返回最近 limit 条喜欢/不喜欢的反馈"""
+        items = self.load_collections(user_id)["feedback"]["liked" if liked else "disliked"]
+        return items[-limit:] if limit > 0 else []
+
+    def list_users(self) -> List[str]:
+        """列出所有已存储的用户ID"""
+        raise NotImplementedError
+
+    def updated_users(self, since: Optional[float] = None) -> List[str]:
+        """
+        列出 since（Unix 时间戳）之后写入过的用户，供增量处理使用
+
+        判断依据应为写入存储的时间：文件型后端按文件修改时间，sqlite 后端按写入时记录的 written_at。
+        默认逐个加载画像比较 updated_at（内存中修改的时间），写回模式下修改最多延迟
+        PROFILE_FLUSH_INTERVAL 秒才写入，因此把起始时间提前一个刷盘间隔
+
+        Args:
+            since: 起始时间，None 表示返回全部用户
+        """
+        users = self.list_users()
+        if since is None:
+            return users
+        if os.getenv("PROFILE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes"):
+            since -= float(os.getenv("PROFILE_FLUSH_INTERVAL", "5"))
+        threshold = datetime.fromtimestamp(since).isoformat()
+        return [user_id for user_id in users if ((self.load(user_id) or {}).get("updated_at") or "") > threshold]
+
+    def close(self):
+        """释放后端资源"""
+
+
+def _list_json_users(data_dir: str) -> List[str]:
+    return sorted(
+        os.path.basename(path)[:-len(".json")]
+        for path in glob.glob(os.path.join(data_dir, "*.json"))
+    )
+
+
+def _modified_since(paths: List[str], since: float) -> bool:
+    """任一存在的文件在 since 之后被修改过"""
+    for path in paths:
+        try:
+            if os.path.getmtime(path) > since:
+                return True
+        except OSError:
+            continue
+    return False
+
+
+class JSONProfileStore(ProfileStore):
+    """每个用户一个JSON文件，每次持久化整体重写（默认后端）"""
+
+    def __init__(self, data_dir: str = "data/user_profiles"):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+
+    def profile_path(self, user_id: str) -> str:
+        return os.path.join(self.data_dir, f"{user_id}.json")
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        path = self.profile_path(user_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_snapshot(self, user_id: str, profile: Dict):
+        atomic_write_json(self.profile_path(user_id), persisted_profile(profile))
+
+    def append_events(self, user_id: str, profile: Dict, events: List[Dict]):
+        self.save_snapshot(user_id, profile)
+
+    def list_users(self) -> List[str]:
+        return _list_json_users(self.data_dir)
+
+    def updated_users(self, since: Optional[float] = None) -> List[str]:
+        users = self.list_users()
+        if since is None:
+            return users
+        return [user_id for user_id in users if _modified_since([self.profile_path(user_id)], since)]
+
+
+class EventLogProfileStore(ProfileStore):
+    """
+    追加写事件日志后端
+
+    每个用户由一份快照 `<user_id>.json`（与 JSONProfileStore 格式兼容，额外带 event_seq）
+    和一份追加日志 `<user_id>.log.jsonl` 组成。每次修改只向日志追加几行，代价与历史长度无关；
+    日志超过 compact_every 条后在后台线程中重放并生成新快照。
+
+    压缩时先把当前日志改名为 `.compacting`（新事件继续写入新日志），再离线重放生成快照，
+    事件按 seq 去重，任何一步崩溃都不会丢失或重复应用事件。
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data/user_profiles",
+        compact_every: int = 1000,
+        fsync: bool = True,
+        background: bool = True,
+        state_cache_size: int = 10000
+    ):
+        """
+        Args:
+            data_dir: 存储目录
+            compact_every: 日志累计多少条事件后触发压缩（0表示不自动压缩）
+            fsync: 追加后是否 fsync
+            background: 是否在后台线程压缩（False 时在写入线程同步压缩）
+            state_cache_size: 缓存日志状态（下一个 seq 与日志事件数）的用户数，
+                超出时淘汰最久未用的，再次写入时从快照与日志重新得到
+        """
+        self.data_dir = data_dir
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.background = background
+        self.state_cache_size = state_cache_size
+        os.makedirs(data_dir, exist_ok=True)
+
+        self._guard = threading.Lock()
+        # 每个用户的锁不再被引用时自动回收，日志状态缓存有上限：存储实例为进程共享，不随用户数无限增长
+        self._user_locks = KeyedLocks(threading.Lock)
+        self._compact_locks = KeyedLocks(threading.Lock)
+        self._log_states: "OrderedDict[str, List[int]]" = OrderedDict()  # user_id -> [下一个 seq, 快照之后的日志事件数]
+        self._compacting = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-compact")
+
+    def snapshot_path(self, user_id: str) -> str:
+        return os.path.join(self.data_dir, f"{user_id}.json")
+
+    def log_path(self, user_id: str) -> str:
+        return os.path.join(self.data_dir, f"{user_id}.log.jsonl")
+
+    def _compacting_path(self, user_id: str) -> str:
+        return self.log_path(user_id) + ".compacting"
+
+    @staticmethod
+    def _lock_for(user_id: str, table: KeyedLocks) -> threading.Lock:
+        return table.get(user_id)
+
+    def _remember_state(self, user_id: str, next_seq: int, log_count: int) -> List[int]:
+        """缓存用户的日志状态（调用方需持有该用户的锁）"""
+        state = [next_seq, log_count]
+        with self._guard:
+            self._log_states[user_id] = state
+            self._log_states.move_to_end(user_id)
+            while len(self._log_states) > self.state_cache_size:
+                self._log_states.popitem(last=False)
+        return state
+
+    def _log_state(self, user_id: str) -> List[int]:
+        """
+        用户的日志状态 [下一个 seq, 快照之后的日志事件数]（调用方需持有该用户的锁，可原地修改）；
+        不在缓存中时从快照与日志重新得到
+        """
+        with self._guard:
+            state = self._log_states.get(user_id)
+            if state is not None:
+                self._log_states.move_to_end(user_id)
+                return state
+        _, seq, replayed = self._replay(user_id)
+        return self._remember_state(user_id, seq + 1, replayed)
+
+    @staticmethod
+    def _read_events(path: str) -> List[Dict]:
+        events = []
+        if not os.path.exists(path):
+            return events
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 崩溃可能留下半行，丢弃即可（该事件未被确认写入）
+                    continue
+        return events
+
+    def _replay(self, user_id: str):
+        """
+        从快照与日志重建画像
+
+        Returns:
+            (画像或None, 最大seq, 快照之后的日志事件数)
+        """
+        profile = None
+        snapshot_path = self.snapshot_path(user_id)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        seq = profile.get("event_seq", 0) if profile else 0
+
+        replayed = 0
+        for path in (self._compacting_path(user_id), self.log_path(user_id)):
+            for event in self._read_events(path):
+                event_seq = event.get("seq", 0)
+                if event_seq <= seq or profile is None:
+                    continue
+                apply_event(profile, event)
+                seq = event_seq
+                replayed += 1
+        if profile is not None:
+            profile["event_seq"] = seq
+        return profile, seq, replayed
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        with self._lock_for(user_id, self._user_locks):
+            profile, seq, replayed = self._replay(user_id)
+            self._remember_state(user_id, seq + 1, replayed)
+            return profile
+
+    def save_snapshot(self, user_id: str, profile: Dict):
+        # 与后台压缩互斥，避免压缩用旧状态覆盖这次写入的快照
+        with self._lock_for(user_id, self._compact_locks), \
+                self._lock_for(user_id, self._user_locks):
+            state = self._log_state(user_id)
+            snapshot = persisted_profile(profile)
+            snapshot["event_seq"] = state[0] - 1
+            atomic_write_json(self.snapshot_path(user_id), snapshot)
+            # 快照已覆盖全部事件，旧日志可以丢弃
+            for path in (self._compacting_path(user_id), self.log_path(user_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+            state[1] = 0
+
+    def append_events(self, user_id: str, profile: Dict, events: List[Dict]):
+        if not events:
+            return
+        with self._lock_for(user_id, self._user_locks):
+            state = self._log_state(user_id)
+
+            if not os.path.exists(self.snapshot_path(user_id)):
+                # 新用户：内存画像已包含这些事件，直接写一份初始快照
+                state[0] += len(events)
+                snapshot = persisted_profile(profile)
+                snapshot["event_seq"] = state[0] - 1
+                atomic_write_json(self.snapshot_path(user_id), snapshot)
+                return
+
+            lines = []
+            for event in events:
+                record = dict(event)
+                record["seq"] = state[0]
+                state[0] += 1
+                lines.append(json.dumps(record, ensure_ascii=False))
+            with open(self.log_path(user_id), 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+            state[1] += len(events)
+            should_compact = (
+                self.compact_every
+                and state[1] >= self.compact_every
+                and user_id not in self._compacting
+            )
+            if should_compact:
+                self._compacting.add(user_id)
+
+        if should_compact:
+            if self.background:
+                self._executor.submit(self._compact_safely, user_id)
+            else:
+                self._compact_safely(user_id)
+
+    def compact(self, user_id: str):
+        """立即压缩指定用户的日志"""
+        with self._lock_for(user_id, self._user_locks):
+            self._compacting.add(user_id)
+        self._compact_safely(user_id)
+
+    def _compact_safely(self, user_id: str):
+        try:
+            self._compact(user_id)
+        except Exception as e:
+            print(f"⚠️  画像日志压缩失败({user_id}): {e}")
+        finally:
+            with self._lock_for(user_id, self._user_locks):
+                self._compacting.discard(user_id)
+
+    def _compact(self, user_id: str):
+        with self._lock_for(user_id, self._compact_locks):
+            log_path = self.log_path(user_id)
+            compacting_path = self._compacting_path(user_id)
+
+            # 轮转日志：之后的追加写入新日志，不会被本次压缩阻塞
+            with self._lock_for(user_id, self._user_locks):
+                if os.path.exists(log_path):
+                    if os.path.exists(compacting_path):
+                        with open(log_path, 'r', encoding='utf-8') as src, \
+                                open(compacting_path, 'a', encoding='utf-8') as dst:
+                            dst.write(src.read())
+                        os.remove(log_path)
+                    else:
+                        os.replace(log_path, compacting_path)
+                with self._guard:
+                    state = self._log_states.get(user_id)
+                if state is not None:
+                    state[1] = 0
+
+            if not os.path.exists(compacting_path):
+                return
+
+            # 只重放快照 + 轮转出的日志，生成新快照
+            profile = None
+            snapshot_path = self.snapshot_path(user_id)
+            if os.path.exists(snapshot_path):
+                with open(snapshot_path, 'r', encoding='utf-8') as f:
+                    profile = json.load(f)
+            if profile is None:
+                return
+            seq = profile.get("event_seq", 0)
+            for event in self._read_events(compacting_path):
+                if event.get("seq", 0) > seq:
+                    apply_event(profile, event)
+                    seq = event["seq"]
+            profile["event_seq"] = seq
+
+            atomic_write_json(snapshot_path, persisted_profile(profile))
+            os.remove(compacting_path)
+
+    def list_users(self) -> List[str]:
+        return _list_json_users(self.data_dir)
+
+    def updated_users(self, since: Optional[float] = None) -> List[str]:
+        users = self.list_users()
+        if since is None:
+            return users
+        return [
+            user_id for user_id in users
+            if _modified_since(
+                [self.snapshot_path(user_id), self.log_path(user_id), self._compacting_path(user_id)], since
+            )
+        ]
+
+    def wait_for_compaction(self):
+        """阻塞直到已排队的后台压缩全部完成"""
+        self._executor.submit(lambda: None).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+_STORE_TYPES = {
+    "json": JSONProfileStore,
+    "eventlog": EventLogProfileStore,
+}
+
+_stores: Dict[tuple, ProfileStore] = {}
+_stores_lock = threading.Lock()
+
+
+def default_db_path(data_dir: str = "data/user_profiles") -> str:
+    """sqlite 后端的数据库路径：环境变量 PROFILE_DB_PATH，默认为 <画像目录>/profiles.db"""
+    return os.getenv("PROFILE_DB_PATH") or os.path.join(data_dir, "profiles.db")
+
+
+def get_profile_store(kind: Optional[str] = None, data_dir: str = "data/user_profiles") -> ProfileStore:
+    """
+    获取进程内共享的存储后端实例
+
+    Args:
+        kind: 后端类型（json / eventlog / sqlite，默认从环境变量 PROFILE_STORE 读取）
+        data_dir: 存储目录
+
+    Returns:
+        存储后端
+    """
+    kind = (kind or os.getenv("PROFILE_STORE", "json")).lower()
+    key = (kind, os.path.abspath(data_dir))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if kind == "sqlite":
+                from .sqlite_store import SQLiteProfileStore
+                store = SQLiteProfileStore(default_db_path(data_dir))
+            elif kind in _STORE_TYPES:
+                store = _STORE_TYPES[kind](data_dir)
+            else:
+                raise ValueError(f"未知的画像存储后端: {kind}")
+            _stores[key] = store
+        return store
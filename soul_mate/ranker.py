@@ -0,0 +1,247 @@
+"""
+候选项本地预排序模块
+在把候选项交给LLM之前，用向量化的打分模型（NumPy）排序并截取前N个，缩短推荐提示词
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .cache import normalize_text
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u9fff\uf900-\ufaff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词：英文与数字按单词切分，中文按相邻两字（bigram）切分，单个汉字保留为一个词
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        词列表（保留重复，用于统计词频）
+    """
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(normalize_text(text)):
+        if len(run) == 1 or run[0].isascii():
+            tokens.append(run)
+        else:
+            tokens.extend(map(str.__add__, run[:-1], run[1:]))
+    return tokens
+
+
+def _document(item: Dict) -> str:
+    # 标题重复一次，提高标题中词的权重
+    return f"{item.get('title', '')} {item.get('title', '')} {item.get('description', '')}"
+
+
+def _scale(scores: np.ndarray) -> np.ndarray:
+    """把非负分数缩放到 [0, 1]，全为 0 时保持不变"""
+    peak = scores.max() if scores.size else 0.0
+    return scores / peak if peak > 0 else scores
+
+
+class CandidateRanker:
+    """
+    候选项预排序器
+
+    每个候选项的得分由以下几部分加权组成：
+    - 请求相关度：查询词对 标题+描述 的 BM25 得分
+    - 画像相关度：画像中的主题与类型对 标题+描述 的 BM25 得分
+    - 作者匹配：候选项作者在画像的作者列表中
+    - 不喜欢惩罚：与不喜欢的项目标题相同，或与它们的 BM25 加权词向量余弦相似度较高
+    - 口味相似度：候选项向量与用户口味向量（见 taste.py）的余弦相似度，可为负
+    前四部分先缩放到 [0, 1]；得分相同的候选项保持原来的顺序（来源顺序）
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        query_weight: float = 1.0,
+        profile_weight: float = 0.5,
+        author_weight: float = 0.3,
+        dislike_weight: float = 1.0,
+        taste_weight: float = 0.5
+    ):
+        self.k1 = k1
+        self.b = b
+        self.query_weight = query_weight
+        self.profile_weight = profile_weight
+        self.author_weight = author_weight
+        self.dislike_weight = dislike_weight
+        self.taste_weight = taste_weight
+
+    def score(
+        self,
+        candidates: List[Dict],
+        query: str,
+        preferences: Optional[Dict] = None,
+        disliked: Optional[List[Dict]] = None,
+        taste: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        计算候选项得分
+
+        Args:
+            candidates: 候选项列表
+            query: 请求文本（分析得到的主题与原始输入）
+            preferences: 用户偏好（genres/topics/authors）
+            disliked: 不喜欢的项目（包含 title/description）
+            taste: 用户口味向量（UserProfile.get_taste_vector()），None 表示不使用
+
+        Returns:
+            与 candidates 等长的得分数组
+        """
+        n = len(candidates)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        preferences = preferences or {}
+        disliked = disliked or []
+
+        # 词表与词频矩阵
+        vocab: Dict[str, int] = {}
+        rows, cols, counts = [], [], []
+        for row, item in enumerate(candidates):
+            for token, count in Counter(tokenize(_document(item))).items():
+                rows.append(row)
+                cols.append(vocab.setdefault(token, len(vocab)))
+                counts.append(count)
+        tf = np.zeros((n, max(len(vocab), 1)), dtype=np.float32)
+        tf[rows, cols] = counts
+
+        # BM25 权重矩阵：每个候选项中每个词的贡献
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        lengths = tf.sum(axis=1)
+        avg_length = lengths.mean() or 1.0
+        denominator = tf + self.k1 * (1 - self.b + self.b * lengths / avg_length)[:, None]
+        weights = tf * (self.k1 + 1) / np.maximum(denominator, 1e-9) * idf
+
+        scores = self.query_weight * _scale(weights @ self._query_vector(tokenize(query), vocab))
+
+        profile_terms = list(preferences.get("topics", [])) + list(preferences.get("genres", []))
+        if profile_terms:
+            profile_vector = self._query_vector(tokenize(" ".join(profile_terms)), vocab)
+            scores += self.profile_weight * _scale(weights @ profile_vector)
+
+        authors = {normalize_text(author) for author in preferences.get("authors", []) if author}
+        if authors:
+            matches = np.fromiter(
+                (normalize_text(item.get("author") or "") in authors for item in candidates), dtype=bool, count=n
+            )
+            scores += self.author_weight * matches
+
+        if disliked:
+            scores -= self.dislike_weight * self._dislike_penalty(candidates, disliked, weights, vocab)
+
+        if taste is not None and self.taste_weight:
+            # taste 依赖 embeddings，而 embeddings 依赖本模块的 tokenize，这里延迟导入
+            from .taste import taste_scores
+            scores += self.taste_weight * taste_scores(candidates, taste)
+        return scores
+
+    @staticmethod
+    def _query_vector(tokens: Iterable[str], vocab: Dict[str, int]) -> np.ndarray:
+        vector = np.zeros(max(len(vocab), 1), dtype=np.float32)
+        for token in tokens:
+            column = vocab.get(token)
+            if column is not None:
+                vector[column] += 1.0
+        return vector
+
+    @staticmethod
+    def _dislike_penalty(
+        candidates: List[Dict],
+        disliked: List[Dict],
+        weights: np.ndarray,
+        vocab: Dict[str, int]
+    ) -> np.ndarray:
+        """与不喜欢的项目标题相同记 1，否则为与不喜欢项目整体的余弦相似度"""
+        titles = {normalize_text(item.get("title") or "") for item in disliked} - {""}
+        exact = np.fromiter(
+            (normalize_text(item.get("title") or "") in titles for item in candidates),
+            dtype=np.float32, count=len(candidates)
+        )
+        disliked_vector = CandidateRanker._query_vector(
+            (token for item in disliked for token in tokenize(_document(item))), vocab
+        )
+        norms = np.linalg.norm(weights, axis=1) * (np.linalg.norm(disliked_vector) or 1.0)
+        similarity = (weights @ disliked_vector) / np.maximum(norms, 1e-9)
+        return np.maximum(exact, similarity)
+
+    def rank(
+        self,
+        candidates: List[Dict],
+        query: str,
+        preferences: Optional[Dict] = None,
+        disliked: Optional[List[Dict]] = None,
+        top_n: Optional[int] = None,
+        taste: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        按得分排序候选项
+
+        Args:
+            candidates: 候选项列表
+            query: 请求文本
+            preferences: 用户偏好
+            disliked: 不喜欢的项目
+            top_n: 只保留前N个，None 表示全部保留
+            taste: 用户口味向量
+
+        Returns:
+            排序（并截取）后的候选项列表
+        """
+        if not candidates:
+            return []
+        scores = self.score(candidates, query, preferences, disliked, taste)
+        order = np.argsort(-scores, kind="stable")
+        if top_n is not None:
+            order = order[:max(top_n, 0)]
+        return [candidates[i] for i in order]
+
+
+def item_key(item: Dict) -> tuple:
+    """判断不同来源的结果是否为同一内容：类型 + 规范化后的标题与作者"""
+    return (
+        item.get("type"),
+        normalize_text(item.get("title") or ""),
+        normalize_text(item.get("author") or ""),
+    )
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: float = 60.0) -> List[Dict]:
+    """
+    倒数排名融合（RRF）：每条结果的得分为它在各列表中 1/(k+名次) 之和
+
+    同一内容（见 item_key）出现在多个列表中时得分累加，保留第一次出现的条目；
+    得分相同时按列表顺序与列表内名次排列
+
+    Args:
+        result_lists: 各来源的结果列表（按来源内的相关度排列）
+        k: 平滑常数，越大名次差异的影响越小
+
+    Returns:
+        融合后的结果列表
+    """
+    scores: Dict[tuple, float] = {}
+    items: Dict[tuple, Dict] = {}
+    for results in result_lists:
+        for rank, item in enumerate(results, 1):
+            key = item_key(item)
+            items.setdefault(key, item)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    # sorted 是稳定排序：得分相同的条目保持首次出现的顺序
+    return [items[key] for key in sorted(items, key=lambda key: -scores[key])]
+
+
+def truncate_text(text: str, limit: int) -> str:
+    """按字符数截断文本，limit <= 0 表示不截断"""
+    if not text or limit <= 0 or len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "…"
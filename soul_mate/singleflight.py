@@ -0,0 +1,150 @@
+"""
+请求合并（single-flight）模块
+同一个键同时只执行一次：执行期间到达的相同调用等待这次执行，共享它的结果或异常。
+SingleFlight 用于多线程（Flask 后端），AsyncSingleFlight 用于事件循环（ASGI 后端）
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    线程版请求合并
+
+    用法:
+        flight = SingleFlight()
+        value, shared = flight.do(key, lambda: load(key))
+        # shared 为 True 表示结果来自其他线程的执行，可变对象需要自行复制
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """
+        执行 fn，或等待同一个键正在进行的执行
+
+        Args:
+            key: 合并键
+            fn: 实际执行的函数
+            timeout: 等待其他线程执行的最长时间（秒），None 表示一直等待
+
+        Returns:
+            (结果, 是否共享了其他线程的执行)
+
+        Raises:
+            TimeoutError: 等待超时（只在共享执行时发生）
+            fn 抛出的异常（共享执行时为同一个异常）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("等待相同请求的结果超时")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "executions": self.executions, "shared": self.shared}
+
+
+def _retrieve_exception(future: asyncio.Future):
+    # 所有等待方都被取消时，避免 "Task exception was never retrieved" 警告
+    if not future.cancelled():
+        future.exception()
+
+
+class AsyncSingleFlight:
+    """
+    事件循环版请求合并
+
+    执行放在独立的任务中，等待方被取消不会中断执行，其他等待方仍能拿到结果；
+    任务绑定在事件循环上，不同事件循环中的相同键互不合并
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 事件循环（弱引用）-> 键 -> 进行中的任务
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.executions = 0
+        self.shared = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[T]],
+        timeout: Optional[float] = None
+    ) -> Tuple[T, bool]:
+        """
+        执行 factory() 返回的协程，或等待同一个键正在进行的执行
+
+        参数与返回值见 SingleFlight.do；等待超时抛出 TimeoutError
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._calls.setdefault(loop, {})
+            task = calls.get(key)
+            leader = task is None
+            if leader:
+                task = calls[key] = asyncio.ensure_future(factory())
+                task.add_done_callback(lambda done: self._forget(calls, key, done))
+                task.add_done_callback(_retrieve_exception)
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if leader:
+            return await asyncio.shield(task), False
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout), True
+        except asyncio.TimeoutError as e:
+            raise TimeoutError("等待相同请求的结果超时") from e
+
+    def _forget(self, calls: Dict[Hashable, asyncio.Future], key: Hashable, task: asyncio.Future):
+        with self._lock:
+            if calls.get(key) is task:
+                del calls[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = sum(len(calls) for calls in self._calls.values())
+            return {"in_flight": in_flight, "executions": self.executions, "shared": self.shared}
@@ -0,0 +1,326 @@
+"""
+SQLite 画像存储模块
+多用户后端部署使用：所有用户存放在一个 WAL 模式的数据库中，反馈与阅读历史分表并建索引
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from .profile_events import EVENT_FEEDBACK, EVENT_HISTORY, index_feedback, persisted_profile
+from .profile_store import ProfileStore, default_db_path
+
+
+# profiles 表中单独成列的字段，其余字段整体存入 extra
+_PROFILE_COLUMNS = ("user_id", "created_at", "updated_at", "preferences", "interaction_count")
+_COLLECTION_KEYS = ("reading_history", "feedback")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    created_at TEXT,
+    updated_at TEXT,
+    preferences TEXT NOT NULL,
+    interaction_count INTEGER NOT NULL DEFAULT 0,
+    extra TEXT,
+    written_at REAL
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    liked INTEGER NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_user_liked ON feedback (user_id, liked, id);
+CREATE INDEX IF NOT EXISTS idx_feedback_user_item ON feedback (user_id, item_id);
+CREATE TABLE IF NOT EXISTS reading_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_user ON reading_history (user_id, id);
+"""
+
+# 旧版本数据库缺少的列：(列名, 定义)
+_PROFILE_MIGRATIONS = (("written_at", "REAL"),)
+
+
+class SQLiteConnectionPool:
+    """线程安全的 SQLite 连接池"""
+
+    def __init__(self, db_path: str, size: int = 8, timeout: float = 30.0):
+        """
+        Args:
+            db_path: 数据库文件路径
+            size: 连接池大小
+            timeout: 获取连接及等待数据库锁的超时秒数
+        """
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """借出一个连接，用完自动归还"""
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+        conn = None
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                reserved = self._created < self.size
+                if reserved:
+                    self._created += 1
+            if reserved:
+                # 在锁外建立连接（等待数据库锁时不阻塞其他线程）；失败时归还名额，否则池子会永久缺少这个连接
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._pool.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """在一个写事务中执行，异常时回滚"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SQLiteProfileStore(ProfileStore):
+    """
+    SQLite 画像存储后端
+
+    load() 只读取 profiles 表中的一行；阅读历史与反馈按需加载，
+    最近喜欢的内容通过 (user_id, liked, id) 索引的 LIMIT 查询获得
+    """
+
+    lazy_collections = True
+
+    def __init__(self, db_path: Optional[str] = None, pool_size: int = 8):
+        """
+        Args:
+            db_path: 数据库文件路径（默认见 default_db_path，与服务进程使用的数据库一致）
+            pool_size: 连接池大小
+        """
+        db_path = db_path or default_db_path()
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.pool = SQLiteConnectionPool(db_path, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+            for column, definition in _PROFILE_MIGRATIONS:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE profiles ADD COLUMN {column} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_written ON profiles (written_at)")
+
+    @staticmethod
+    def _profile_row(profile: Dict) -> tuple:
+        extra = {
+            k: v for k, v in profile.items()
+            if k not in _PROFILE_COLUMNS and k not in _COLLECTION_KEYS
+        }
+        return (
+            profile["user_id"],
+            profile.get("created_at"),
+            profile.get("updated_at"),
+            json.dumps(profile.get("preferences", {}), ensure_ascii=False),
+            profile.get("interaction_count", 0),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+            time.time(),
+        )
+
+    @staticmethod
+    def _upsert_profile(conn: sqlite3.Connection, profile: Dict):
+        conn.execute(
+            """
+            INSERT INTO profiles (user_id, created_at, updated_at, preferences, interaction_count, extra, written_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                updated_at = excluded.updated_at,
+                preferences = excluded.preferences,
+                interaction_count = excluded.interaction_count,
+                extra = excluded.extra,
+                written_at = excluded.written_at
+            """,
+            SQLiteProfileStore._profile_row(profile),
+        )
+
+    @staticmethod
+    def _insert_feedback(conn: sqlite3.Connection, user_id: str, item_id: str, liked: bool, entry: Dict):
+        # 同一项目只保留最新一条反馈（同时从相反的列表中移除）
+        conn.execute(
+            "DELETE FROM feedback WHERE user_id = ? AND item_id = ?",
+            (user_id, item_id),
+        )
+        conn.execute(
+            "INSERT INTO feedback (user_id, item_id, liked, entry) VALUES (?, ?, ?, ?)",
+            (user_id, item_id, 1 if liked else 0, json.dumps(entry, ensure_ascii=False)),
+        )
+
+    def _write_collections(self, conn: sqlite3.Connection, user_id: str, profile: Dict):
+        # 先建立索引形式再还原，顺带合并旧数据中的重复反馈
+        profile = persisted_profile(index_feedback(dict(profile)))
+        conn.execute("DELETE FROM feedback WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM reading_history WHERE user_id = ?", (user_id,))
+        feedback = profile.get("feedback", {})
+        rows = [
+            (user_id, str(entry.get("item_id", "")), liked, json.dumps(entry, ensure_ascii=False))
+            for key, liked in (("liked", 1), ("disliked", 0))
+            for entry in feedback.get(key, [])
+        ]
+        conn.executemany(
+            "INSERT INTO feedback (user_id, item_id, liked, entry) VALUES (?, ?, ?, ?)", rows
+        )
+        conn.executemany(
+            "INSERT INTO reading_history (user_id, item) VALUES (?, ?)",
+            [(user_id, json.dumps(item, ensure_ascii=False)) for item in profile.get("reading_history", [])],
+        )
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT user_id, created_at, updated_at, preferences, interaction_count, extra "
+                "FROM profiles WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        profile = json.loads(row[5]) if row[5] else {}
+        profile.update({
+            "user_id": row[0],
+            "created_at": row[1],
+            "updated_at": row[2],
+            "preferences": json.loads(row[3]),
+            "interaction_count": row[4],
+        })
+        return profile
+
+    def load_collections(self, user_id: str) -> Dict:
+        with self.pool.connection() as conn:
+            history = [
+                json.loads(item) for (item,) in conn.execute(
+                    "SELECT item FROM reading_history WHERE user_id = ? ORDER BY id", (user_id,)
+                )
+            ]
+            feedback = {"liked": [], "disliked": []}
+            for liked, entry in conn.execute(
+                "SELECT liked, entry FROM feedback WHERE user_id = ? ORDER BY id", (user_id,)
+            ):
+                feedback["liked" if liked else "disliked"].append(json.loads(entry))
+        return {"reading_history": history, "feedback": feedback}
+
+    def recent_feedback(self, user_id: str, liked: bool, limit: int) -> List[Dict]:
+        if limit <= 0:
+            return []
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT entry FROM feedback WHERE user_id = ? AND liked = ? ORDER BY id DESC LIMIT ?",
+                (user_id, 1 if liked else 0, limit),
+            ).fetchall()
+        return [json.loads(entry) for (entry,) in reversed(rows)]
+
+    def save_snapshot(self, user_id: str, profile: Dict):
+        with self.pool.transaction() as conn:
+            self._upsert_profile(conn, profile)
+            if "feedback" in profile:
+                self._write_collections(conn, user_id, profile)
+
+    def append_events(self, user_id: str, profile: Dict, events: List[Dict]):
+        if not events:
+            return
+        with self.pool.transaction() as conn:
+            # 标量字段与偏好直接取内存中的最新值，列表类事件逐条落到对应表
+            self._upsert_profile(conn, profile)
+            for event in events:
+                op = event.get("op")
+                if op == EVENT_FEEDBACK:
+                    self._insert_feedback(conn, user_id, event["item_id"], event["liked"], event["entry"])
+                elif op == EVENT_HISTORY:
+                    conn.execute(
+                        "INSERT INTO reading_history (user_id, item) VALUES (?, ?)",
+                        (user_id, json.dumps(event["item"], ensure_ascii=False)),
+                    )
+
+    def import_profiles(self, profiles: Iterable[Dict]) -> int:
+        """
+        在单个事务中批量导入完整画像（已存在的用户会被覆盖）
+
+        Returns:
+            导入的画像数量
+        """
+        count = 0
+        with self.pool.transaction() as conn:
+            for profile in profiles:
+                self._upsert_profile(conn, profile)
+                self._write_collections(conn, profile["user_id"], profile)
+                count += 1
+        return count
+
+    def list_users(self) -> List[str]:
+        with self.pool.connection() as conn:
+            return [user_id for (user_id,) in conn.execute("SELECT user_id FROM profiles ORDER BY user_id")]
+
+    def updated_users(self, since: Optional[float] = None) -> List[str]:
+        # 按写入数据库的时间（written_at）判断：写回模式下 updated_at 是内存中修改的时间，可能早于实际写入
+        if since is None:
+            return self.list_users()
+        with self.pool.connection() as conn:
+            return [
+                user_id for (user_id,) in conn.execute(
+                    "SELECT user_id FROM profiles WHERE written_at > ? ORDER BY user_id", (since,)
+                )
+            ]
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,193 @@
+"""
+用户口味向量模块
+把用户反馈过的项目向量按时间衰减加权求和，得到一个紧凑的偏好向量：喜欢记正、不喜欢记负，
+半衰期之前的反馈权重减半。每次反馈 O(d) 增量更新（同一项目的旧反馈先按衰减后的权重扣除，
+与"同一项目只保留最新反馈"一致），候选项打分只需一次矩阵-向量乘法，不需要调用LLM
+"""
+
+import base64
+import math
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .embeddings import document_text, get_encoder, normalize
+
+
+# 画像中保存口味向量的字段
+TASTE_KEY = "taste"
+
+# 保存到画像时的向量格式：小端 float32 的 base64（相对精度约7位，衰减后数值很小时仍然有效）
+_VECTOR_DTYPE = "<f4"
+
+
+def taste_enabled() -> bool:
+    """是否维护口味向量（环境变量 PROFILE_TASTE，默认开启）"""
+    return os.getenv("PROFILE_TASTE", "1").lower() in ("1", "true", "yes")
+
+
+def _settings(encoder) -> Dict:
+    """决定口味向量含义的配置，任一项变化时需要从反馈重建"""
+    return {
+        "encoder": encoder.name,
+        "dim": encoder.dim,
+        "half_life_days": float(os.getenv("PROFILE_TASTE_HALF_LIFE_DAYS", "30")),
+        "dislike_weight": float(os.getenv("PROFILE_TASTE_DISLIKE_WEIGHT", "1.0")),
+    }
+
+
+def _parse_time(timestamp: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(timestamp) if timestamp else None
+    except ValueError:
+        return None
+
+
+def _decay(settings: Dict, start: Optional[datetime], end: Optional[datetime]) -> float:
+    """从 start 到 end 的衰减系数（时间缺失或倒退时不衰减）"""
+    half_life = settings["half_life_days"] * 86400
+    if start is None or end is None or half_life <= 0 or end <= start:
+        return 1.0
+    return math.pow(0.5, (end - start).total_seconds() / half_life)
+
+
+def _item_vector(encoder, entry: Dict) -> np.ndarray:
+    """反馈条目（标题、作者、标签、简介）的单位向量；没有文本时为零向量"""
+    return normalize(np.asarray(encoder.encode([document_text(entry)]), dtype=np.float32))[0]
+
+
+def _sign(settings: Dict, liked: bool) -> float:
+    return 1.0 if liked else -settings["dislike_weight"]
+
+
+def _store(taste: Dict, vector: np.ndarray, at: Optional[datetime]):
+    taste["vector"] = base64.b64encode(np.asarray(vector, dtype=_VECTOR_DTYPE).tobytes()).decode("ascii")
+    taste["at"] = at.isoformat() if at else None
+
+
+def _load(taste: Dict, dim: int) -> np.ndarray:
+    """读取保存的向量，没有时为零向量"""
+    if not taste.get("vector"):
+        return np.zeros(dim, dtype=np.float64)
+    return np.frombuffer(base64.b64decode(taste["vector"]), dtype=_VECTOR_DTYPE).astype(np.float64)
+
+
+def taste_stale(profile: Dict, encoder=None) -> bool:
+    """画像缺少口味向量（旧画像或停用期间有过反馈），或向量的编码器、衰减配置与当前不一致"""
+    if TASTE_KEY not in profile:
+        return True
+    taste = profile[TASTE_KEY]
+    if taste is None:
+        return False
+    settings = _settings(encoder or get_encoder())
+    return any(taste.get(key) != value for key, value in settings.items())
+
+
+def rebuild_taste(profile: Dict, encoder=None) -> Optional[Dict]:
+    """
+    从索引形式的反馈列表重建口味向量（原地写入画像），O(反馈数 * d)
+
+    Returns:
+        新的口味向量状态；画像没有加载反馈列表时返回 None（不修改画像）
+    """
+    feedback = profile.get("feedback")
+    if feedback is None or not isinstance(feedback.get("liked"), dict):
+        return None
+    encoder = encoder or get_encoder()
+    settings = _settings(encoder)
+    entries = [
+        (_parse_time(entry.get("timestamp")), liked, entry)
+        for key, liked in (("liked", True), ("disliked", False))
+        for entry in feedback[key].values()
+    ]
+    times = [at for at, _, _ in entries if at is not None]
+    latest = max(times) if times else None
+    vector = np.zeros(encoder.dim, dtype=np.float64)
+    for at, liked, entry in entries:
+        vector += _sign(settings, liked) * _decay(settings, at, latest) * _item_vector(encoder, entry)
+    taste = dict(settings)
+    _store(taste, vector, latest)
+    profile[TASTE_KEY] = taste
+    return taste
+
+
+def update_taste(
+    profile: Dict,
+    liked: bool,
+    entry: Dict,
+    previous: Optional[Dict] = None,
+    previous_liked: Optional[bool] = None
+):
+    """
+    应用一条反馈（在反馈列表修改之前调用，原地修改画像）
+
+    画像中的向量是截至 taste["at"] 的值：先整体衰减到本次反馈的时间，扣除同一项目旧反馈
+    衰减后的贡献，再加上本次反馈。缺少向量或配置变化时先从反馈列表重建
+
+    Args:
+        profile: 画像数据（反馈为索引形式）
+        liked: 是否喜欢
+        entry: 本次反馈条目
+        previous: 同一项目之前的反馈条目（没有则为 None）
+        previous_liked: 之前的反馈是否为喜欢
+    """
+    if not taste_enabled():
+        # 停用期间的反馈不会计入，重新启用时从反馈列表重建
+        profile.pop(TASTE_KEY, None)
+        return
+    encoder = get_encoder()
+    settings = _settings(encoder)
+    if taste_stale(profile, encoder):
+        taste = rebuild_taste(profile, encoder)
+        if taste is None:
+            return
+    else:
+        taste = profile[TASTE_KEY] or dict(settings, vector=None, at=None)
+
+    now = _parse_time(entry.get("timestamp"))
+    last = _parse_time(taste.get("at"))
+    if now is None or (last is not None and now < last):
+        now = last
+    vector = _load(taste, encoder.dim) * _decay(settings, last, now)
+    if previous is not None:
+        vector -= (
+            _sign(settings, previous_liked) * _decay(settings, _parse_time(previous.get("timestamp")), now)
+            * _item_vector(encoder, previous)
+        )
+    vector += _sign(settings, liked) * _item_vector(encoder, entry)
+    _store(taste, vector, now)
+    profile[TASTE_KEY] = taste
+
+
+def taste_vector(profile: Dict, encoder=None) -> Optional[np.ndarray]:
+    """
+    画像中的口味向量（单位向量）
+
+    Returns:
+        float32 单位向量；没有反馈、向量为零或与当前编码器不一致时返回 None
+    """
+    taste = profile.get(TASTE_KEY)
+    if not taste:
+        return None
+    encoder = encoder or get_encoder()
+    if taste.get("encoder") != encoder.name or taste.get("dim") != encoder.dim:
+        return None
+    vector = _load(taste, encoder.dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 1e-12 else None
+
+
+def taste_scores(candidates: List[Dict], vector: np.ndarray, encoder=None) -> np.ndarray:
+    """
+    候选项与口味向量的余弦相似度：候选项编码为矩阵后与口味向量做一次矩阵-向量乘法
+
+    Returns:
+        与 candidates 等长的 float32 数组，范围 [-1, 1]
+    """
+    if not candidates:
+        return np.zeros(0, dtype=np.float32)
+    encoder = encoder or get_encoder()
+    matrix = normalize(np.asarray(encoder.encode([document_text(item) for item in candidates]), dtype=np.float32))
+    return matrix @ np.asarray(vector, dtype=np.float32)
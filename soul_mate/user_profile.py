@@ -3,65 +3,248 @@
 负责用户偏好的存储、更新和查询
 """
 
-import json
+import atexit
 import os
+import threading
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Dict, List, Optional
 
+import numpy as np
+
+from .profile_events import (
+    EVENT_FEEDBACK,
+    EVENT_HISTORY,
+    EVENT_INTERACTION,
+    EVENT_PREFERENCES,
+    apply_event,
+    default_profile,
+    index_feedback,
+    make_event,
+    recent_entries,
+)
+from .locks import KeyedLocks
+from .profile_store import ProfileStore, get_profile_store
+from .taste import rebuild_taste, taste_enabled, taste_stale, taste_vector
+
+
+# 同一用户（同一数据目录）的所有 UserProfile 实例共享一把锁：修改、读取与写入存储互斥，不同用户互不影响
+_profile_locks = KeyedLocks()
+
+# 批量修改的归属：按执行上下文区分。线程各自有独立的上下文；asyncio.to_thread 在线程中沿用调用方协程的上下文，
+# 异步 Agent 放到线程中执行的画像操作因此仍属于该请求的批量
+_batch_owner_var: ContextVar[Optional[object]] = ContextVar("profile_batch_owner", default=None)
+
+
+def _batch_owner() -> object:
+    """当前上下文的批量归属标识（首次使用时创建）"""
+    owner = _batch_owner_var.get()
+    if owner is None:
+        owner = object()
+        _batch_owner_var.set(owner)
+    return owner
+
+
+# 写回模式下仍有未落盘修改的画像，进程退出时统一刷盘
+_write_behind_profiles = weakref.WeakSet()
+
+# 仍在使用中的画像实例（弱引用）：同一用户只保留一份内存中的画像，见 get_user_profile
+_live_profiles: "weakref.WeakValueDictionary[tuple, UserProfile]" = weakref.WeakValueDictionary()
+_live_profiles_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_all_profiles():
+    for profile in list(_write_behind_profiles):
+        try:
+            profile.flush()
+        except Exception as e:
+            print(f"⚠️  用户画像刷盘失败: {e}")
+
 
 class UserProfile:
-    """用户画像类"""
+    """
+    用户画像类
     
-    def __init__(self, user_id: str, data_dir: str = "data/user_profiles"):
+    线程安全：每次修改（包括"不存在才追加"这类先读后写的操作）与落盘都在该用户的锁内完成，
+    读取方法返回副本，多个线程同时操作同一用户不会丢失修改或写出损坏的文件
+    """
+    
+    def __init__(
+        self,
+        user_id: str,
+        data_dir: str = "data/user_profiles",
+        write_behind: Optional[bool] = None,
+        flush_interval: Optional[float] = None,
+        flush_every: Optional[int] = None,
+        store: Optional[ProfileStore] = None
+    ):
         """
         初始化用户画像
         
         Args:
             user_id: 用户唯一标识
             data_dir: 用户数据存储目录
+            write_behind: 是否启用写回模式（默认从环境变量 PROFILE_WRITE_BEHIND 读取）。
+                启用后修改只标记为脏，由后台定时器或累计操作数触发合并写入
+            flush_interval: 写回模式下的刷盘间隔秒数（默认从 PROFILE_FLUSH_INTERVAL 读取）
+            flush_every: 写回模式下累计多少次修改后立即刷盘（默认从 PROFILE_FLUSH_EVERY 读取，0表示不限）
+            store: 画像存储后端（默认按环境变量 PROFILE_STORE 选择，json 为整文件存储）
         """
         self.user_id = user_id
         self.data_dir = data_dir
         self.profile_path = os.path.join(data_dir, f"{user_id}.json")
+        self.store = store or get_profile_store(data_dir=data_dir)
+        
+        if write_behind is None:
+            write_behind = os.getenv("PROFILE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("PROFILE_FLUSH_INTERVAL", "5"))
+        self.flush_every = flush_every if flush_every is not None else int(os.getenv("PROFILE_FLUSH_EVERY", "50"))
+        
+        # 脏标记与刷盘状态
+        self._lock = _profile_locks.get((os.path.abspath(data_dir), user_id))
+        self._dirty = False
+        self._pending_events: List[Dict] = []
+        self._batch_depth: Counter = Counter()  # 按执行上下文统计的批量修改嵌套深度
+        self._flush_timer = None
         
         # 确保数据目录存在
         os.makedirs(data_dir, exist_ok=True)
         
         # 加载或初始化用户画像
         self.profile = self._load_profile()
+        
+        if self.write_behind:
+            _write_behind_profiles.add(self)
     
     def _load_profile(self) -> Dict:
         """加载用户画像数据"""
-        if os.path.exists(self.profile_path):
-            with open(self.profile_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
+        profile = self.store.load(self.user_id)
+        if profile is None:
             # 初始化默认画像
-            return {
-                "user_id": self.user_id,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
-                "preferences": {
-                    "genres": [],  # 喜欢的类型
-                    "topics": [],  # 感兴趣的主题
-                    "authors": [],  # 喜欢的作者
-                    "reading_level": "intermediate",  # 阅读水平: beginner, intermediate, advanced
-                    "content_types": ["book", "article"],  # 内容类型偏好
-                    "languages": ["zh", "en"],  # 语言偏好
-                },
-                "reading_history": [],  # 阅读历史
-                "feedback": {
-                    "liked": [],  # 喜欢的推荐
-                    "disliked": [],  # 不喜欢的推荐
-                },
-                "interaction_count": 0,  # 交互次数
-            }
+            profile = default_profile(self.user_id)
+        return index_feedback(profile)
+    
+    def _collections_loaded(self) -> bool:
+        return "feedback" in self.profile
+    
+    def _ensure_collections(self):
+        """按需从存储后端加载阅读历史与反馈列表"""
+        if not self._collections_loaded():
+            with self._lock:
+                if not self._collections_loaded():
+                    self.profile.update(self.store.load_collections(self.user_id))
+                    index_feedback(self.profile)
     
     def save(self):
-        """保存用户画像到文件"""
-        self.profile["updated_at"] = datetime.now().isoformat()
-        with open(self.profile_path, 'w', encoding='utf-8') as f:
-            json.dump(self.profile, f, ensure_ascii=False, indent=2)
+        """
+        立即将完整画像写入存储后端
+        
+        默认后端先写入同目录下的临时文件再原子替换，进程崩溃时不会留下截断的画像文件
+        """
+        with self._lock:
+            self._cancel_flush_timer()
+            self._ensure_collections()
+            self.profile["updated_at"] = datetime.now().isoformat()
+            self.store.save_snapshot(self.user_id, self.profile)
+            self._dirty = False
+            self._pending_events = []
+    
+    def _write_pending(self):
+        """将累积的修改事件交给存储后端持久化（调用方需持有锁）"""
+        self._cancel_flush_timer()
+        self.store.append_events(self.user_id, self.profile, self._pending_events)
+        self._dirty = False
+        self._pending_events = []
+    
+    def flush(self) -> bool:
+        """
+        将未落盘的修改写入存储后端
+        
+        Returns:
+            是否实际发生了写入
+        """
+        with self._lock:
+            if not self._dirty:
+                self._cancel_flush_timer()
+                return False
+            self._write_pending()
+            return True
+    
+    @contextmanager
+    def batch(self):
+        """
+        批量修改上下文：块内的所有修改最多合并为一次写入
+        
+        写穿模式下退出时立即刷盘；写回模式下交由刷盘策略处理。
+        嵌套深度按进入时的执行上下文统计：其他线程的修改不受本线程批量的影响（仍按各自的模式落盘），
+        协程通过 asyncio.to_thread 在线程中进行的修改属于该协程的批量；
+        退出可以在其他线程中执行（异步 Agent 在线程池中退出以免阻塞事件循环）
+        """
+        owner = _batch_owner()
+        with self._lock:
+            self._batch_depth[owner] += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth[owner] -= 1
+                if self._batch_depth[owner] <= 0:
+                    del self._batch_depth[owner]
+                    if self._dirty:
+                        self._maybe_flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+        return False
+    
+    def is_dirty(self) -> bool:
+        """是否存在未落盘的修改"""
+        return self._dirty
+    
+    def _apply(self, op: str, **fields):
+        """应用一条修改事件，标记画像已修改，并按当前模式决定是否刷盘"""
+        with self._lock:
+            if op in (EVENT_HISTORY, EVENT_FEEDBACK):
+                self._ensure_collections()
+            event = make_event(op, **fields)
+            apply_event(self.profile, event)
+            self._pending_events.append(event)
+            self._dirty = True
+            if _batch_owner_var.get() not in self._batch_depth:
+                self._maybe_flush()
+    
+    def _maybe_flush(self):
+        """根据写穿/写回配置刷盘或安排延迟刷盘（调用方需持有锁）"""
+        if (not self.write_behind
+                or self.flush_interval <= 0
+                or (self.flush_every and len(self._pending_events) >= self.flush_every)):
+            self._write_pending()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self._on_flush_timer)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _on_flush_timer(self):
+        """后台定时刷盘"""
+        with self._lock:
+            self._flush_timer = None
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  用户画像刷盘失败: {e}")
+    
+    def _cancel_flush_timer(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
     
     def update_preferences(self, **kwargs):
         """
@@ -70,28 +253,26 @@ class UserProfile:
         Args:
             **kwargs: 偏好字段和值
         """
-        for key, value in kwargs.items():
-            if key in self.profile["preferences"]:
-                self.profile["preferences"][key] = value
-        self.save()
+        values = {k: v for k, v in kwargs.items() if k in self.profile["preferences"]}
+        self._apply(EVENT_PREFERENCES, values=values)
+    
+    def _add_preference_item(self, key: str, value: str):
+        """向列表型偏好字段追加一项（已存在则忽略）"""
+        with self._lock:
+            if value not in self.profile["preferences"][key]:
+                self._apply(EVENT_PREFERENCES, values={key: self.profile["preferences"][key] + [value]})
     
     def add_genre(self, genre: str):
         """添加喜欢的类型"""
-        if genre not in self.profile["preferences"]["genres"]:
-            self.profile["preferences"]["genres"].append(genre)
-            self.save()
+        self._add_preference_item("genres", genre)
     
     def add_topic(self, topic: str):
         """添加感兴趣的主题"""
-        if topic not in self.profile["preferences"]["topics"]:
-            self.profile["preferences"]["topics"].append(topic)
-            self.save()
+        self._add_preference_item("topics", topic)
     
     def add_author(self, author: str):
         """添加喜欢的作者"""
-        if author not in self.profile["preferences"]["authors"]:
-            self.profile["preferences"]["authors"].append(author)
-            self.save()
+        self._add_preference_item("authors", author)
     
     def add_reading_history(self, item: Dict):
         """
@@ -101,8 +282,7 @@ class UserProfile:
             item: 阅读记录，包含title, type, timestamp等信息
         """
         item["timestamp"] = datetime.now().isoformat()
-        self.profile["reading_history"].append(item)
-        self.save()
+        self._apply(EVENT_HISTORY, item=item)
     
     def add_feedback(self, item_id: str, liked: bool, item_info: Optional[Dict] = None):
         """
@@ -120,43 +300,89 @@ class UserProfile:
         if item_info:
             feedback_entry.update(item_info)
         
-        if liked:
-            self.profile["feedback"]["liked"].append(feedback_entry)
-            # 从不喜欢列表中移除（如果存在）
-            self.profile["feedback"]["disliked"] = [
-                f for f in self.profile["feedback"]["disliked"] 
-                if f.get("item_id") != item_id
-            ]
-        else:
-            self.profile["feedback"]["disliked"].append(feedback_entry)
-            # 从喜欢列表中移除（如果存在）
-            self.profile["feedback"]["liked"] = [
-                f for f in self.profile["feedback"]["liked"] 
-                if f.get("item_id") != item_id
-            ]
-        
-        self.save()
+        self._apply(EVENT_FEEDBACK, item_id=item_id, liked=liked, entry=feedback_entry)
     
     def increment_interaction(self):
         """增加交互计数"""
-        self.profile["interaction_count"] += 1
-        self.save()
+        self._apply(EVENT_INTERACTION)
     
     def get_preferences(self) -> Dict:
-        """获取用户偏好"""
-        return self.profile["preferences"]
+        """获取用户偏好（副本）"""
+        with self._lock:
+            return {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self.profile["preferences"].items()
+            }
     
     def get_reading_history(self) -> List[Dict]:
-        """获取阅读历史"""
-        return self.profile["reading_history"]
+        """获取阅读历史（副本）"""
+        self._ensure_collections()
+        with self._lock:
+            return list(self.profile["reading_history"])
     
     def get_liked_items(self) -> List[Dict]:
-        """获取喜欢的项目"""
-        return self.profile["feedback"]["liked"]
+        """获取喜欢的项目（按最近反馈时间排序）"""
+        self._ensure_collections()
+        with self._lock:
+            return list(self.profile["feedback"]["liked"].values())
     
     def get_disliked_items(self) -> List[Dict]:
-        """获取不喜欢的项目"""
-        return self.profile["feedback"]["disliked"]
+        """获取不喜欢的项目（按最近反馈时间排序）"""
+        self._ensure_collections()
+        with self._lock:
+            return list(self.profile["feedback"]["disliked"].values())
+    
+    def get_feedback_state(self, item_id: str) -> Optional[bool]:
+        """
+        查询某个项目的反馈状态，O(1)
+        
+        Returns:
+            True 喜欢，False 不喜欢，None 无反馈
+        """
+        self._ensure_collections()
+        with self._lock:
+            feedback = self.profile["feedback"]
+            if item_id in feedback["liked"]:
+                return True
+            if item_id in feedback["disliked"]:
+                return False
+            return None
+    
+    def get_recent_feedback(self, liked: bool = True, limit: int = 5) -> List[Dict]:
+        """
+        获取最近的反馈（按时间顺序）
+        
+        列表未加载时直接向存储后端做带 LIMIT 的查询，不加载完整画像
+        
+        Args:
+            liked: True 返回喜欢的项目，False 返回不喜欢的项目
+            limit: 最多返回条数
+        """
+        with self._lock:
+            if self._collections_loaded():
+                return recent_entries(self.profile["feedback"]["liked" if liked else "disliked"], limit)
+        return self.store.recent_feedback(self.user_id, liked, limit)
+    
+    def get_taste_vector(self) -> Optional[np.ndarray]:
+        """
+        获取口味向量（见 taste.py），用于候选项的个性化打分
+        
+        旧画像没有口味向量或编码器配置变化时从反馈列表重建一次，随下次写入保存
+        
+        Returns:
+            float32 单位向量；停用（PROFILE_TASTE=0）、没有反馈或向量为零时返回 None
+        """
+        if not taste_enabled():
+            return None
+        with self._lock:
+            stale = taste_stale(self.profile)
+        if stale:
+            self._ensure_collections()
+            with self._lock:
+                if taste_stale(self.profile):
+                    rebuild_taste(self.profile)
+        with self._lock:
+            return taste_vector(self.profile)
     
     def is_new_user(self) -> bool:
         """判断是否为新用户（交互次数少于3次）"""
@@ -164,7 +390,7 @@ class UserProfile:
     
     def get_profile_summary(self) -> str:
         """获取用户画像摘要（用于LLM理解）"""
-        prefs = self.profile["preferences"]
+        prefs = self.get_preferences()
         summary_parts = []
         
         if prefs["genres"]:
@@ -178,8 +404,34 @@ class UserProfile:
         
         summary_parts.append(f"阅读水平: {prefs['reading_level']}")
         
-        if self.profile["feedback"]["liked"]:
-            liked_titles = [item.get("title", "") for item in self.profile["feedback"]["liked"][-5:]]
+        recent_liked = self.get_recent_feedback(liked=True, limit=5)
+        if recent_liked:
+            liked_titles = [item.get("title", "") for item in recent_liked]
             summary_parts.append(f"最近喜欢的内容: {', '.join(liked_titles)}")
         
         return "\n".join(summary_parts) if summary_parts else "新用户，暂无偏好信息"
+
+
+def get_user_profile(user_id: str, data_dir: str = "data/user_profiles") -> UserProfile:
+    """
+    获取用户画像：该用户的画像实例仍被引用时（例如被淘汰的 Agent 还在处理请求）返回同一个实例，否则从存储加载
+
+    多个内存副本各自写入完整快照会互相覆盖修改，Agent 应通过本函数获取画像
+    
+    Args:
+        user_id: 用户唯一标识
+        data_dir: 用户数据存储目录
+        
+    Returns:
+        用户画像
+    """
+    key = (os.path.abspath(data_dir), user_id)
+    # 在该用户的锁内加载，同一用户不会同时加载出两份，不同用户互不阻塞
+    with _profile_locks.get(key):
+        with _live_profiles_lock:
+            profile = _live_profiles.get(key)
+        if profile is None:
+            profile = UserProfile(user_id, data_dir)
+            with _live_profiles_lock:
+                _live_profiles[key] = profile
+        return profile
@@ -0,0 +1,484 @@
+"""
+向量检索模块
+在预先计算好的书目向量（float16，行号即书目文档ID）上做余弦相似度 top-k 检索：
+FlatIndex 分块暴力计算，适合几十万条以内；IVFPQIndex 先用粗聚类选出少量倒排列表，
+再用乘积量化编码近似打分（可选用原始向量重排），适合百万级书目。
+EmbeddingSource 把检索结果作为 "semantic" 来源接入 ContentFetcher
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .catalog import BookCatalog, get_book_catalog
+from .content_sources import ContentSource, SourceNotReady, load_in_background
+from .embeddings import encode_queries, encode_records, get_encoder
+
+
+def _merge_top_k(
+    ids: np.ndarray,
+    scores: np.ndarray,
+    top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """每行保留得分最高的 top_k 个（不排序）"""
+    if scores.shape[1] <= top_k:
+        return ids, scores
+    keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(ids, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+
+def _sort_rows(ids: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def _pad(ids: np.ndarray, scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """补齐为 top_k 列，不足的位置 ID 为 -1、得分为 -inf"""
+    missing = top_k - ids.shape[1]
+    if missing <= 0:
+        return ids, scores
+    return (
+        np.pad(ids, ((0, 0), (0, missing)), constant_values=-1),
+        np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf),
+    )
+
+
+class FlatIndex:
+    """
+    暴力检索：按 block_size 行分块把 float16 向量转为 float32 与查询相乘，每块只保留各查询的前 top_k
+
+    vectors 可以是 np.load(..., mmap_mode="r") 得到的内存映射数组，检索时按块读取
+    """
+
+    def __init__(self, vectors: np.ndarray, block_size: int = 65536):
+        self.vectors = vectors
+        self.block_size = block_size
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量检索
+
+        Args:
+            queries: (查询数, 维度) 的单位向量
+            top_k: 每个查询返回的数量
+
+        Returns:
+            (ids, scores)，形状均为 (查询数, top_k)，每行按得分从高到低排列；不足时 ID 为 -1
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.vectors), self.block_size):
+            block = np.asarray(self.vectors[start:start + self.block_size], dtype=np.float32)
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), scores.shape)
+            ids, scores = _merge_top_k(ids, scores, top_k)
+            best_ids, best_scores = _merge_top_k(
+                np.concatenate([best_ids, ids], axis=1), np.concatenate([best_scores, scores], axis=1), top_k
+            )
+        return _pad(*_sort_rows(best_ids, best_scores), top_k)
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray, spherical: bool, batch_size: int = 16384) -> np.ndarray:
+    """把每行分配到最近的中心：spherical 时按内积最大，否则按欧氏距离最小"""
+    labels = np.empty(len(x), dtype=np.int64)
+    squared = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(x), batch_size):
+        block = np.asarray(x[start:start + batch_size], dtype=np.float32)
+        products = block @ centroids.T
+        labels[start:start + len(block)] = (
+            products.argmax(axis=1) if spherical else (squared - 2 * products).argmin(axis=1)
+        )
+    return labels
+
+
+def kmeans(
+    x: np.ndarray,
+    k: int,
+    iterations: int = 10,
+    spherical: bool = False,
+    rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    """
+    Lloyd k-means（NumPy 实现）
+
+    Args:
+        x: (n, d) float32 样本
+        k: 中心数（不超过样本数）
+        iterations: 迭代次数
+        spherical: 中心归一化为单位向量，按内积分配（用于余弦相似度）
+        rng: 随机数生成器
+
+    Returns:
+        (k, d) 的中心
+    """
+    rng = rng or np.random.default_rng(0)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(x, centroids, spherical)
+        counts = np.bincount(labels, minlength=k)
+        # 按簇排序后分段求和（比 np.add.at 快得多）
+        order = np.argsort(labels, kind="stable")
+        present = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+        centroids[present] = np.add.reduceat(x[order], starts, axis=0) / counts[present, None]
+        empty = counts == 0
+        # 空簇重新随机取一个样本
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+        if spherical:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    倒排文件 + 乘积量化索引
+
+    - 粗聚类: nlist 个单位向量中心，每个向量归入内积最大的中心（倒排列表）
+    - 乘积量化: 向量减去所属中心后的残差切成 m 段，每段用 256 个子中心之一（uint8）编码，
+      每个向量只占 m 字节
+    - 检索: 取与查询内积最大的 nprobe 个列表，得分 ≈ q·中心 + Σ 各段查表；
+      提供原始向量时取近似得分前 top_k*rerank 个用精确内积重排
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        codebooks: np.ndarray,
+        codes: np.ndarray,
+        list_offsets: np.ndarray,
+        list_ids: np.ndarray,
+        vectors: Optional[np.ndarray] = None,
+        nprobe: int = 16,
+        rerank: int = 4
+    ):
+        self.centroids = centroids
+        self.codebooks = codebooks
+        self.codes = codes
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.vectors = vectors
+        self.nprobe = nprobe
+        self.rerank = rerank
+
+    def __len__(self) -> int:
+        return len(self.list_ids)
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        m: int = 16,
+        iterations: int = 10,
+        sample: int = 65536,
+        seed: int = 0,
+        **kwargs
+    ) -> "IVFPQIndex":
+        """
+        在（抽样的）向量上训练粗聚类与乘积量化码本，并编码全部向量
+
+        Args:
+            vectors: (n, d) 单位向量（float16 或 float32，可以是内存映射数组）
+            nlist: 倒排列表数，默认约 4*sqrt(n)
+            m: 乘积量化的段数（d 必须能被 m 整除）
+            iterations: k-means 迭代次数
+            sample: 训练使用的最多样本数
+            seed: 随机种子
+            kwargs: 传给构造函数（nprobe、rerank）
+
+        Raises:
+            ValueError: 维度不能被 m 整除，或没有向量
+        """
+        n, d = vectors.shape
+        if n == 0:
+            raise ValueError("没有可训练的向量")
+        if d % m:
+            raise ValueError(f"向量维度 {d} 不能被乘积量化段数 {m} 整除")
+        rng = np.random.default_rng(seed)
+        nlist = nlist or max(int(4 * np.sqrt(n)), 1)
+        rows = np.sort(rng.choice(n, min(sample, n), replace=False))
+        training = np.asarray(vectors[rows], dtype=np.float32)
+
+        centroids = kmeans(training, nlist, iterations, spherical=True, rng=rng)
+        residuals = training - centroids[_assign(training, centroids, spherical=True)]
+        segment = d // m
+        codebooks = np.stack([
+            _pad_codebook(kmeans(residuals[:, s * segment:(s + 1) * segment], 256, iterations, rng=rng))
+            for s in range(m)
+        ])
+
+        labels = _assign(vectors, centroids, spherical=True)
+        codes = np.empty((n, m), dtype=np.uint8)
+        for start in range(0, n, 16384):
+            block = np.asarray(vectors[start:start + 16384], dtype=np.float32)
+            block_residuals = block - centroids[labels[start:start + len(block)]]
+            for s in range(m):
+                codes[start:start + len(block), s] = _assign(
+                    block_residuals[:, s * segment:(s + 1) * segment], codebooks[s], spherical=False
+                )
+
+        order = np.argsort(labels, kind="stable")
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=list_offsets[1:])
+        return cls(centroids, codebooks, codes[order], list_offsets, order.astype(np.int64), vectors, **kwargs)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """批量检索，参数与返回值同 FlatIndex.search；nprobe 默认使用实例配置"""
+        queries = np.asarray(queries, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        m, _, segment = self.codebooks.shape
+        results = []
+        for query in queries:
+            coarse = self.centroids @ query
+            lists = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+            # 查找表: 每段查询与 256 个子中心的内积
+            table = np.einsum("sd,skd->sk", query.reshape(m, segment), self.codebooks)
+            ids, scores = [], []
+            for list_id in lists:
+                start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+                if start == end:
+                    continue
+                ids.append(self.list_ids[start:end])
+                scores.append(coarse[list_id] + table[np.arange(m), self.codes[start:end]].sum(axis=1))
+            if not ids:
+                results.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)))
+                continue
+            ids, scores = np.concatenate(ids), np.concatenate(scores).astype(np.float32)
+            if self.vectors is not None and self.rerank > 0:
+                ids, scores = self._rerank(query, ids, scores, top_k * self.rerank)
+            results.append(tuple(row[0] for row in _merge_top_k(ids[None], scores[None], top_k)))
+
+        width = max((len(ids) for ids, _ in results), default=0)
+        ids = np.full((len(queries), width), -1, dtype=np.int64)
+        scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        for row, (row_ids, row_scores) in enumerate(results):
+            ids[row, :len(row_ids)] = row_ids
+            scores[row, :len(row_scores)] = row_scores
+        return _pad(*_sort_rows(ids, scores), top_k)
+
+    def _rerank(self, query: np.ndarray, ids: np.ndarray, scores: np.ndarray, limit: int):
+        """近似得分前 limit 个改用原始向量的精确内积"""
+        ids, _ = (row[0] for row in _merge_top_k(ids[None], scores[None], limit))
+        ids = np.sort(ids)  # 按行号顺序读取内存映射的向量
+        return ids, np.asarray(self.vectors[ids], dtype=np.float32) @ query
+
+    def save(self, path: str):
+        """保存为 .npz（不包含原始向量）"""
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                codebooks=self.codebooks,
+                codes=self.codes,
+                list_offsets=self.list_offsets,
+                list_ids=self.list_ids,
+            )
+
+    @classmethod
+    def load(cls, path: str, vectors: Optional[np.ndarray] = None, **kwargs) -> "IVFPQIndex":
+        """从 .npz 加载；vectors 为原始向量（用于重排，可选）"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls(vectors=vectors, **arrays, **kwargs)
+
+
+def _pad_codebook(codebook: np.ndarray, size: int = 256) -> np.ndarray:
+    """样本少于 256 个时子中心不足，用第一个子中心补齐（不会被多分配）"""
+    if len(codebook) >= size:
+        return codebook
+    return np.concatenate([codebook, np.repeat(codebook[:1], size - len(codebook), axis=0)])
+
+
+def vectors_metadata_path(vectors_path: str) -> str:
+    """向量文件旁记录编码器与条数的元数据文件"""
+    return f"{vectors_path}.json"
+
+
+def load_vectors(path: str, catalog: BookCatalog, encoder) -> np.ndarray:
+    """
+    以内存映射方式加载预先计算的向量，并检查与书目、编码器是否一致
+
+    Raises:
+        ValueError: 条数、维度或编码器与当前配置不一致
+    """
+    vectors = np.load(path, mmap_mode="r")
+    if vectors.ndim != 2 or len(vectors) != len(catalog):
+        raise ValueError(f"向量条数 {len(vectors)} 与书目条数 {len(catalog)} 不一致: {path}")
+    if vectors.shape[1] != encoder.dim:
+        raise ValueError(f"向量维度 {vectors.shape[1]} 与编码器维度 {encoder.dim} 不一致: {path}")
+    metadata_path = vectors_metadata_path(path)
+    if os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            encoder_name = json.load(f).get("encoder")
+        if encoder_name and encoder_name != getattr(encoder, "name", encoder_name):
+            raise ValueError(f"向量由编码器 {encoder_name} 生成，当前编码器为 {encoder.name}: {path}")
+    return vectors
+
+
+class VectorSearch:
+    """书目 + 向量索引 + 查询编码器"""
+
+    def __init__(self, catalog: BookCatalog, index, encoder):
+        self.catalog = catalog
+        self.index = index
+        self.encoder = encoder
+
+    def search(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        language: Optional[str] = None,
+        min_score: float = 0.0,
+        overfetch: int = 4
+    ) -> List[List[Dict]]:
+        """
+        批量语义检索
+
+        Args:
+            queries: 查询文本列表
+            top_k: 每个查询返回的数量
+            language: 语言过滤（该语言没有结果时不限语言），None 表示不限
+            min_score: 余弦相似度下限
+            overfetch: 有语言过滤时多取的倍数
+
+        Returns:
+            每个查询的书目记录列表，每条带有 score 字段
+        """
+        if not queries or top_k <= 0 or len(self.index) == 0:
+            return [[] for _ in queries]
+        fetch = top_k * overfetch if language else top_k
+        ids, scores = self.index.search(encode_queries(self.encoder, queries), fetch)
+        catalog_index = self.catalog.index
+        language_code = catalog_index.language_codes.index(language) if language in catalog_index.language_codes else None
+        results = []
+        for row_ids, row_scores in zip(ids, scores):
+            hits = [(int(doc), float(score)) for doc, score in zip(row_ids, row_scores) if doc >= 0 and score >= min_score]
+            if language is not None:
+                matched = [hit for hit in hits if catalog_index.languages[hit[0]] == language_code]
+                hits = matched or hits
+            records = []
+            for doc, score in hits[:top_k]:
+                record = self.catalog.record(doc)
+                record["score"] = round(score, 4)
+                records.append(record)
+            results.append(records)
+        return results
+
+
+# 进程内共享的向量检索（按书目、向量、索引路径与编码器）：加载中或已加载的 Future，在后台线程中加载
+_searches: Dict[tuple, Future] = {}
+_searches_lock = threading.Lock()
+
+
+def _build_vector_search(
+    catalog_path: Optional[str],
+    vectors_path: Optional[str],
+    index_path: Optional[str],
+    encoder_spec: Optional[str]
+) -> VectorSearch:
+    catalog = get_book_catalog(catalog_path)
+    encoder = get_encoder(encoder_spec)
+    if vectors_path:
+        vectors = load_vectors(vectors_path, catalog, encoder)
+    else:
+        vectors = encode_records(encoder, catalog.records)
+    if index_path:
+        index = IVFPQIndex.load(index_path, vectors, nprobe=int(os.getenv("EMBEDDING_NPROBE", "16")))
+    else:
+        index = FlatIndex(vectors)
+    return VectorSearch(catalog, index, encoder)
+
+
+def load_vector_search(
+    catalog_path: Optional[str] = None,
+    vectors_path: Optional[str] = None,
+    index_path: Optional[str] = None,
+    encoder_spec: Optional[str] = None
+) -> Future:
+    """
+    开始（或复用）在后台线程加载进程内共享的向量检索，加载失败后再次调用会重新加载
+
+    Args:
+        catalog_path: 书目路径（默认见 get_book_catalog）
+        vectors_path: build_embeddings 生成的 .npy 向量文件（默认从 EMBEDDING_VECTORS_PATH 读取）；
+            未设置时在加载时用编码器现场编码整个书目（只适合小书目）
+        index_path: IVF-PQ 索引文件（默认从 EMBEDDING_INDEX_PATH 读取），未设置时暴力检索
+        encoder_spec: 查询编码器（默认从 EMBEDDING_ENCODER 读取，见 load_encoder）
+
+    Returns:
+        结果为 VectorSearch 的 Future
+    """
+    vectors_path = vectors_path or os.getenv("EMBEDDING_VECTORS_PATH") or None
+    index_path = index_path or os.getenv("EMBEDDING_INDEX_PATH") or None
+    key = (catalog_path or os.getenv("BOOK_CATALOG_PATH"), vectors_path, index_path, encoder_spec)
+    with _searches_lock:
+        future = _searches.get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _searches[key] = load_in_background(
+                lambda: _build_vector_search(catalog_path, vectors_path, index_path, encoder_spec),
+                "vector-search-load"
+            )
+        return future
+
+
+def get_vector_search(
+    catalog_path: Optional[str] = None,
+    vectors_path: Optional[str] = None,
+    index_path: Optional[str] = None,
+    encoder_spec: Optional[str] = None
+) -> VectorSearch:
+    """获取进程内共享的向量检索，尚未加载完成时等待加载结束；参数见 load_vector_search"""
+    return load_vector_search(catalog_path, vectors_path, index_path, encoder_spec).result()
+
+
+class EmbeddingSource(ContentSource):
+    """
+    语义检索来源：查询编码为向量后在书目向量中找余弦相似度最高的书
+
+    没有传入 vector_search 时，创建时即在后台线程加载（见 load_vector_search），
+    加载完成之前的检索抛出 SourceNotReady（跳过本来源）
+    """
+
+    def __init__(
+        self,
+        vector_search: Optional[VectorSearch] = None,
+        name: str = "semantic",
+        top_k: int = 20,
+        min_score: float = 0.1,
+        timeout: float = 2.0
+    ):
+        self.vector_search = vector_search
+        self.name = name
+        self.top_k = top_k
+        self.min_score = min_score
+        self.timeout = timeout
+        self._loading = load_vector_search() if vector_search is None else None
+
+    def matches(self, query: str, content_type: str, language: str) -> bool:
+        return content_type in ["book", "both"]
+
+    def search(self, query: str, content_type: str, language: str) -> List[Dict]:
+        if self.vector_search is None:
+            if not self._loading.done():
+                raise SourceNotReady("向量检索正在后台加载")
+            try:
+                self.vector_search = self._loading.result()
+            except Exception:
+                self._loading = load_vector_search()
+                raise
+        return self.vector_search.search([query], self.top_k, language or None, self.min_score)[0]